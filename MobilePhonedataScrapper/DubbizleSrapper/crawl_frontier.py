@@ -0,0 +1,426 @@
+# Shared crawl frontier so several Dubizzle workers (processes or hosts) split one crawl between them
+import argparse
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.product import json_default
+
+KINDS = ("listing", "ad")
+# Shared secret between a served frontier and its workers (also settable with --token / token=)
+TOKEN_ENV = "FRONTIER_TOKEN"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    crawl TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (crawl, kind, url)
+);
+CREATE INDEX IF NOT EXISTS frontier_status ON frontier (crawl, kind, status);
+"""
+
+
+def default_worker_id():
+    """host:pid plus a short random suffix, unique across hosts sharing a frontier"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def crawl_id(listing_urls, run=None):
+    """Frontier scope shared by every worker of one crawl: the listings it pages through plus a run label
+
+    The run label defaults to today's UTC date, so tomorrow's crawl of the same
+    search starts fresh instead of finding everything already done.
+    """
+    run = run or datetime.now(timezone.utc).date().isoformat()
+    return "|".join(sorted(listing_urls)) + "@" + run
+
+
+class Frontier(ABC):
+    """Interface every frontier backend implements (all methods are coroutines)
+
+    URLs move pending -> leased -> done, or back to pending when a worker reports a
+    failure or its lease expires, until max_attempts is used up (then failed).
+    Seeding is idempotent, which is what makes ad URL dedup global: every worker
+    seeds whatever its listing pages returned and only new URLs become work.
+    Every call works on the crawl chosen with start(), so several crawls can
+    share one frontier.
+    """
+
+    crawl = ""
+
+    def start(self, crawl):
+        """Work on `crawl` (see crawl_id) from now on"""
+        self.crawl = crawl
+
+    @abstractmethod
+    async def seed(self, kind, urls):
+        """Add URLs as pending work; returns how many were new"""
+
+    @abstractmethod
+    async def lease(self, kind, worker, limit):
+        """Claim up to `limit` pending URLs for `worker`"""
+
+    @abstractmethod
+    async def complete(self, kind, url, worker, result=None):
+        """Report a finished URL (a listing page's ad count, an ad's product)
+
+        Returns False, and records nothing, if `worker` no longer holds a live lease on it.
+        """
+
+    @abstractmethod
+    async def fail(self, kind, url, worker, error):
+        """Report a failed URL; it is retried until max_attempts (False if the lease was lost)"""
+
+    @abstractmethod
+    async def counts(self):
+        """{kind: {status: count}} for the current crawl"""
+
+    async def close(self):
+        """Release connections (the next call opens them again)"""
+
+
+class SQLiteFrontier(Frontier):
+    """Frontier in one SQLite file, shared by every worker process on the host
+
+    SQLite's file locking serializes writers; each lease claims a batch of URLs in
+    a single BEGIN IMMEDIATE transaction so two workers never get the same URL
+    while its lease is live. Workers on other hosts reach it through serve().
+
+    The coroutines run the *_sync methods in a worker thread: waiting up to the
+    busy timeout for another process's lock must not stall the event loop (and
+    every other scraper sharing it). A lock keeps one transaction at a time on
+    the shared connection.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = None
+        self._lock = threading.RLock()
+        self.conn  # Create the schema up front
+
+    @property
+    def conn(self):
+        """The connection, reopened after close() so one frontier can serve several scrapes"""
+        with self._lock:
+            return self._connect()
+
+    def _connect(self):
+        if self._conn is None:
+            # Autocommit mode: every write is its own short transaction, leases use an explicit one
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")]
+            if columns and "crawl" not in columns:
+                # Rows from before crawls were tracked cannot be attributed to one
+                print(f"[Frontier] {self.path} predates per-crawl frontiers, starting it fresh")
+                self._conn.execute("DROP TABLE frontier")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def seed_sync(self, crawl, kind, urls):
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("INSERT OR IGNORE INTO frontier (crawl, kind, url, updated_at) VALUES (?, ?, ?, ?)",
+                                  [(crawl, kind, url, now) for url in urls])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.conn.total_changes - before
+
+    def lease_sync(self, crawl, kind, worker, limit):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases of workers that died go back to pending, or fail once out of attempts
+            self.conn.execute(
+                "UPDATE frontier SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = 'lease expired', worker = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE crawl = ? AND kind = ? AND status = 'leased' AND lease_expires < ?",
+                (self.max_attempts, now, crawl, kind, now),
+            )
+            rows = self.conn.execute(
+                "SELECT rowid, url FROM frontier WHERE crawl = ? AND kind = ? AND status = 'pending' ORDER BY rowid LIMIT ?",
+                (crawl, kind, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE rowid = ?",
+                [(worker, now + self.lease_seconds, now, rowid) for rowid, _ in rows],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [url for _, url in rows]
+
+    # Only the worker holding a live lease may report a URL; a late report from one whose lease ran out is dropped
+    OWNED = "crawl = ? AND kind = ? AND url = ? AND status = 'leased' AND worker = ? AND lease_expires >= ?"
+
+    def complete_sync(self, crawl, kind, url, worker, result=None):
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE frontier SET status = 'done', result = ?, error = NULL, worker = NULL, lease_expires = NULL, "
+            f"updated_at = ? WHERE {self.OWNED}",
+            (None if result is None else json.dumps(result, ensure_ascii=False, default=json_default),
+             now, crawl, kind, url, worker, now),
+        )
+        return cursor.rowcount > 0
+
+    def fail_sync(self, crawl, kind, url, worker, error):
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE frontier SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, "
+            f"worker = NULL, lease_expires = NULL, updated_at = ? WHERE {self.OWNED}",
+            (self.max_attempts, str(error), now, crawl, kind, url, worker, now),
+        )
+        return cursor.rowcount > 0
+
+    def counts_sync(self, crawl):
+        counts = {kind: {} for kind in KINDS}
+        for kind, status, count in self.conn.execute(
+                "SELECT kind, status, COUNT(*) FROM frontier WHERE crawl = ? GROUP BY kind, status", (crawl,)):
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def crawls(self):
+        """Every crawl in the file, most recently active first"""
+        rows = self.conn.execute("SELECT crawl FROM frontier GROUP BY crawl ORDER BY MAX(updated_at) DESC")
+        return [crawl for (crawl,) in rows]
+
+    def iter_products(self, crawl):
+        """Every product any worker reported for `crawl`"""
+        rows = self.conn.execute("SELECT result FROM frontier WHERE crawl = ? AND kind = 'ad' AND status = 'done' "
+                                 "AND result IS NOT NULL", (crawl,))
+        for (result,) in rows:
+            yield json.loads(result)
+
+    async def _run(self, method, *args):
+        def locked():
+            with self._lock:
+                return method(*args)
+        return await asyncio.to_thread(locked)
+
+    async def seed(self, kind, urls):
+        return await self._run(self.seed_sync, self.crawl, kind, list(urls))
+
+    async def lease(self, kind, worker, limit):
+        return await self._run(self.lease_sync, self.crawl, kind, worker, limit)
+
+    async def complete(self, kind, url, worker, result=None):
+        return await self._run(self.complete_sync, self.crawl, kind, url, worker, result)
+
+    async def fail(self, kind, url, worker, error):
+        return await self._run(self.fail_sync, self.crawl, kind, url, worker, error)
+
+    async def counts(self):
+        return await self._run(self.counts_sync, self.crawl)
+
+    async def close(self):
+        await self._run(self.close_sync)
+
+    def close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class HttpFrontier(Frontier):
+    """Client for a frontier served by serve(), for workers on other hosts"""
+
+    def __init__(self, base_url, timeout=30, token=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token = token or os.getenv(TOKEN_ENV)
+        self.session = None
+
+    async def _call(self, method, payload=None):
+        if self.session is None or self.session.closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout), headers=headers)
+        async with self.session.post(f"{self.base_url}/{method}", json=payload or {}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def seed(self, kind, urls):
+        return (await self._call("seed", {"crawl": self.crawl, "kind": kind, "urls": list(urls)}))["added"]
+
+    async def lease(self, kind, worker, limit):
+        payload = {"crawl": self.crawl, "kind": kind, "worker": worker, "limit": limit}
+        return (await self._call("lease", payload))["urls"]
+
+    async def complete(self, kind, url, worker, result=None):
+        payload = {"crawl": self.crawl, "kind": kind, "url": url, "worker": worker,
+                   "result": json.loads(json.dumps(result, default=json_default))}
+        return (await self._call("complete", payload))["ok"]
+
+    async def fail(self, kind, url, worker, error):
+        payload = {"crawl": self.crawl, "kind": kind, "url": url, "worker": worker, "error": str(error)}
+        return (await self._call("fail", payload))["ok"]
+
+    async def counts(self):
+        return await self._call("counts", {"crawl": self.crawl})
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+def open_frontier(location, lease_seconds=300, max_attempts=3, token=None):
+    """http(s)://host:port for a served frontier (token defaults to $FRONTIER_TOKEN), anything else is a local SQLite path"""
+    if location.startswith(("http://", "https://")):
+        return HttpFrontier(location, token=token)
+    return SQLiteFrontier(location, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+def is_finished(counts):
+    """True once nothing is pending or leased (every URL is done or out of attempts)"""
+    return not any(statuses.get("pending") or statuses.get("leased") for statuses in counts.values())
+
+
+def format_counts(counts):
+    return "; ".join(
+        f"{kind}: " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+        for kind, statuses in counts.items() if statuses
+    ) or "empty"
+
+
+def build_app(frontier, token=None):
+    """aiohttp app exposing a SQLiteFrontier to remote workers (every request must carry `token` if one is set)"""
+    expected = f"Bearer {token}".encode() if token else None
+
+    def handler(method):
+        async def handle(request):
+            if expected and not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+                raise web.HTTPUnauthorized(text="missing or wrong frontier token")
+            body = await request.json() if request.can_read_body else {}
+            crawl, kind = body.get("crawl"), body.get("kind")
+            if not isinstance(crawl, str):
+                raise web.HTTPBadRequest(text="crawl is required")
+            if method != "counts" and kind not in KINDS:
+                raise web.HTTPBadRequest(text=f"kind must be one of {', '.join(KINDS)}")
+            run = frontier._run
+            if method == "seed":
+                return web.json_response({"added": await run(frontier.seed_sync, crawl, kind, body.get("urls", []))})
+            if method == "lease":
+                urls = await run(frontier.lease_sync, crawl, kind, body["worker"], int(body["limit"]))
+                return web.json_response({"urls": urls})
+            if method == "complete":
+                ok = await run(frontier.complete_sync, crawl, kind, body["url"], body["worker"], body.get("result"))
+            elif method == "fail":
+                ok = await run(frontier.fail_sync, crawl, kind, body["url"], body["worker"], body.get("error", ""))
+            else:
+                return web.json_response(await run(frontier.counts_sync, crawl))
+            return web.json_response({"ok": ok})
+        return handle
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    for method in ("seed", "lease", "complete", "fail", "counts"):
+        app.router.add_post(f"/{method}", handler(method))
+    return app
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(path, host="127.0.0.1", port=8765, lease_seconds=300, max_attempts=3, token=None):
+    """Serve a SQLite frontier over HTTP until interrupted
+
+    Anyone who can reach the port can lease and complete URLs, so binding beyond
+    loopback requires a shared token (workers send it from $FRONTIER_TOKEN).
+    """
+    token = token or os.getenv(TOKEN_ENV)
+    if not token and not is_loopback(host):
+        raise ValueError(f"Serving on {host} needs a shared token: pass --token or set {TOKEN_ENV}")
+    frontier = SQLiteFrontier(path, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    print(f"[Frontier] Serving {path} on http://{host}:{port} ({len(frontier.crawls())} crawls)"
+          + ("" if token else " without a token"))
+    try:
+        web.run_app(build_app(frontier, token), host=host, port=port, access_log=None, print=None)
+    finally:
+        frontier.close_sync()
+
+
+def export(path, output, crawl=None):
+    """Write every product the workers reported for a crawl (the latest by default) into one results JSON file"""
+    frontier = SQLiteFrontier(path)
+    crawls = frontier.crawls()
+    crawl = crawl or (crawls[0] if crawls else "")
+    products = list(frontier.iter_products(crawl))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"scraped_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "total_products": len(products),
+                   "products": products}, f, indent=2, ensure_ascii=False)
+    print(f"[Frontier] Exported {len(products)} products of {crawl or 'no crawl'} to {output}")
+    frontier.close_sync()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve, inspect or export a shared Dubizzle crawl frontier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Serve a SQLite frontier to workers on other hosts")
+    serve_parser.add_argument("db", help="Frontier SQLite file")
+    serve_parser.add_argument("--host", default="127.0.0.1",
+                              help="Address to bind (anything but loopback requires a token)")
+    serve_parser.add_argument("--token", help=f"Shared token workers must send (default: ${TOKEN_ENV})")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--lease-seconds", type=int, default=300,
+                              help="How long a worker holds a URL before it is handed to another worker")
+    serve_parser.add_argument("--max-attempts", type=int, default=3)
+    status_parser = commands.add_parser("status", help="Show how much of each crawl is done")
+    status_parser.add_argument("db")
+    export_parser = commands.add_parser("export", help="Write every reported product of a crawl to a JSON file")
+    export_parser.add_argument("db")
+    export_parser.add_argument("--crawl", help="Crawl to export (default: the most recently active one)")
+    export_parser.add_argument("--output", default="dubizzle_products.json")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            serve(args.db, args.host, args.port, args.lease_seconds, args.max_attempts, args.token)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "status":
+        frontier = SQLiteFrontier(args.db)
+        for crawl in frontier.crawls() or [None]:
+            print(f"[Frontier] {crawl}: {format_counts(frontier.counts_sync(crawl))}" if crawl else "[Frontier] empty")
+        frontier.close_sync()
+    else:
+        export(args.db, args.output, args.crawl)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# On-disk crawl journal so interrupted Dubizzle runs can resume
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.id_set import IdSet
+from common.product import json_default
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    crawl TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS listing_pages (
+    crawl TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ad_count INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (crawl, url)
+);
+CREATE TABLE IF NOT EXISTS ads (
+    crawl TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    product TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (crawl, url)
+);
+CREATE INDEX IF NOT EXISTS ads_status ON ads (crawl, status);
+"""
+
+
+def crawl_key(listing_urls):
+    """A crawl is identified by the listings it pages through (the category URL, or one URL per search query)"""
+    return "|".join(sorted(listing_urls))
+
+
+class CrawlJournal:
+    """Records fetched listing pages and the state of every discovered ad URL in SQLite
+
+    Rows belong to a crawl (see crawl_key), so one journal file can serve several
+    searches without one resuming another's ads. A crawl that ran to the end is
+    marked finished, and starting it again begins from scratch.
+    """
+
+    def __init__(self, path, commit_every=50, max_attempts=3):
+        self.path = path
+        self.commit_every = commit_every
+        self.max_attempts = max_attempts
+        self.crawl = ""
+        self.conn = sqlite3.connect(path)
+        # WAL + NORMAL keeps each commit to a cheap append instead of a full fsync'd rewrite
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_unscoped_tables()
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def _drop_unscoped_tables(self):
+        # Journals written before rows were tied to a crawl cannot say which search they belong to
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ads)")]
+        if columns and "crawl" not in columns:
+            print(f"[Journal] {self.path} predates per-crawl journals, starting it fresh")
+            self.conn.executescript("DROP TABLE IF EXISTS listing_pages; DROP TABLE IF EXISTS ads;")
+
+    def _changed(self, count=1):
+        self._uncommitted += count
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def start(self, crawl):
+        """Make `crawl` the current one; a finished crawl is reset so it runs again in full"""
+        self.commit()
+        self.crawl = crawl
+        row = self.conn.execute("SELECT finished_at FROM crawls WHERE crawl = ?", (crawl,)).fetchone()
+        if row and row[0] is not None:
+            self.reset(crawl)
+        elif row is None:
+            self.conn.execute("INSERT INTO crawls (crawl, started_at) VALUES (?, ?)", (crawl, time.time()))
+        self.commit()
+
+    def reset(self, crawl=None):
+        """Forget every page and ad of a crawl (the current one by default)"""
+        crawl = self.crawl if crawl is None else crawl
+        self.conn.execute("DELETE FROM listing_pages WHERE crawl = ?", (crawl,))
+        self.conn.execute("DELETE FROM ads WHERE crawl = ?", (crawl,))
+        self.conn.execute("INSERT OR REPLACE INTO crawls (crawl, started_at) VALUES (?, ?)", (crawl, time.time()))
+        self.commit()
+
+    def finish(self):
+        """Mark the current crawl complete, so the next start() does not resume it"""
+        self.conn.execute("UPDATE crawls SET finished_at = ? WHERE crawl = ?", (time.time(), self.crawl))
+        self.commit()
+
+    def completed_listing_pages(self):
+        """Listing page URLs of the current crawl that were fetched and parsed in an earlier run"""
+        rows = self.conn.execute("SELECT url FROM listing_pages WHERE crawl = ? AND status = 'done'", (self.crawl,))
+        return {url for (url,) in rows}
+
+    def mark_listing_done(self, url, ad_urls):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO listing_pages (crawl, url, status, ad_count, updated_at) VALUES (?, ?, 'done', ?, ?)",
+            (self.crawl, url, len(ad_urls), now),
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO ads (crawl, url, updated_at) VALUES (?, ?, ?)",
+            [(self.crawl, ad_url, now) for ad_url in ad_urls],
+        )
+        self._changed(1 + len(ad_urls))
+
+    def mark_listing_failed(self, url):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO listing_pages (crawl, url, status, updated_at) VALUES (?, ?, 'failed', ?)",
+            (self.crawl, url, time.time()),
+        )
+        self._changed()
+
+    def done_ads(self):
+        """Ad URLs of the current crawl already parsed successfully, as a compact IdSet (membership only)"""
+        rows = self.conn.execute("SELECT url FROM ads WHERE crawl = ? AND status = 'done'", (self.crawl,))
+        return IdSet(url for (url,) in rows)
+
+    def pending_ads(self):
+        """Discovered ads that still need fetching, including failures under max_attempts"""
+        rows = self.conn.execute(
+            "SELECT url FROM ads WHERE crawl = ? AND status != 'done' AND attempts < ?", (self.crawl, self.max_attempts)
+        )
+        return [url for (url,) in rows]
+
+    def mark_ad_done(self, url, product):
+        self.conn.execute(
+            "INSERT INTO ads (crawl, url, status, attempts, product, updated_at) VALUES (?, ?, 'done', 1, ?, ?) "
+            "ON CONFLICT(crawl, url) DO UPDATE SET status = 'done', attempts = attempts + 1, "
+            "product = excluded.product, error = NULL, updated_at = excluded.updated_at",
+            (self.crawl, url, json.dumps(product, ensure_ascii=False, default=json_default), time.time()),
+        )
+        self._changed()
+
+    def mark_ad_failed(self, url, error):
+        self.conn.execute(
+            "INSERT INTO ads (crawl, url, status, attempts, error, updated_at) VALUES (?, ?, 'failed', 1, ?, ?) "
+            "ON CONFLICT(crawl, url) DO UPDATE SET status = 'failed', attempts = attempts + 1, "
+            "error = excluded.error, updated_at = excluded.updated_at",
+            (self.crawl, url, error, time.time()),
+        )
+        self._changed()
+
+    def iter_products(self):
+        """Products the current crawl parsed in earlier runs, so a resumed run can still output everything"""
+        rows = self.conn.execute("SELECT product FROM ads WHERE crawl = ? AND status = 'done' AND product IS NOT NULL",
+                                 (self.crawl,))
+        for (product,) in rows:
+            yield json.loads(product)
+
+    def stats(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM ads WHERE crawl = ? GROUP BY status", (self.crawl,))
+        return dict(rows.fetchall())
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.commit()
+        self.conn.close()
+        self.conn = None
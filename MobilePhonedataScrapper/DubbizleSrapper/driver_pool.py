@@ -0,0 +1,73 @@
+# Pool of long-lived Chrome drivers, one per worker thread
+import threading
+
+
+class DriverPool:
+    """Reuse one headless Chrome driver per worker thread instead of one per fetch"""
+
+    def __init__(self, create_driver, max_pages_per_driver=50):
+        self.create_driver = create_driver
+        self.max_pages_per_driver = max_pages_per_driver
+        self._local = threading.local()
+        self._drivers = {}  # thread id -> driver, so shutdown() can reach every thread's browser
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        """Return a healthy driver for the calling thread, starting or recycling one if needed"""
+        if self._closed:
+            raise RuntimeError("Driver pool is shut down")
+
+        driver = getattr(self._local, "driver", None)
+        if driver is not None:
+            if self._local.pages >= self.max_pages_per_driver or not self.is_healthy(driver):
+                self.discard()
+                driver = None
+
+        if driver is None:
+            driver = self.create_driver()
+            self._local.driver = driver
+            self._local.pages = 0
+            with self._lock:
+                self._drivers[threading.get_ident()] = driver
+
+        self._local.pages += 1
+        return driver
+
+    def is_healthy(self, driver):
+        """Cheap round-trip to the browser to detect crashed or hung sessions"""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def discard(self):
+        """Quit the calling thread's driver so the next acquire() starts a fresh one"""
+        driver = getattr(self._local, "driver", None)
+        self._local.driver = None
+        self._local.pages = 0
+        if driver is None:
+            return
+        with self._lock:
+            self._drivers.pop(threading.get_ident(), None)
+        try:
+            driver.quit()
+        except:
+            pass
+
+    def shutdown(self):
+        """Quit every pooled driver (call after the worker threads have finished)"""
+        self._closed = True
+        with self._lock:
+            drivers = list(self._drivers.values())
+            self._drivers.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except:
+                pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._drivers)
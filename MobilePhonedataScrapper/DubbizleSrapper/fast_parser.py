@@ -0,0 +1,137 @@
+# lxml/XPath parsers for Dubizzle pages; same fields as soup_parser without building a soup tree
+import os
+import sys
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.product import Product
+
+BASE_URL = "https://www.dubizzle.com.eg"
+
+HTML_PARSER = etree.HTMLParser()
+_BYTES_PARSERS = {}
+
+
+def _has_class(name):
+    """XPath predicate matching one class token, like BeautifulSoup's class_="name" """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _xpath(expr):
+    return etree.XPath(expr, smart_strings=False)
+
+
+# Compiled once at import; each call then only walks the parsed tree
+LISTING_ITEMS = _xpath("//li[@aria-label='Listing']")
+ARTICLES = _xpath("//article")
+FIRST_ARTICLE = _xpath("(.//article)[1]")
+FIRST_LINK = _xpath("(.//a[@href])[1]")
+
+TITLE = _xpath("(//h1)[1]")
+PRICE = _xpath(f"(//span[{_has_class('_24469da7')}][@aria-label='Price'])[1]")
+SELLER = _xpath("(//span[normalize-space(@class)='_8206696c b7af14b4'])[1]")
+VERIFIED_NAME = _xpath("(.//span[normalize-space(@class)='_9a85fb36 b7af14b4'])[1]")
+LOCATION = _xpath("(//span[@aria-label='Location'])[1]")
+DETAIL_CONTAINERS = _xpath(f"//div[{_has_class('_92439ac7')}]")
+DETAIL_ROWS = _xpath(f".//div[{_has_class('_9a8eacd9')}]")
+ROW_SPANS = _xpath("(.//span)[position() <= 2]")
+# get_text() leaves out script/style/template strings, so the text walk does too
+TEXT = _xpath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+
+def _bytes_parser(encoding):
+    parser = _BYTES_PARSERS.get(encoding)
+    if parser is None:
+        parser = _BYTES_PARSERS[encoding] = etree.HTMLParser(encoding=encoding)
+    return parser
+
+
+def parse_html(html, encoding=None):
+    """Parse a page (str, or raw bytes in `encoding`) into an lxml tree (None for an empty document)"""
+    if isinstance(html, bytes):
+        # Raw response bodies are parsed as-is; without a charset libxml2 reads the <meta> tag
+        return etree.fromstring(html, _bytes_parser(encoding))
+    try:
+        return etree.fromstring(html, HTML_PARSER)
+    except ValueError:
+        # Unicode strings with an XML encoding declaration must be handed over as bytes
+        return etree.fromstring(html.encode("utf-8"), _bytes_parser("utf-8"))
+
+
+def _first(xpath, node):
+    found = xpath(node)
+    return found[0] if found else None
+
+
+def text_of(element):
+    """Equivalent of BeautifulSoup's get_text(strip=True)"""
+    return "".join(part.strip() for part in TEXT(element))
+
+
+def parse_listing_page(html):
+    """Extract product URLs from listing page"""
+    root = parse_html(html)
+    if root is None:
+        return []
+
+    listing_items = LISTING_ITEMS(root) or ARTICLES(root)
+    urls = []
+    for item in listing_items:
+        article = item if item.tag == "article" else _first(FIRST_ARTICLE, item)
+        if article is None:
+            continue
+        link = _first(FIRST_LINK, article)
+        if link is not None and link.get("href"):
+            full_url = f"{BASE_URL}{link.get('href')}"
+            if "/ad/" in full_url:
+                urls.append(full_url)
+    return urls
+
+
+def parse_product_details(html, url, encoding=None):
+    """Extract product details from product page as a Product (None if the page could not be parsed)"""
+    try:
+        return parse_product(html, url, encoding)
+    except Exception:
+        return None
+
+
+def parse_product(html, url, encoding=None):
+    """parse_product_details(), but raising whatever went wrong so callers can record why"""
+    root = parse_html(html, encoding)
+    if root is None:
+        root = etree.Element("html")
+
+    h1 = _first(TITLE, root)
+    product_name = text_of(h1) if h1 is not None else "N/A"
+
+    price_span = _first(PRICE, root)
+    price = text_of(price_span) if price_span is not None else "N/A"
+
+    # Normal users; verified users show "See profile" there and keep the name in the first detail container
+    seller_span = _first(SELLER, root)
+    seller_name = text_of(seller_span) if seller_span is not None else None
+    if seller_name is None or "See profile" in seller_name:
+        verified_container = _first(DETAIL_CONTAINERS, root)
+        if verified_container is not None:
+            name_span = _first(VERIFIED_NAME, verified_container)
+            if name_span is not None:
+                name = text_of(name_span)
+                if "See profile" not in name:
+                    seller_name = name
+    if seller_name is None or "See profile" in seller_name:
+        seller_name = "N/A"
+
+    location_span = _first(LOCATION, root)
+    location = text_of(location_span) if location_span is not None else "N/A"
+
+    # Walk container by container (nested containers included) so repeated keys resolve as before
+    details = {}
+    for container in DETAIL_CONTAINERS(root):
+        for div in DETAIL_ROWS(container):
+            spans = ROW_SPANS(div)
+            if len(spans) >= 2:
+                details[text_of(spans[0])] = text_of(spans[1])
+
+    return Product.from_scraped("dubizzle", product_name, price, seller_name, location, url, details)
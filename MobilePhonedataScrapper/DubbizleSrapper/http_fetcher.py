@@ -0,0 +1,129 @@
+# Browserless aiohttp fetcher for Dubizzle ad detail pages
+import asyncio
+import os
+import sys
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.adaptive_limiter import AdaptiveLimiter, THROTTLE_STATUSES, host_of, parse_retry_after
+from common.response_cache import cache_key
+from common.metrics import Metrics
+
+try:
+    import brotli  # noqa: F401  (lets aiohttp decode "br" responses)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+# Statuses worth retrying; anything else (404, 410, ...) means the ad is gone
+RETRY_STATUSES = THROTTLE_STATUSES | {500}
+
+
+def is_valid_detail_page(html):
+    """Ad pages are server-rendered, so a usable page already has its title in the HTML"""
+    marker = b"<h1" if isinstance(html, bytes) else "<h1"
+    return bool(html) and len(html) > 1000 and marker in html
+
+
+class HttpDetailFetcher:
+    """Keep-alive HTTP client with per-host connection limits for static ad pages"""
+
+    def __init__(self, max_connections=100, max_per_host=20, timeout=15, max_retries=2, rate_per_host=20, limiter=None,
+                 cache=None, metrics=None):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = None
+        # Optional ResponseCache: fresh pages skip the network, stale ones are revalidated
+        self.cache = cache
+        # Request timings, bytes and failure reasons (a private registry if none is shared)
+        self.metrics = metrics or Metrics()
+        # Concurrency adapts below the connector's per-host cap; requests per second are capped per host
+        self.limiter = limiter or AdaptiveLimiter(initial=max(1, max_per_host // 2), max_limit=max_per_host,
+                                                  rate_per_host=rate_per_host)
+
+    def _ensure_session(self):
+        """Create the pooled session lazily, inside the running event loop"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=DEFAULT_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def fetch(self, url):
+        """Return the ad page HTML, or None if it could not be fetched or failed validation"""
+        page = await self.fetch_raw(url)
+        if page is None:
+            return None
+        body, charset = page
+        return body.decode(charset or "utf-8", errors="replace")
+
+    async def fetch_raw(self, url):
+        """Like fetch(), but return the undecoded body and its charset so it can go straight to the parser"""
+        cached, headers = None, None
+        if self.cache:
+            key = cache_key(url)
+            cached = self.cache.get(key)
+            if cached and (cached.fresh or self.cache.replay):
+                return cached.body, cached.charset
+            if self.cache.replay:
+                return None
+            headers = cached.conditional_headers() if cached else None
+        session = self._ensure_session()
+        metrics = self.metrics
+        for attempt in range(self.max_retries):
+            with metrics.stage("limiter_wait"):
+                started = await self.limiter.acquire(host_of(url))
+            failed, throttled, retry_after = False, False, None
+            try:
+                with metrics.stage("http_fetch"), metrics.in_flight("http"):
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 304 and cached:
+                            self.cache.revalidated(key)
+                            return cached.body, cached.charset
+                        if response.status == 200:
+                            body = await response.read()
+                            metrics.inc("bytes_fetched_total", len(body), kind="http")
+                            if not is_valid_detail_page(body):
+                                metrics.failure("http_fetch", "invalid_page")
+                                return None
+                            if self.cache:
+                                self.cache.put(key, url, body, response.charset,
+                                               response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                            return body, response.charset
+                        metrics.failure("http_fetch", f"http_{response.status}")
+                        if response.status not in RETRY_STATUSES:
+                            return None
+                        throttled = True
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.failure("http_fetch", e)
+                failed = True
+            finally:
+                self.limiter.release(started, ok=not failed, throttled=throttled, retry_after=retry_after)
+            if attempt < self.max_retries - 1:
+                with metrics.stage("backoff"):
+                    await asyncio.sleep(retry_after or 0.5 * (attempt + 1))
+        return None
+
+    async def close(self):
+        """Close pooled connections"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
@@ -2,19 +2,99 @@
 import asyncio
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-import json
-from datetime import datetime
-import aiofiles
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import os
+import sys
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
+from driver_pool import DriverPool
+from http_fetcher import HttpDetailFetcher
+from crawl_journal import CrawlJournal, crawl_key
+from crawl_frontier import crawl_id, default_worker_id, format_counts, is_finished, open_frontier
+import fast_parser
+from parse_pool import ParsePool
 
-class DubizzleScraper:
-    def __init__(self, max_workers=10):
+# Shared helpers live one level up
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.sinks import SinkMixin
+from common.seen_index import SeenIndex
+from common.adaptive_limiter import AdaptiveLimiter
+from common.response_cache import ResponseCache, cache_key
+from common.product import Product
+from common.metrics import Metrics
+from common.id_set import IdSet
+from common.validation import Validator
+
+ERROR_PAGE_MARKERS = ("حدث خطأ ما", "Something went wrong")
+ERROR_PAGE_XPATH = " | ".join(f"//*[contains(text(), '{marker}')]" for marker in ERROR_PAGE_MARKERS)
+# What parse_listing_page / parse_product_details need before a page is usable
+LISTING_READY_SELECTOR = "li[aria-label='Listing'], article"
+PRICE_SELECTOR = "span[aria-label='Price']"
+PRICE_GRACE = 0.5  # Ads without a price never render the span, so only wait briefly for it
+DUBIZZLE_HOST = "www.dubizzle.com.eg"
+
+def is_error_page(html):
+    return any(marker in html for marker in ERROR_PAGE_MARKERS)
+
+def listing_of(url):
+    """The listing a result page belongs to: its URL without the ?page=N query"""
+    return url.split("?", 1)[0]
+
+class DubizzleScraper(SinkMixin):
+    def __init__(self, max_workers=10, max_pages_per_driver=50, detail_backend="http", journal_path=None,
+                 seen_index_path=None, recheck_after_days=7, listing_wait_timeout=10, detail_wait_timeout=5,
+                 parse_workers=None, max_pending_parses=None, cache_path=None, cache_ttl=86400, cache_mode="cache",
+                 metrics=None, frontier=None, worker_id=None, crawl_id=None, quarantine_path=None):
         self.base_url = "https://www.dubizzle.com.eg/en/mobile-phones-tablets-accessories-numbers/mobile-phones/"
+        self.source = "dubizzle"
         self.products = []
         self.max_workers = max_workers
+        # Per-stage timings, failure reasons and queue depths; pass a shared Metrics to export several scrapers together
+        self.metrics = (metrics or Metrics()).labeled(source=self.source)
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # max_workers is the ceiling; the limiter starts at half and adapts to how Dubizzle responds
+        self.limiter = AdaptiveLimiter(initial=max(1, max_workers // 2), max_limit=max_workers)
+        # Browsers are reused across URLs (one per worker thread) and recycled after N pages
+        self.driver_pool = DriverPool(self.create_driver, max_pages_per_driver=max_pages_per_driver)
+        # Pages are handed to the parser as soon as their elements exist, up to these timeouts
+        self.wait_timeouts = {"listing": listing_wait_timeout, "detail": detail_wait_timeout}
+        self.wait_stats = {"listing": [0, 0.0, 0.0], "detail": [0, 0.0, 0.0]}  # count, total, max seconds
+        self._wait_lock = threading.Lock()
+        # Ad pages are static HTML, so by default they skip Selenium entirely ("http" or "selenium")
+        self.detail_backend = detail_backend
+        # Optional on-disk response cache; "replay" mode re-runs parsing from it with no network at all
+        self.cache = ResponseCache(cache_path, ttl=cache_ttl, mode=cache_mode) if cache_path else None
+        self.http_fetcher = HttpDetailFetcher(cache=self.cache, metrics=self.metrics) if detail_backend == "http" else None
+        self.http_fallbacks = 0
+        # Ad pages are parsed in worker processes (one per core by default; 0 parses on the event loop)
+        self.parse_pool = None if parse_workers == 0 else ParsePool(parse_workers, max_pending_parses, self.metrics)
+        self._init_sinks()
+        # Optional SQLite journal: a restarted crawl skips fetched pages and parsed ads
+        self.journal = CrawlJournal(journal_path) if journal_path else None
+        self.completed_listing_pages = set()
+        # Every product is validated and normalized before it is emitted; rejects go to quarantine_path
+        self.validator = Validator(self.source, quarantine_path, self.metrics)
+        # Optional shared frontier (SQLite path or http:// URL of a served one): workers split listing pages and ads
+        self.frontier = open_frontier(frontier) if frontier else None
+        self.worker_id = worker_id or default_worker_id()
+        # Workers of one crawl agree on this run label (default: today's UTC date) to share frontier entries
+        self.crawl_id = crawl_id
+        # Optional seen index: delta runs skip recently checked ads and emit only new/changed/removed ones
+        self.seen_index_path = seen_index_path
+        self.recheck_after = recheck_after_days * 86400
+        self.seen_index = None
+        self.listing_failures = 0
+        # Listing pages and ads fetched vs. failed over the scraper's life; a job that emits nothing is judged by these
+        self.fetch_counts = {"ok": 0, "failed": 0}
+        # Listings (a search or the full category, paged with ?page=N) that must all run out for removals to count
+        self.delta_listings = set()
+        self.exhausted_listings = set()
+        self.stopped_early = False
+        # Ad URL -> matching queries while scrape_searches runs
+        self.query_tags = None
         
     def create_driver(self):
         """Create optimized headless Chrome driver"""
@@ -34,16 +114,17 @@ class DubizzleScraper:
         options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         options.page_load_strategy = 'eager'
         
-        driver = webdriver.Chrome(options=options)
+        with self.metrics.stage("driver_start"):
+            driver = webdriver.Chrome(options=options)
         driver.set_page_load_timeout(15)  # Reduced timeout
-        driver.implicitly_wait(2)  # Reduced wait
+        driver.implicitly_wait(0)  # Readiness is polled explicitly in wait_until_ready
         
         return driver
     
     def fetch_page_sync(self, url, enable_js=False, max_retries=2):
         """Synchronous page fetch for thread pool with retry logic"""
         for attempt in range(max_retries):
-            driver = self.create_driver()
+            driver = self.driver_pool.acquire()
             try:
                 # Enable JS only for listing pages
                 if enable_js:
@@ -52,229 +133,674 @@ class DubizzleScraper:
                     })
                     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
                 
-                driver.get(url)
-                time.sleep(1 if not enable_js else 3)
+                kind = "listing" if enable_js else "detail"
+                with self.metrics.stage(f"{kind}_navigate"):
+                    driver.get(url)
+                self.wait_until_ready(driver, kind)
                 
                 html = driver.page_source
                 
                 # Check for error page only on listing pages
-                if enable_js and ("حدث خطأ ما" in html or "Something went wrong" in html):
-                    driver.refresh()
-                    time.sleep(3)
+                if enable_js and is_error_page(html):
+                    with self.metrics.stage(f"{kind}_navigate"):
+                        driver.refresh()
+                    self.wait_until_ready(driver, kind)
                     html = driver.page_source
+                    # Only an error page that survives the refresh is a failure
+                    if is_error_page(html):
+                        self.metrics.failure("browser_fetch", "error_page_refresh")
+                    else:
+                        self.metrics.inc("recoveries_total", stage="browser_fetch", reason="error_page_refresh")
                 
                 # Verify we got valid content
                 if html and len(html) > 1000:
                     return html
+                self.metrics.failure("browser_fetch", "short_page")
                     
             except Exception as e:
+                # A failed navigation can leave the browser wedged, so retry on a fresh one
+                self.metrics.failure("browser_fetch", e)
+                self.driver_pool.discard()
                 if attempt == max_retries - 1:
-                    print(f"[Error] Failed {url} after {max_retries} attempts")
-            finally:
-                try:
-                    driver.quit()
-                except:
-                    pass
+                    print(f"[Error] Failed {url} after {max_retries} attempts ({type(e).__name__})")
                     
         return None
     
+    def wait_until_ready(self, driver, kind):
+        """Poll until the elements the parser needs exist; returns True if they appeared in time"""
+        started = time.monotonic()
+        if kind == "listing":
+            def ready(d):
+                return d.find_elements(By.CSS_SELECTOR, LISTING_READY_SELECTOR) or d.find_elements(By.XPATH, ERROR_PAGE_XPATH)
+        else:
+            def ready(d):
+                if not d.find_elements(By.TAG_NAME, "h1"):
+                    return False
+                return d.find_elements(By.CSS_SELECTOR, PRICE_SELECTOR) or time.monotonic() - started > PRICE_GRACE
+        try:
+            WebDriverWait(driver, self.wait_timeouts[kind], poll_frequency=0.1).until(ready)
+            is_ready = True
+        except TimeoutException:
+            is_ready = False
+        waited = time.monotonic() - started
+        self.metrics.observe(f"{kind}_wait", waited)
+        if not is_ready:
+            self.metrics.failure(f"{kind}_wait", "timeout")
+        with self._wait_lock:
+            stats = self.wait_stats[kind]
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+        return is_ready
+    
+    def summary_lines(self):
+        lines = [f"[Concurrency] Browsers: {self.limiter.summary()}", f"[Waits] {self.wait_summary()}"]
+        if self.http_fetcher:
+            lines.append(f"[Concurrency] HTTP: {self.http_fetcher.limiter.summary()}")
+        if self.parse_pool:
+            lines.append(f"[Parsing] {self.parse_pool.summary()}")
+        if self.cache:
+            lines.append(f"[Cache] {self.cache.summary()}")
+        return lines
+    
+    def wait_summary(self):
+        parts = []
+        for kind, (count, total, longest) in self.wait_stats.items():
+            if count:
+                parts.append(f"{kind} avg {total / count:.2f}s / max {longest:.2f}s ({count} pages)")
+        return ", ".join(parts) or "no browser page loads"
+    
     async def fetch_page(self, url, enable_js=False):
-        """Async wrapper for page fetch"""
+        """Async wrapper for page fetch, paced by the adaptive limiter"""
+        if self.cache:
+            # Browser pages carry no validators, so they are only reused while fresh (or in replay)
+            key = cache_key(url, "listing" if enable_js else None)
+            cached = self.cache.get(key)
+            if cached and (cached.fresh or self.cache.replay):
+                return cached.body.decode(cached.charset or "utf-8")
+            if self.cache.replay:
+                return None
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self.fetch_page_sync, url, enable_js)
+        with self.metrics.stage("limiter_wait"):
+            started = await self.limiter.acquire(DUBIZZLE_HOST)
+        html = None
+        blocked = False
+        try:
+            with self.metrics.stage("browser_fetch"), self.metrics.in_flight("browser"):
+                html = await loop.run_in_executor(self.executor, self.fetch_page_sync, url, enable_js)
+            # The error page survived a refresh: we are being throttled, so back off
+            blocked = enable_js and html is not None and is_error_page(html)
+        finally:
+            self.limiter.release(started, ok=html is not None, throttled=blocked)
+        if html:
+            self.metrics.inc("bytes_fetched_total", len(html.encode("utf-8")), kind="browser")
+        if blocked:
+            # fetch_page_sync already counted it as an error_page_refresh failure
+            print(f"[Warning] Dubizzle returned its error page for {url}, backing off")
+            return None
+        if html and self.cache:
+            self.cache.put(key, url, html)
+        return html
+    
+    async def fetch_detail_page(self, url):
+        """Fetch an ad page over plain HTTP, falling back to Selenium if it fails validation
+
+        Returns (page, encoding): raw bytes and their charset from HTTP, or Selenium's
+        page source with encoding None. page is None if both failed.
+        """
+        if self.http_fetcher:
+            page = await self.http_fetcher.fetch_raw(url)
+            if page:
+                return page
+            self.http_fallbacks += 1
+        return await self.fetch_page(url, enable_js=False), None
     
     def parse_listing_page(self, html):
         """Extract product URLs from listing page"""
-        soup = BeautifulSoup(html, "lxml")
-        listing_items = soup.find_all("li", attrs={"aria-label": "Listing"})
-        
-        if not listing_items:
-            listing_items = soup.find_all("article")
-        
-        urls = []
-        for item in listing_items:
-            try:
-                article = item if item.name == "article" else item.find("article")
-                if article:
-                    link = article.find("a", href=True)
-                    if link and link["href"]:
-                        full_url = f"https://www.dubizzle.com.eg{link['href']}"
-                        if "/ad/" in full_url:
-                            urls.append(full_url)
-            except:
-                continue
-        return urls
+        with self.metrics.stage("listing_parse"):
+            return fast_parser.parse_listing_page(html)
     
-    def parse_product_details(self, html, url):
+    def parse_product_details(self, html, url, encoding=None):
         """Extract product details from product page"""
-        try:
-            soup = BeautifulSoup(html, "lxml")
-            
-            h1 = soup.find("h1")
-            product_name = h1.get_text(strip=True) if h1 else "N/A"
-            
-            price_span = soup.find("span", class_="_24469da7", attrs={"aria-label": "Price"})
-            price = price_span.get_text(strip=True) if price_span else "N/A"
-            
-                        # Try to find seller name (normal users)
-            seller_span = soup.find("span", class_="_8206696c b7af14b4")
-            
-            # If not found or contains "See profile", try verified user structure
-            if not seller_span or "See profile" in seller_span.get_text(strip=True):
-                # For verified users, look for the name in a different location
-                # Usually in a span or div before the "See profile" link
-                verified_container = soup.find("div", class_="_92439ac7")
-                if verified_container:
-                    name_span = verified_container.find("span", class_="_9a85fb36 b7af14b4")
-                    if name_span and "See profile" not in name_span.get_text(strip=True):
-                        seller_span = name_span
-            
-            seller_name = seller_span.get_text(strip=True) if seller_span and "See profile" not in seller_span.get_text(strip=True) else "N/A"
-            location_span = soup.find("span", attrs={"aria-label": "Location"})
-            location = location_span.get_text(strip=True) if location_span else "N/A"
-            
-            details = {}
-            detail_containers = soup.find_all("div", class_="_92439ac7")
-            for container in detail_containers:
-                inner_divs = container.find_all("div", class_="_9a8eacd9")
-                for div in inner_divs:
-                    spans = div.find_all("span")
-                    if len(spans) >= 2:
-                        key = spans[0].get_text(strip=True)
-                        value = spans[1].get_text(strip=True)
-                        details[key] = value
-            
-            return {
-                "product_name": product_name,
-                "price": price,
-                "seller_name": seller_name,
-                "location": location,
-                "listing_url": url,
-                "details": details
-            }
-        except:
-            return None
+        return fast_parser.parse_product_details(html, url, encoding)
+    
+    async def parse_detail_page(self, html, url, encoding=None):
+        """Parse an ad page in the process pool, or inline when parse_workers=0"""
+        if self.parse_pool:
+            return await self.parse_pool.parse_product(html, url, encoding)
+        with self.metrics.stage("parse"):
+            try:
+                return fast_parser.parse_product(html, url, encoding)
+            except Exception as e:
+                self.metrics.failure("parse", e)
+                return None
     
-    async def fetch_product_details(self, url, index, total):
+    async def fetch_product_details(self, url, index, total=None):
         """Fetch and parse product page with retry"""
-        html = await self.fetch_page(url, enable_js=False)
+        position = f"{index + 1}/{total}" if total else f"{index + 1}"
+        html, encoding = await self.fetch_detail_page(url)
         if html:
-            result = self.parse_product_details(html, url)
+            result = await self.parse_detail_page(html, url, encoding)
             if result:
                 if (index + 1) % 10 == 0:
-                    print(f"[Progress] {index + 1}/{total} products scraped")
+                    print(f"[Progress] {position} products scraped")
                 return result
             else:
-                print(f"[Warning] Failed to parse product {index + 1}/{total}")
+                print(f"[Warning] Failed to parse product {position}")
         else:
-            print(f"[Warning] Failed to fetch product {index + 1}/{total}")
+            print(f"[Warning] Failed to fetch product {position}")
         return None
     
-    async def scrape_all_pages(self, max_pages=10):
+    async def _scrape_product(self, url, index, total=None):
+        """Fetch, parse and emit one product; returns True on success"""
+        product = await self.fetch_product_details(url, index, total)
+        if product:
+            self.fetch_counts["ok"] += 1
+            if self.query_tags:
+                product.queries = self.query_tags.get(url, [])
+            if self.journal:
+                self.journal.mark_ad_done(url, product)
+            self._emit(product)
+            return True
+        self.fetch_counts["failed"] += 1
+        if self.journal:
+            self.journal.mark_ad_failed(url, "fetch or parse failed")
+        return False
+    
+    async def fetch_listing(self, url):
+        """Fetch a listing/search page and return its ad URLs (None if the fetch failed)"""
+        if url in self.completed_listing_pages:
+            return []  # Its ads are already in the journal
+        html = await self.fetch_page(url, enable_js=True)  # Enable JS for listings
+        if not html:
+            self.listing_failures += 1
+            self.fetch_counts["failed"] += 1
+            if self.journal:
+                self.journal.mark_listing_failed(url)
+            return None
+        self.fetch_counts["ok"] += 1
+        urls = self.parse_listing_page(html)
+        if not urls:
+            self.exhausted_listings.add(listing_of(url))  # Paged past this listing's last result
+        if self.journal:
+            self.journal.mark_listing_done(url, urls)
+        return urls
+    
+    def _resume_from_journal(self, urls):
+        """Re-emit products the journal already has and return the ads still left to scrape"""
+        if not self.journal:
+            return urls
+        done = self.journal.done_ads()
+        restored = 0
+        for product in self.journal.iter_products():
+            product = Product.from_dict(product, self.source)
+            if self.validator.validate(product) is not None:
+                self._write(product)
+                restored += 1
+        queued = IdSet()
+        pending = [url for url in urls + self.journal.pending_ads() if url not in done and queued.add(url)]
+        print(f"[Resume] {restored} products restored from journal, {len(pending)} ads left to scrape")
+        return pending
+    
+    async def _fetch_listings(self, listing_urls):
+        """Step 1: fetch listing pages; delta runs page in windows and stop once nothing is new"""
+        if not self.seen_index:
+            return await asyncio.gather(*(self.fetch_listing(url) for url in listing_urls))
+        
+        results = []
+        for start in range(0, len(listing_urls), self.max_workers):
+            window = await asyncio.gather(*(self.fetch_listing(url) for url in listing_urls[start:start + self.max_workers]))
+            results.extend(window)
+            found = [url for urls in window if urls for url in urls]
+            more = start + self.max_workers < len(listing_urls)
+            # Nothing new on the last window is not stopping early: every page was fetched
+            if more and found and all(self.seen_index.is_known(url) for url in found):
+                self.stopped_early = True
+                print(f"[Delta] No new ads on pages {start + 1}-{start + len(window)}, stopping early")
+                break
+        return results
+    
+    def _start_run(self, scope, listings):
+        """Point the frontier, the journal and the seen index at this crawl; `listings` are the listing URLs it covers"""
+        listings = list(listings)
+        if self.frontier:
+            self.frontier.start(crawl_id(listings, self.crawl_id))
+        self._start_journal(listings)
+        self._start_delta(scope, listings)
+    
+    def _finish_run(self):
+        self._finish_journal()
+        self._finish_delta()
+    
+    def _start_journal(self, listings):
+        """Resume only this crawl's pages and ads (a finished crawl starts over)"""
+        if not self.journal:
+            return
+        self.journal.start(crawl_key(listings))
+        self.completed_listing_pages = self.journal.completed_listing_pages()
+    
+    def _finish_journal(self):
+        """A crawl with no failed listing pages and no ads left to retry is finished"""
+        if not self.journal:
+            return
+        self.journal.commit()
+        if not self.listing_failures and not self.journal.pending_ads():
+            self.journal.finish()
+        else:
+            print("[Journal] Crawl incomplete, re-run with the same journal to resume it")
+    
+    def _start_delta(self, scope, listings):
+        """Open the seen index for this run (delta mode only); `listings` are the listing URLs the scope covers"""
+        self.listing_failures = 0
+        self.delta_listings = set(listings)
+        self.exhausted_listings = set()
+        self.stopped_early = False
+        if not self.seen_index_path:
+            return
+        if self.seen_index:
+            self.seen_index.close()
+        self.seen_index = SeenIndex(self.seen_index_path, self.source, scope=scope)
+        print(f"[Delta] Skipping ads checked in the last {self.recheck_after / 86400:g} days")
+    
+    def _skip_recently_checked(self, urls):
+        """Delta mode: drop ads fetched within recheck_after, only refreshing their last_seen"""
+        if not self.seen_index:
+            return urls
+        recent = {url for url in urls if self.seen_index.checked_within(url, self.recheck_after)}
+        self.seen_index.touch(recent)
+        for sink in self.sinks:
+            if hasattr(sink, "touch"):
+                sink.touch(recent)
+        return [url for url in urls if url not in recent]
+    
+    def _finish_delta(self):
+        """Emit removal records if every listing of the scope was paged to its end, then close the index"""
+        if not self.seen_index:
+            return
+        # One query running out of pages says nothing about a query that stopped at max_pages
+        exhausted = self.delta_listings <= self.exhausted_listings
+        if exhausted and not self.stopped_early and not self.listing_failures:
+            for key in self.seen_index.mark_disappeared():
+                self._write({"listing_url": key, "change": "removed"})
+        else:
+            print("[Delta] Crawl did not cover every listing page, removals not computed")
+        print(f"[Delta] {self.seen_index.summary()}")
+        self.seen_index.close()
+        self.seen_index = None
+    
+    async def _scrape_details(self, unique_urls, start_time):
+        """Step 2: fetch, parse and emit every ad concurrently, then report the run"""
+        print(f"\n[Step 2] Scraping product details ({self.detail_backend} backend)...")
+        self.http_fallbacks = 0
+        detail_tasks = [self._scrape_product(url, i, len(unique_urls)) for i, url in enumerate(unique_urls)]
+        try:
+            results = await asyncio.gather(*detail_tasks, return_exceptions=True)
+        finally:
+            if self.http_fetcher:
+                await self.http_fetcher.close()
+        if self.http_fallbacks:
+            print(f"[Info] {self.http_fallbacks} product pages fell back to Selenium")
+        
+        scraped_count = sum(1 for r in results if r is True)
+        self.fetch_counts["failed"] += sum(1 for r in results if isinstance(r, BaseException))
+        
+        failed_count = len(unique_urls) - scraped_count
+        elapsed = time.time() - start_time
+        
+        notes = [f"[Warning] {failed_count} products failed to scrape"] if failed_count > 0 else []
+        self._print_summary(f"Scraped {scraped_count}/{len(unique_urls)} products", elapsed, scraped_count, notes)
+    
+    async def scrape_pipelined(self, listing_urls, queue_size=200, detail_workers=50):
+        """Feed ad URLs from each listing page straight into concurrent detail workers"""
+        print(f"[Pipeline] {detail_workers} detail workers, queue size {queue_size}\n")
+        start_time = time.time()
+        queue = asyncio.Queue(maxsize=queue_size)
+        seen_urls = self.journal.done_ads() if self.journal else IdSet()
+        counts = {"queued": 0, "dequeued": 0, "scraped": 0}
+        
+        async def enqueue(urls):
+            for url in self._skip_recently_checked([url for url in urls if url not in seen_urls]):
+                if seen_urls.add(url):
+                    counts["queued"] += 1
+                    await queue.put(url)  # Blocks while detail workers catch up
+                    self.metrics.set_gauge("queue_depth", queue.qsize(), queue="pipeline")
+        
+        async def produce(page_number, listing_url):
+            urls = await self.fetch_listing(listing_url)
+            if urls is None:
+                return
+            print(f"[Page {page_number}] Found {len(urls)} products")
+            await enqueue(urls)
+        
+        async def consume():
+            while True:
+                url = await queue.get()
+                self.metrics.set_gauge("queue_depth", queue.qsize(), queue="pipeline")
+                if url is None:
+                    return
+                index = counts["dequeued"]
+                counts["dequeued"] += 1
+                try:
+                    scraped = await self._scrape_product(url, index)
+                except Exception as e:
+                    print(f"[Warning] Failed to scrape {url}: {e}")
+                    self.fetch_counts["failed"] += 1
+                    continue
+                if scraped:
+                    counts["scraped"] += 1
+                    if counts["scraped"] == 1:
+                        print(f"[Pipeline] First product after {time.time() - start_time:.1f} seconds")
+        
+        self.http_fallbacks = 0
+        consumers = [asyncio.create_task(consume()) for _ in range(detail_workers)]
+        try:
+            producers = [produce(i, url) for i, url in enumerate(listing_urls, 1)]
+            if self.journal:
+                producers.append(enqueue(self._resume_from_journal([])))
+            await asyncio.gather(*producers)
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            for task in consumers:
+                task.cancel()
+            if self.http_fetcher:
+                await self.http_fetcher.close()
+        
+        total = counts["queued"]
+        elapsed = time.time() - start_time
+        if self.http_fallbacks:
+            print(f"[Info] {self.http_fallbacks} product pages fell back to Selenium")
+        failed = total - counts["scraped"]
+        notes = [f"[Warning] {failed} products failed to scrape"] if failed > 0 else []
+        self._print_summary(f"Scraped {counts['scraped']}/{total} products", elapsed, counts["scraped"], notes)
+    
+    async def scrape_distributed(self, listing_urls, lease_size=20, detail_workers=50, poll_interval=2.0):
+        """Work through the shared frontier alongside other workers until nothing is left
+        
+        Every worker seeds the same listing pages (the frontier keeps one copy) and
+        leases them in batches; the ad URLs found are seeded back, so an ad any worker
+        already found is never fetched twice. Ads are leased up to detail_workers at a
+        time, each product is emitted here and reported to the frontier, and a
+        worker that dies simply lets its leases expire for the others to pick up.
+        
+        The journal and the delta recheck skip apply as in the other modes. A
+        worker only sees its share of the listings, so removals are never computed.
+        """
+        frontier = self.frontier
+        worker = self.worker_id
+        print(f"[Distributed] Worker {worker} on crawl {frontier.crawl}, {detail_workers} detail workers")
+        start_time = time.time()
+        added = await frontier.seed("listing", listing_urls)
+        print(f"[Distributed] Seeded {added} new listing pages ({len(listing_urls) - added} already in the frontier)")
+        counts = {"listings": 0, "started": 0, "scraped": 0, "failed": 0}
+        tasks = set()
+        done = self.journal.done_ads() if self.journal else IdSet()
+        if self.journal:
+            await frontier.seed("ad", self._resume_from_journal([]))
+        
+        async def report(kind, url, result=None):
+            if not await frontier.complete(kind, url, worker, result):
+                print(f"[Warning] Lease on {url} expired before it was reported; another worker redoes it")
+        
+        async def fetch_listing(url):
+            if url in self.completed_listing_pages:
+                # Its ads are already in the journal and were seeded or restored above
+                await report("listing", url, 0)
+                return
+            html = await self.fetch_page(url, enable_js=True)
+            with self.metrics.stage("frontier_report"):
+                if not html:
+                    self.listing_failures += 1
+                    self.fetch_counts["failed"] += 1
+                    if self.journal:
+                        self.journal.mark_listing_failed(url)
+                    await frontier.fail("listing", url, worker, "fetch failed")
+                    return
+                self.fetch_counts["ok"] += 1
+                urls = self.parse_listing_page(html)
+                if self.journal:
+                    self.journal.mark_listing_done(url, urls)
+                new = await frontier.seed("ad", urls)
+                await report("listing", url, len(urls))
+            counts["listings"] += 1
+            print(f"[Listing] Found {len(urls)} products ({new} new) on {url}")
+        
+        async def listing_loop():
+            while True:
+                with self.metrics.stage("frontier_lease"):
+                    urls = await frontier.lease("listing", worker, self.max_workers)
+                if urls:
+                    await asyncio.gather(*(fetch_listing(url) for url in urls))
+                    continue
+                listings = (await frontier.counts())["listing"]
+                if not listings.get("pending") and not listings.get("leased"):
+                    return
+                await asyncio.sleep(poll_interval)  # Another worker holds the rest; its leases may still expire
+        
+        async def scrape_ad(url):
+            index = counts["started"]
+            counts["started"] += 1
+            try:
+                product = await self.fetch_product_details(url, index)
+            except Exception as e:
+                print(f"[Warning] Failed to scrape {url}: {e}")
+                product = None
+            self.fetch_counts["ok" if product else "failed"] += 1
+            if self.journal:
+                if product:
+                    self.journal.mark_ad_done(url, product)
+                else:
+                    self.journal.mark_ad_failed(url, "fetch or parse failed")
+            try:
+                with self.metrics.stage("frontier_report"):
+                    if product:
+                        # Rejected products are done too, just not reported for export
+                        await report("ad", url, product if self._emit(product) else None)
+                        counts["scraped"] += 1
+                    else:
+                        await frontier.fail("ad", url, worker, "fetch or parse failed")
+                        counts["failed"] += 1
+            except Exception as e:
+                # The lease runs out and another worker retries the ad
+                print(f"[Warning] Could not report {url} to the frontier: {e}")
+        
+        async def ad_loop():
+            while True:
+                free = detail_workers - len(tasks)
+                if free > 0:
+                    with self.metrics.stage("frontier_lease"):
+                        urls = await frontier.lease("ad", worker, min(lease_size, free))
+                    # Ads restored from the journal or checked recently are done without a fetch
+                    todo = self._skip_recently_checked([url for url in urls if url not in done])
+                    if len(todo) < len(urls):
+                        with self.metrics.stage("frontier_report"):
+                            for url in set(urls).difference(todo):
+                                await report("ad", url)
+                    for url in todo:
+                        task = asyncio.create_task(scrape_ad(url))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    if urls:
+                        continue
+                if not tasks and is_finished(await frontier.counts()):
+                    return
+                if tasks:
+                    await asyncio.wait(tasks, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(poll_interval)
+        
+        self.http_fallbacks = 0
+        try:
+            await asyncio.gather(listing_loop(), ad_loop())
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.http_fetcher:
+                await self.http_fetcher.close()
+            status = format_counts(await frontier.counts())
+            await frontier.close()
+        
+        elapsed = time.time() - start_time
+        if self.http_fallbacks:
+            print(f"[Info] {self.http_fallbacks} product pages fell back to Selenium")
+        notes = []
+        if counts["failed"]:
+            notes.append(f"[Warning] {counts['failed']} products failed on this worker "
+                         "(retried by any worker up to the attempt limit)")
+        notes.append(f"[Distributed] Frontier: {status}")
+        self._print_summary(f"This worker scraped {counts['scraped']} products from {counts['listings']} listing pages",
+                            elapsed, counts["scraped"], notes)
+    
+    async def scrape_all_pages(self, max_pages=10, pipeline=False):
         """Scrape all pages"""
         print(f"\n[Start] Scraping {max_pages} pages from Dubizzle")
-        print(f"[Workers] {self.max_workers} parallel browsers\n")
+        print(f"[Workers] Up to {self.max_workers} parallel browsers (adaptive)\n")
         start_time = time.time()
         
-        print("[Step 1] Fetching listing pages...")
+        self.products = []
+        self._start_run("all", [self.base_url])
+        
         listing_urls = [f"{self.base_url}?page={i}" for i in range(1, max_pages + 1)]
+        if self.frontier:
+            await self.scrape_distributed(listing_urls)
+            self._finish_run()
+            return
+        if pipeline:
+            await self.scrape_pipelined(listing_urls)
+            self._finish_run()
+            return
         
-        listing_tasks = [self.fetch_page(url, enable_js=True) for url in listing_urls]  # Enable JS for listings
-        listing_results = await asyncio.gather(*listing_tasks)
+        print("[Step 1] Fetching listing pages...")
         
-        all_urls = []
-        for i, html in enumerate(listing_results, 1):
-            if html:
-                urls = self.parse_listing_page(html)
-                all_urls.extend(urls)
+        listing_results = await self._fetch_listings(listing_urls)
+        
+        # Deduplicated in page order; the IdSet keeps 8 bytes per URL rather than a second copy of each string
+        seen_urls = IdSet()
+        unique_urls = []
+        for i, urls in enumerate(listing_results, 1):
+            if urls is not None:
+                unique_urls.extend(url for url in urls if seen_urls.add(url))
                 print(f"[Page {i}] Found {len(urls)} products")
         
-        unique_urls = list(set(all_urls))
         print(f"\n[Step 1 Done] Found {len(unique_urls)} unique products")
+        unique_urls = self._skip_recently_checked(self._resume_from_journal(unique_urls))
         
         if not unique_urls:
-            print("[Error] No products found")
+            print("[Done] Nothing left to scrape" if self.journal or self.seen_index else "[Error] No products found")
+            self._finish_run()
             return
         
-        print(f"\n[Step 2] Scraping product details (JS disabled for speed)...")
-        detail_tasks = [self.fetch_product_details(url, i, len(unique_urls)) for i, url in enumerate(unique_urls)]
-        results = await asyncio.gather(*detail_tasks, return_exceptions=True)
-        
-        self.products = [r for r in results if r and not isinstance(r, Exception)]
-        
-        failed_count = len(unique_urls) - len(self.products)
-        elapsed = time.time() - start_time
-        
-        print(f"\n[Done] Scraped {len(self.products)}/{len(unique_urls)} products in {elapsed:.1f} seconds")
-        if failed_count > 0:
-            print(f"[Warning] {failed_count} products failed to scrape")
-        if elapsed > 0:
-            print(f"[Speed] {len(self.products)/elapsed:.1f} products/second")
+        await self._scrape_details(unique_urls, start_time)
+        self._finish_run()
     
-    async def scrape_search(self, query, max_pages=10):
+    async def scrape_search(self, query, max_pages=10, pipeline=False):
         """Search and scrape specific products"""
         query_slug = f"q-{query.lower().replace(' ', '-')}/"
         search_url = f"{self.base_url}{query_slug}"
         
         print(f"\n[Search] Query: '{query}'")
         print(f"[URL] {search_url}")
-        print(f"[Workers] {self.max_workers} parallel browsers\n")
+        print(f"[Workers] Up to {self.max_workers} parallel browsers (adaptive)\n")
         start_time = time.time()
         
         self.products = []
-        
-        print("[Step 1] Fetching search results...")
-        all_urls = []
+        self._start_run(f"q:{query.lower()}", [search_url])
         
         search_urls = [f"{search_url}?page={i}" for i in range(1, max_pages + 1)]
-        search_tasks = [self.fetch_page(url, enable_js=True) for url in search_urls]  # Enable JS for search
-        search_results = await asyncio.gather(*search_tasks)
+        if self.frontier:
+            await self.scrape_distributed(search_urls)
+            self._finish_run()
+            return
+        if pipeline:
+            await self.scrape_pipelined(search_urls)
+            self._finish_run()
+            return
         
-        for i, html in enumerate(search_results, 1):
-            if html:
-                urls = self.parse_listing_page(html)
-                if urls:
-                    all_urls.extend(urls)
-                    print(f"[Page {i}] Found {len(urls)} products")
+        print("[Step 1] Fetching search results...")
+        search_results = await self._fetch_listings(search_urls)
+        
+        seen_urls = IdSet()
+        unique_urls = []
+        for i, urls in enumerate(search_results, 1):
+            if urls is not None:
+                unique_urls.extend(url for url in urls if seen_urls.add(url))
+                print(f"[Page {i}] Found {len(urls)} products")
         
-        unique_urls = list(set(all_urls))
         print(f"\n[Step 1 Done] Found {len(unique_urls)} unique products")
+        unique_urls = self._skip_recently_checked(self._resume_from_journal(unique_urls))
         
         if not unique_urls:
-            print("[Error] No products found")
+            print("[Done] Nothing left to scrape" if self.journal or self.seen_index else "[Error] No products found")
+            self._finish_run()
             return
         
-        print(f"\n[Step 2] Scraping product details (JS disabled for speed)...")
-        detail_tasks = [self.fetch_product_details(url, i, len(unique_urls)) for i, url in enumerate(unique_urls)]
-        results = await asyncio.gather(*detail_tasks, return_exceptions=True)
+        await self._scrape_details(unique_urls, start_time)
+        self._finish_run()
+    
+    async def scrape_searches(self, queries, max_pages=10):
+        """Search several queries in one run, fetching each ad once however many queries match it
         
-        self.products = [r for r in results if r and not isinstance(r, Exception)]
+        Every query shares the driver pool and the HTTP session, ad URLs are
+        deduplicated across queries before the detail phase, and each product
+        gets a "queries" list with every query whose results contained it.
+        """
+        queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+        if not queries:
+            print("[Error] No search queries given")
+            return
+        print(f"\n[Search] {len(queries)} queries: {', '.join(repr(q) for q in queries)}")
+        print(f"[Workers] Up to {self.max_workers} parallel browsers (adaptive)\n")
+        start_time = time.time()
         
-        failed_count = len(unique_urls) - len(self.products)
-        elapsed = time.time() - start_time
+        self.products = []
+        query_urls = {query: f"{self.base_url}q-{query.lower().replace(' ', '-')}/" for query in queries}
+        self._start_run("queries:" + "|".join(sorted(q.lower() for q in queries)), query_urls.values())
         
-        print(f"\n[Done] Scraped {len(self.products)}/{len(unique_urls)} products in {elapsed:.1f} seconds")
-        if failed_count > 0:
-            print(f"[Warning] {failed_count} products failed to scrape")
-        if elapsed > 0:
-            print(f"[Speed] {len(self.products)/elapsed:.1f} products/second")
-    
-    async def save_data(self, filename="dubizzle_products.json"):
-        """Save products to JSON file"""
-        output = {
-            "scraped_at": datetime.now().isoformat(),
-            "total_products": len(self.products),
-            "products": self.products
-        }
-        
-        async with aiofiles.open(filename, "w", encoding="utf-8") as f:
-            await f.write(json.dumps(output, indent=2, ensure_ascii=False))
-        
-        print(f"\n[Saved] {len(self.products)} products to {filename}")
+        # Page 1 of every query first, so a delta run stopping early still covered each query
+        pages = [(query, page) for page in range(1, max_pages + 1) for query in queries]
+        search_urls = [f"{query_urls[query]}?page={page}" for query, page in pages]
+        
+        print("[Step 1] Fetching search results...")
+        search_results = await self._fetch_listings(search_urls)
+        
+        matched = {}
+        found = 0
+        for (query, page), urls in zip(pages, search_results):
+            if urls is not None:
+                found += len(urls)
+                print(f"[{query} page {page}] Found {len(urls)} products")
+                for url in urls:
+                    tags = matched.setdefault(url, [])
+                    if query not in tags:
+                        tags.append(query)
+        
+        print(f"\n[Step 1 Done] Found {len(matched)} unique products ({found - len(matched)} duplicates across pages and queries)")
+        self.query_tags = matched
+        try:
+            unique_urls = self._skip_recently_checked(self._resume_from_journal(list(matched)))
+            if not unique_urls:
+                print("[Done] Nothing left to scrape" if self.journal or self.seen_index else "[Error] No products found")
+                self._finish_run()
+                return
+            await self._scrape_details(unique_urls, start_time)
+            self._finish_run()
+        finally:
+            self.query_tags = None
     
     def cleanup(self):
-        """Cleanup thread pool"""
+        """Cleanup thread pool, pooled browsers, parse workers and any open sinks"""
         self.executor.shutdown(wait=True)
+        self.driver_pool.shutdown()
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+        self.close_sinks()
+        if self.journal:
+            self.journal.close()
+        if self.cache:
+            self.cache.close()
+        if self.seen_index:
+            self.seen_index.close()
 
 async def main():
     print("="*60)
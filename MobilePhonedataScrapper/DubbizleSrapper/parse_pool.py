@@ -0,0 +1,96 @@
+# Process pool for ad page parsing, so lxml work runs on every core instead of the event loop thread
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fast_parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.metrics import Metrics
+
+
+def parse_product_record(html, encoding=None):
+    """Worker side: parse one ad page into a slotted Product (the URL stays in the parent)
+
+    A page that fails to parse comes back as the exception's type name instead.
+    """
+    try:
+        return fast_parser.parse_product(html, None, encoding)
+    except Exception as e:
+        return type(e).__name__
+
+
+class ParsePool:
+    """ProcessPoolExecutor sized to the cores, with a cap on pages waiting to be parsed
+
+    Raw response bytes are sent to the workers as-is (no decode in the parent) and
+    only the compact Product record comes back. Callers block in parse_product() once
+    `max_pending` pages are queued, so fetching can never run far ahead of parsing.
+    """
+
+    def __init__(self, workers=None, max_pending=None, metrics=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.executor = None
+        self.stats = {"parsed": 0, "failed": 0, "waited": 0.0}
+        # Parse time, back-pressure wait, pages queued and failure reasons (a private registry if none is shared)
+        self.metrics = metrics or Metrics()
+        self._slots = None
+
+    def _ensure_executor(self):
+        if self.executor is None:
+            # spawn: forking a process that already runs browser/driver threads is unsafe
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    async def parse_product(self, html, url, encoding=None):
+        """Parse one ad page (str or bytes) in a worker process; None if it could not be parsed"""
+        if self._slots is None:
+            # Created lazily so the pool can be built outside a running event loop
+            self._slots = asyncio.Semaphore(self.max_pending)
+        started = time.monotonic()
+        async with self._slots:
+            waited = time.monotonic() - started
+            self.stats["waited"] += waited
+            self.metrics.observe("parse_queue_wait", waited)
+            self.metrics.add_gauge("queue_depth", 1, queue="parse_pool")
+            loop = asyncio.get_running_loop()
+            executor = self._ensure_executor()
+            try:
+                record = await loop.run_in_executor(executor, parse_product_record, html, encoding)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool for the next pages
+                self._discard(executor)
+                record = "BrokenProcessPool"
+            finally:
+                self.metrics.add_gauge("queue_depth", -1, queue="parse_pool")
+                self.metrics.observe("parse", time.monotonic() - started - waited)
+        if record is None or isinstance(record, str):
+            self.stats["failed"] += 1
+            self.metrics.failure("parse", record or "empty")
+            return None
+        self.stats["parsed"] += 1
+        record.listing_url = url
+        return record
+
+    def summary(self):
+        s = self.stats
+        return (f"{self.workers} processes, {s['parsed']} parsed, {s['failed']} failed, "
+                f"{s['waited']:.1f}s waiting on back-pressure")
+
+    def _discard(self, executor):
+        """Drop a broken pool without waiting on the event loop; every other page it held fails on its own"""
+        if self.executor is executor:
+            self.executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Final close: wait for the workers to exit"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,100 @@
+# Compare the lxml/XPath parsers against the BeautifulSoup reference: same output, less time
+import argparse
+import glob
+import os
+import sys
+import time
+
+import fast_parser
+import soup_parser
+from sample_pages import pages_from_results
+
+PARSERS = {"soup": soup_parser, "lxml": fast_parser}
+
+
+def load_pages(html_dir=None, json_files=()):
+    """(kind, name, html) for saved .html pages plus pages rendered from saved JSON results"""
+    pages = []
+    if html_dir:
+        for path in sorted(glob.glob(os.path.join(html_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            kind = "listing" if 'aria-label="Listing"' in html else "detail"
+            pages.append((kind, os.path.basename(path), html))
+    for json_path in json_files:
+        for i, (kind, html) in enumerate(pages_from_results(json_path)):
+            pages.append((kind, f"{os.path.basename(json_path)}#{kind}{i}", html))
+    return pages
+
+
+def parse(module, kind, name, html):
+    if kind == "listing":
+        return module.parse_listing_page(html)
+    return module.parse_product_details(html, name)
+
+
+def check_identical(pages):
+    """Names of pages where the two parsers disagree (fast_parser's Products compared in output form)"""
+    mismatches = []
+    for kind, name, html in pages:
+        fast = parse(fast_parser, kind, name, html)
+        if kind == "detail" and fast is not None:
+            fast = fast.to_dict()
+        if parse(soup_parser, kind, name, html) != fast:
+            mismatches.append(name)
+    return mismatches
+
+
+def time_parser(module, pages, kind, repeat):
+    """Best-of-`repeat` seconds to parse every page of one kind"""
+    selected = [(k, n, h) for k, n, h in pages if k == kind]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for k, name, html in selected:
+            parse(module, k, name, html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(selected), best
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Benchmark Dubizzle HTML parsers")
+    parser.add_argument("html_dir", nargs="?", help="Directory of saved listing/detail .html pages")
+    parser.add_argument("--from-json", nargs="*", default=None,
+                        help="Render pages from saved results files (default: the *.json files next to this script)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing rounds; the best round is reported")
+    args = parser.parse_args()
+
+    json_files = args.from_json
+    if json_files is None:
+        json_files = [] if args.html_dir else sorted(glob.glob(os.path.join(here, "*.json")))
+    pages = load_pages(args.html_dir, json_files)
+    if not pages:
+        print("[Error] No pages to benchmark")
+        return 2
+
+    size_mb = sum(len(html) for _, _, html in pages) / 1e6
+    print(f"[Pages] {len(pages)} pages, {size_mb:.1f} MB of HTML")
+
+    mismatches = check_identical(pages)
+    if mismatches:
+        print(f"[Mismatch] {len(mismatches)} pages parse differently, e.g. {mismatches[:5]}")
+    else:
+        print("[Check] Both parsers produce identical output on every page")
+
+    for kind in ("detail", "listing"):
+        timings = {name: time_parser(module, pages, kind, args.repeat) for name, module in PARSERS.items()}
+        count = timings["soup"][0]
+        if not count:
+            continue
+        for name, (_, seconds) in timings.items():
+            print(f"[{kind.title()}] {name:>4}: {seconds:.3f}s, {count / seconds:.0f} pages/second")
+        print(f"[{kind.title()}] speedup: {timings['soup'][1] / timings['lxml'][1]:.1f}x")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
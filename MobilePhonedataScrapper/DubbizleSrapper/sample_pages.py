@@ -0,0 +1,80 @@
+# Render Dubizzle-shaped HTML from saved JSON results, for parser checks and offline benchmarks
+import html
+import json
+import random
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title} | Dubizzle Egypt</title>
+<script>window.state = {state};</script>
+<style>._24469da7{{font-weight:700}} ._9a8eacd9{{display:flex}}</style>
+</head><body><div id="body-wrapper"><header><nav>{nav}</nav></header><main>
+"""
+PAGE_TAIL = """</main><footer>{nav}</footer></div></body></html>"""
+
+
+def _nav(rng, links=40):
+    return "".join(
+        f'<a href="/en/mobile-phones-tablets-accessories-numbers/c{rng.randint(1, 999)}/">'
+        f'<span class="_8918c0a8">Category {i}</span></a>'
+        for i in range(links)
+    )
+
+
+def _filler(rng, blocks):
+    """Unrelated markup so pages are roughly as heavy as the live ones"""
+    return "".join(
+        f'<div class="a{rng.randint(0, 9999):04x}"><div><span>Related item {i}</span>'
+        f'<span class="_95eae7db">EGP {rng.randint(1000, 90000):,}</span></div></div>'
+        for i in range(blocks)
+    )
+
+
+def render_detail_page(product, verified=False, filler=1000, seed=0):
+    """Ad page with the elements parse_product_details reads"""
+    rng = random.Random(seed)
+    e = html.escape
+    if verified:
+        seller = ('<span class="_8206696c b7af14b4">See profile</span>'
+                  f'<div class="_92439ac7"><span class="_9a85fb36 b7af14b4">{e(product["seller_name"])}</span></div>')
+    elif product.get("seller_name") not in (None, "N/A"):
+        seller = f'<span class="_8206696c b7af14b4">{e(product["seller_name"])}</span>'
+    else:
+        seller = ""
+    price = ""
+    if product.get("price") not in (None, "N/A"):
+        price = f'<span class="_24469da7" aria-label="Price">{e(product["price"])}</span>'
+    rows = "".join(
+        f'<div class="_9a8eacd9"><span class="_3af3a16a">{e(key)}</span><span class="_8206696c">{e(value)}</span></div>'
+        for key, value in (product.get("details") or {}).items()
+    )
+    body = (
+        f'<div class="_1075545d"><h1 class="a38b8112">{e(product.get("product_name", ""))}</h1>{price}'
+        f'<span aria-label="Location"><span class="_8918c0a8">{e(product.get("location", ""))}</span></span></div>'
+        f'<aside>{seller}</aside><div class="_92439ac7 b44ca0b3">{rows}</div>{_filler(rng, filler)}'
+    )
+    state = json.dumps({"ad": {"title": product.get("product_name"), "pad": "x" * 20000}})
+    return PAGE_HEAD.format(title=e(product.get("product_name", "")), state=state, nav=_nav(rng)) + body + PAGE_TAIL.format(nav=_nav(rng))
+
+
+def render_listing_page(ad_urls, filler=50, seed=0):
+    """Search/listing page with one <li aria-label="Listing"> per ad"""
+    rng = random.Random(seed)
+    items = "".join(
+        f'<li aria-label="Listing"><article><div class="_1075545d"><a href="{html.escape(url.replace("https://www.dubizzle.com.eg", ""))}">'
+        f'<img src="/thumb/{i}.jpg" alt=""></a><h2>Ad {i}</h2><span aria-label="Price">EGP {rng.randint(1000, 90000):,}</span></div></article></li>'
+        for i, url in enumerate(ad_urls)
+    )
+    body = f'<ul class="_357a9937">{items}</ul>{_filler(rng, filler)}'
+    state = json.dumps({"listings": len(ad_urls), "pad": "x" * 2000})
+    return PAGE_HEAD.format(title="Mobile Phones", state=state, nav=_nav(rng)) + body + PAGE_TAIL.format(nav=_nav(rng))
+
+
+def pages_from_results(json_path, per_listing=45):
+    """Yield (kind, html) pages built from a saved *_results.json / *_products.json file"""
+    with open(json_path, encoding="utf-8") as f:
+        products = json.load(f).get("products", [])
+    for i, product in enumerate(products):
+        yield "detail", render_detail_page(product, verified=(i % 5 == 0), seed=i)
+    urls = [p["listing_url"] for p in products if p.get("listing_url")]
+    for start in range(0, len(urls), per_listing):
+        yield "listing", render_listing_page(urls[start:start + per_listing], seed=start)
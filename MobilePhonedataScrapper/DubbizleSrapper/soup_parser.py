@@ -0,0 +1,76 @@
+# Reference BeautifulSoup parsers for Dubizzle pages (kept to check fast_parser against)
+from bs4 import BeautifulSoup
+
+
+def parse_listing_page(html):
+    """Extract product URLs from listing page"""
+    soup = BeautifulSoup(html, "lxml")
+    listing_items = soup.find_all("li", attrs={"aria-label": "Listing"})
+
+    if not listing_items:
+        listing_items = soup.find_all("article")
+
+    urls = []
+    for item in listing_items:
+        try:
+            article = item if item.name == "article" else item.find("article")
+            if article:
+                link = article.find("a", href=True)
+                if link and link["href"]:
+                    full_url = f"https://www.dubizzle.com.eg{link['href']}"
+                    if "/ad/" in full_url:
+                        urls.append(full_url)
+        except:
+            continue
+    return urls
+
+
+def parse_product_details(html, url):
+    """Extract product details from product page"""
+    try:
+        soup = BeautifulSoup(html, "lxml")
+
+        h1 = soup.find("h1")
+        product_name = h1.get_text(strip=True) if h1 else "N/A"
+
+        price_span = soup.find("span", class_="_24469da7", attrs={"aria-label": "Price"})
+        price = price_span.get_text(strip=True) if price_span else "N/A"
+
+        # Try to find seller name (normal users)
+        seller_span = soup.find("span", class_="_8206696c b7af14b4")
+
+        # If not found or contains "See profile", try verified user structure
+        if not seller_span or "See profile" in seller_span.get_text(strip=True):
+            # For verified users, look for the name in a different location
+            # Usually in a span or div before the "See profile" link
+            verified_container = soup.find("div", class_="_92439ac7")
+            if verified_container:
+                name_span = verified_container.find("span", class_="_9a85fb36 b7af14b4")
+                if name_span and "See profile" not in name_span.get_text(strip=True):
+                    seller_span = name_span
+
+        seller_name = seller_span.get_text(strip=True) if seller_span and "See profile" not in seller_span.get_text(strip=True) else "N/A"
+        location_span = soup.find("span", attrs={"aria-label": "Location"})
+        location = location_span.get_text(strip=True) if location_span else "N/A"
+
+        details = {}
+        detail_containers = soup.find_all("div", class_="_92439ac7")
+        for container in detail_containers:
+            inner_divs = container.find_all("div", class_="_9a8eacd9")
+            for div in inner_divs:
+                spans = div.find_all("span")
+                if len(spans) >= 2:
+                    key = spans[0].get_text(strip=True)
+                    value = spans[1].get_text(strip=True)
+                    details[key] = value
+
+        return {
+            "product_name": product_name,
+            "price": price,
+            "seller_name": seller_name,
+            "location": location,
+            "listing_url": url,
+            "details": details
+        }
+    except:
+        return None
@@ -2,10 +2,20 @@
 import asyncio
 import aiohttp
 import json
-from datetime import datetime
-import aiofiles
 import os
+import sys
 from pathlib import Path
+from urllib.parse import urlencode
+
+# Shared helpers live one level up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.sinks import SinkMixin
+from common.seen_index import SeenIndex, record_key
+from common.adaptive_limiter import AdaptiveLimiter, THROTTLE_STATUSES, host_of, parse_retry_after
+from common.response_cache import ResponseCache, cache_key
+from common.product import Product
+from common.metrics import Metrics
+from common.validation import Validator
 
 # Load environment variables
 try:
@@ -15,8 +25,49 @@ try:
 except ImportError:
     print("[Warning] python-dotenv not installed. Install with: pip install python-dotenv")
 
-class MobileMasrAlgoliaScraper:
-    def __init__(self, max_concurrent=20):
+# Everything parse_algolia_hit reads; Algolia drops the rest of each (large) variant record
+ATTRIBUTES_TO_RETRIEVE = [
+    "brand_en", "item_en", "ram_en", "storage_en", "color_en", "variant_type_en", "battery_health",
+    "sale_price", "original_price", "is_warranty", "is_insurance", "sim_en", "sku",
+    "vendor_storename", "seller_user_name", "slug_en", "id",
+]
+RESPONSE_FIELDS = ["hits", "nbHits", "nbPages", "page", "facets", "cursor"]
+
+# Algolia never pages past this many hits (paginationLimitedTo), so full exports split the catalog
+PAGINATION_CAP = 1000
+# Full exports split slices above the cap by these facets first, then bisect by price
+SLICE_FACETS = ("brand_en", "variant_type_en")
+PRICE_ATTRIBUTE = "sale_price"
+PRICE_CEILING = 10_000_000
+
+
+def encode_params(params):
+    """Multi-query requests take URL-encoded params; list and bool values are sent as JSON"""
+    return urlencode({key: json.dumps(value) if isinstance(value, (list, bool)) else value
+                      for key, value in params.items()})
+
+
+def facet_filter(facet, value, negate=False):
+    escaped = str(value).replace('"', '\\"')
+    return f'{"NOT " if negate else ""}{facet}:"{escaped}"'
+
+
+def price_filter(low, high):
+    return f"{PRICE_ATTRIBUTE} >= {low} AND {PRICE_ATTRIBUTE} < {high}"
+
+
+def outside_price_filter():
+    """Hits the price bisection never reaches: no price, negative, or at/above PRICE_CEILING
+
+    Negative filters also match records without the attribute. The range overlaps the
+    top price slice by one unit so no boundary price is missed (duplicates are merged by SKU).
+    """
+    return f"NOT {PRICE_ATTRIBUTE}:0 TO {PRICE_CEILING - 1}"
+
+
+class MobileMasrAlgoliaScraper(SinkMixin):
+    def __init__(self, max_concurrent=20, seen_index_path=None, max_retries=3, rate_per_host=50, queries_per_request=10,
+                 cache_path=None, cache_ttl=86400, cache_mode="cache", metrics=None, quarantine_path=None):
         self.base_url = "https://mobilemasr.com/en/category/mobile-phone/products"
         self.algolia_app_id = os.getenv("ALGOLIA_APP_ID")
         self.algolia_api_key = os.getenv("ALGOLIA_API_KEY")
@@ -24,94 +75,425 @@ class MobileMasrAlgoliaScraper:
         
         if not self.algolia_app_id or not self.algolia_api_key:
             raise ValueError("ALGOLIA_APP_ID and ALGOLIA_API_KEY must be set in .env file")
+        # Overridable so offline benchmarks can point the scraper at a local stub
+        self.algolia_host = f"https://{self.algolia_app_id}-dsn.algolia.net"
         
+        self.source = "mobilemasr"
         self.products = []
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # Per-stage timings and failure reasons; pass a shared Metrics to export several scrapers together
+        self.metrics = (metrics or Metrics()).labeled(source=self.source)
+        # Every product is validated and normalized before it is emitted; rejects go to quarantine_path
+        self.validator = Validator(self.source, quarantine_path, self.metrics)
+        # Starts at max_concurrent, grows while Algolia stays healthy and backs off on 429/5xx
+        self.limiter = AdaptiveLimiter(initial=max_concurrent, max_limit=max_concurrent * 2, rate_per_host=rate_per_host)
+        self.max_retries = max_retries
+        # Result pages fetched per multi-query round trip, plus traffic counters for the run summary
+        self.queries_per_request = queries_per_request
+        self.request_count = 0
+        # Algolia calls that returned data vs. gave up after retries; a job that emits nothing is judged by these
+        self.fetch_counts = {"ok": 0, "failed": 0}
+        self.response_bytes = 0
+        self._init_sinks()
+        # Optional seen index (keyed by SKU): delta runs emit only new, changed and removed products
+        self.seen_index_path = seen_index_path
+        self.seen_index = None
+        # Optional on-disk cache of Algolia responses keyed by URL + payload ("replay" never hits the network)
+        self.cache = ResponseCache(cache_path, ttl=cache_ttl, mode=cache_mode) if cache_path else None
         
-    async def search_algolia(self, session, query="", page=0, hits_per_page=100):
-        """Search products using Algolia API"""
-        url = f"https://{self.algolia_app_id}-dsn.algolia.net/1/indexes/{self.algolia_index}/query"
+    def _query_params(self, query, page, hits_per_page):
+        """Search parameters: only the attributes parse_algolia_hit reads, no highlighting or snippets"""
+        return {
+            "query": query,
+            "page": page,
+            "hitsPerPage": hits_per_page,
+            "attributesToRetrieve": ATTRIBUTES_TO_RETRIEVE,
+            "attributesToHighlight": [],
+            "attributesToSnippet": [],
+            "responseFields": RESPONSE_FIELDS,
+        }
+    
+    async def _post_algolia(self, session, url, payload, probe=False):
+        """POST to Algolia through the adaptive limiter, retrying timeouts and throttling
         
+        A `probe` (a request allowed to be refused, like browse without the ACL) is
+        not counted as a failed fetch.
+        """
+        data = await self._request_algolia(session, url, payload)
+        if data is not None:
+            self.fetch_counts["ok"] += 1
+        elif not probe:
+            self.fetch_counts["failed"] += 1
+        return data
+    
+    async def _request_algolia(self, session, url, payload):
+        if self.cache:
+            # Search responses carry no validators, so entries are reused while fresh (or in replay)
+            key = cache_key(url, payload)
+            cached = self.cache.get(key)
+            if cached and (cached.fresh or self.cache.replay):
+                return json.loads(cached.body)
+            if self.cache.replay:
+                return None
         headers = {
             "X-Algolia-Application-Id": self.algolia_app_id,
             "X-Algolia-API-Key": self.algolia_api_key,
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "query": query,
-            "page": page,
-            "hitsPerPage": hits_per_page
-        }
-        
-        async with self.semaphore:
+        metrics = self.metrics
+        for attempt in range(self.max_retries):
+            with metrics.stage("limiter_wait"):
+                started = await self.limiter.acquire(host_of(url))
+            # Only timeouts/connection errors and throttling (429/5xx) are worth retrying
+            failed, throttled, retry_after = False, False, None
             try:
-                async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data
-                    else:
+                with metrics.stage("algolia_request"), metrics.in_flight("algolia"):
+                    async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                        self.request_count += 1
+                        if response.status == 200:
+                            body = await response.read()
+                            self.response_bytes += len(body)
+                            metrics.inc("bytes_fetched_total", len(body), kind="algolia")
+                            if self.cache:
+                                self.cache.put(key, url, body, "utf-8")
+                            with metrics.stage("algolia_decode"):
+                                return json.loads(body)
+                        metrics.failure("algolia_request", f"http_{response.status}")
+                        throttled = response.status in THROTTLE_STATUSES or response.status >= 500
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
                         print(f"[Error] Algolia API returned status {response.status}")
                         text = await response.text()
                         print(f"[Response] {text[:500]}")
             except Exception as e:
+                metrics.failure("algolia_request", e)
+                failed = True
                 print(f"[Error] Failed to query Algolia: {e}")
+            finally:
+                self.limiter.release(started, ok=not failed, throttled=throttled, retry_after=retry_after)
+            if not (failed or throttled):
+                break
+            if attempt < self.max_retries - 1:
+                with metrics.stage("backoff"):
+                    await asyncio.sleep(retry_after or 2 ** attempt)
         return None
     
+    async def search_algolia(self, session, query="", page=0, hits_per_page=100):
+        """Search products using Algolia API"""
+        url = f"{self.algolia_host}/1/indexes/{self.algolia_index}/query"
+        return await self._post_algolia(session, url, self._query_params(query, page, hits_per_page))
+    
+    async def search_algolia_batch(self, session, searches, hits_per_page=100):
+        """Fetch many (query, page) or (query, page, extra_params) searches through the multi-query endpoint
+        
+        Up to `queries_per_request` searches share one round trip and the batches
+        run concurrently. Returns one result per search, in order (None if its batch failed).
+        """
+        url = f"{self.algolia_host}/1/indexes/*/queries"
+        
+        async def run_batch(batch):
+            payload = {
+                "requests": [
+                    {"indexName": self.algolia_index,
+                     "params": encode_params({**self._query_params(query, page, hits_per_page), **(extra[0] if extra else {})})}
+                    for query, page, *extra in batch
+                ],
+                "strategy": "none"
+            }
+            data = await self._post_algolia(session, url, payload)
+            results = (data or {}).get("results") or []
+            return results if len(results) == len(batch) else [None] * len(batch)
+        
+        batches = [searches[i:i + self.queries_per_request] for i in range(0, len(searches), self.queries_per_request)]
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return [result for batch in results for result in batch]
+    
+    def summary_lines(self):
+        return [f"[Concurrency] {self.limiter.summary()}", f"[Traffic] {self.traffic_summary()}"]
+    
+    def traffic_summary(self):
+        summary = f"{self.request_count} Algolia requests, {self.response_bytes / 1e6:.2f} MB received"
+        if self.cache:
+            summary += f"; cache: {self.cache.summary()}"
+        return summary
+    
+    async def _search_pages(self, session, query, max_pages, label=""):
+        """Fetch up to max_pages result pages for one query; returns (hits per page, every page fetched)"""
+        return (await self._search_pages_many(session, [query], max_pages, labels={query: label}))[0]
+    
+    async def _search_pages_many(self, session, queries, max_pages, labels=None):
+        """Fetch result pages for several queries with as few round trips as possible
+        
+        Page 0 of every query goes out in one batch (it tells us nbPages), then all
+        remaining pages of all queries in a second wave. Returns (hits per page,
+        every page fetched) for each query, in order.
+        """
+        labels = labels or {}
+        first_results = await self.search_algolia_batch(session, [(query, 0) for query in queries])
+        
+        searches = []
+        remaining = []
+        for query, first_result in zip(queries, first_results):
+            label = labels.get(query, "")
+            if not first_result:
+                print(f"[Error] Failed to fetch {label}from Algolia")
+                searches.append(([], False))
+                continue
+            total_hits = first_result.get("nbHits", 0)
+            total_pages = first_result.get("nbPages", 1)
+            pages_to_fetch = min(max_pages, total_pages)
+            hits = first_result.get("hits", [])
+            print(f"[Info] {label}Found {total_hits} products across {total_pages} pages")
+            print(f"[{label}Page 1/{pages_to_fetch}] Got {len(hits)} products")
+            # Past PAGINATION_CAP hits Algolia caps nbPages too, so fetching "every" page is still a partial result
+            searches.append(([hits], pages_to_fetch == total_pages and total_hits <= PAGINATION_CAP))
+            remaining.extend((query, page, len(searches) - 1, pages_to_fetch) for page in range(1, pages_to_fetch))
+        
+        results = await self.search_algolia_batch(session, [(query, page) for query, page, _, _ in remaining])
+        for (query, page, position, pages_to_fetch), result in zip(remaining, results):
+            pages = searches[position][0]
+            if result:
+                hits = result.get("hits", [])
+                print(f"[{labels.get(query, '')}Page {page + 1}/{pages_to_fetch}] Got {len(hits)} products")
+                pages.append(hits)
+            else:
+                searches[position] = (pages, False)
+        return searches
+    
+    async def _browse_all(self, session):
+        """Read the whole index through the browse endpoint; None if the API key lacks the browse ACL"""
+        url = f"{self.algolia_host}/1/indexes/{self.algolia_index}/browse"
+        data = await self._post_algolia(session, url, {"hitsPerPage": PAGINATION_CAP,
+                                                       "attributesToRetrieve": ATTRIBUTES_TO_RETRIEVE}, probe=True)
+        if data is None:
+            return None
+        hits = list(data.get("hits", []))
+        while data.get("cursor"):
+            data = await self._post_algolia(session, url, {"cursor": data["cursor"]})
+            if data is None:
+                print("[Error] Browse stopped before the end of the index")
+                return hits, False
+            hits.extend(data.get("hits", []))
+            print(f"[Browse] {len(hits)} products so far")
+        return hits, True
+    
+    async def _count_slices(self, session, filters, facet=None):
+        """nbHits (and counts per value of `facet`) for each filter string, as zero-hit searches"""
+        extra = {"hitsPerPage": 0, "attributesToRetrieve": []}
+        if facet:
+            extra.update(facets=[facet], maxValuesPerFacet=PAGINATION_CAP)
+        searches = [("", 0, {**extra, "filters": f} if f else extra) for f in filters]
+        return await self.search_algolia_batch(session, searches)
+    
+    async def _plan_slices(self, session, total_hits):
+        """Split the catalog into filter slices that each fit under Algolia's pagination cap
+        
+        Slices over the cap are split by each facet in SLICE_FACETS (values the facet
+        does not list land in a NOT-filtered remainder), then bisected by price.
+        Returns [(filter string, hit count)]; a count above the cap could not be split further.
+        """
+        ready, pending = [], []
+        (ready if total_hits <= PAGINATION_CAP else pending).append(([], total_hits))
+        
+        for facet in SLICE_FACETS:
+            if not pending:
+                break
+            results = await self._count_slices(session, [" AND ".join(c) for c, _ in pending], facet)
+            next_pending = []
+            for (conditions, count), result in zip(pending, results):
+                values = ((result or {}).get("facets") or {}).get(facet) or {}
+                if not values:
+                    next_pending.append((conditions, count))  # Not faceted (or the count failed): try the next split
+                    continue
+                children = [(conditions + [facet_filter(facet, value)], n) for value, n in values.items()]
+                rest = count - sum(values.values())
+                if rest > 0:
+                    children.append((conditions + [facet_filter(facet, value, negate=True) for value in values], rest))
+                for child in children:
+                    (ready if child[1] <= PAGINATION_CAP else next_pending).append(child)
+            pending = next_pending
+        
+        # Hits without an in-range price fall outside every price half, so they get a slice of their own
+        outside = [conditions + [outside_price_filter()] for conditions, _ in pending]
+        results = await self._count_slices(session, [" AND ".join(c) for c in outside]) if outside else []
+        for conditions, result in zip(outside, results):
+            count = PAGINATION_CAP + 1 if result is None else result.get("nbHits", 0)
+            if count:
+                ready.append((conditions, count))
+        
+        # Bisect whatever is still too large by price: (conditions, count, low, high)
+        pending = [(conditions, count, 0, PRICE_CEILING) for conditions, count in pending]
+        while pending:
+            halves = []
+            for conditions, count, low, high in pending:
+                if high - low <= 1:
+                    ready.append((conditions + [price_filter(low, high)], count))
+                    continue
+                middle = (low + high) // 2
+                halves += [(conditions, low, middle), (conditions, middle, high)]
+            results = await self._count_slices(session, [" AND ".join(c + [price_filter(lo, hi)]) for c, lo, hi in halves])
+            pending = []
+            for (conditions, low, high), result in zip(halves, results):
+                if result is None:
+                    # Count failed: fetch the slice anyway, flagged as possibly truncated
+                    ready.append((conditions + [price_filter(low, high)], PAGINATION_CAP + 1))
+                    continue
+                count = result.get("nbHits", 0)
+                if count > PAGINATION_CAP:
+                    pending.append((conditions, count, low, high))
+                elif count:
+                    ready.append((conditions + [price_filter(low, high)], count))
+        return [(" AND ".join(conditions), count) for conditions, count in ready if count]
+    
+    async def _fetch_slices(self, session, total_hits):
+        """Plan slices under the cap and fetch each one; returns (hits, every slice fetched in full)"""
+        slices = await self._plan_slices(session, total_hits)
+        print(f"[Slices] {len(slices)} filter slices cover {sum(count for _, count in slices)} hits")
+        truncated = [f for f, count in slices if count > PAGINATION_CAP]
+        for f in truncated:
+            print(f"[Warning] Slice '{f}' still has more than {PAGINATION_CAP} hits and will be truncated")
+        
+        searches = [("", 0, {"filters": f, "hitsPerPage": PAGINATION_CAP} if f else {"hitsPerPage": PAGINATION_CAP})
+                    for f, _ in slices]
+        results = await self.search_algolia_batch(session, searches)
+        hits = [hit for result in results if result for hit in result.get("hits", [])]
+        return hits, not truncated and all(results)
+    
+    async def scrape_full_catalog(self, use_browse=True):
+        """Export every product in the index, not just the first PAGINATION_CAP hits
+        
+        Uses the browse endpoint when the API key allows it, otherwise facet/price
+        slices fetched in parallel. Hits are merged and deduplicated by SKU.
+        """
+        print(f"\n[Start] Exporting the full MobileMasr catalog via Algolia API")
+        print(f"[Concurrency] Adaptive, starting at {self.limiter.limit} concurrent requests (max {self.limiter.max_limit})\n")
+        start_time = asyncio.get_event_loop().time()
+        if self.seen_index_path:
+            # Not "all": that scope belongs to the capped no-query search, whose results are a subset
+            self.seen_index = SeenIndex(self.seen_index_path, self.source, scope="catalog")
+        
+        async with aiohttp.ClientSession() as session:
+            first_result = await self.search_algolia(session, page=0, hits_per_page=0)
+            if not first_result:
+                print("[Error] Failed to fetch from Algolia")
+                self._finish_delta(False)
+                return
+            total_hits = first_result.get("nbHits", 0)
+            print(f"[Info] Index holds {total_hits} products")
+            
+            browsed = await self._browse_all(session) if use_browse else None
+            if browsed is not None:
+                hits, complete = browsed
+                print(f"[Browse] Read {len(hits)} products with the browse endpoint")
+            else:
+                if use_browse:
+                    print("[Info] Browse is not allowed for this API key, splitting the catalog into filter slices")
+                hits, complete = await self._fetch_slices(session, total_hits)
+        
+        products = {}
+        for hit in hits:
+            product_data = self.parse_algolia_hit(hit)
+            if product_data:
+                products.setdefault(record_key(product_data), product_data)
+        print(f"[Dedup] {len(hits)} hits -> {len(products)} unique products")
+        if len(products) < total_hits:
+            print(f"[Warning] {total_hits - len(products)} products of the index were not reached")
+            complete = False  # Unreached SKUs must not be reported as removed
+        for product in products.values():
+            self._emit(product)
+        
+        self._finish_delta(complete)
+        elapsed = asyncio.get_event_loop().time() - start_time
+        
+        self._print_summary(f"Scraped {self.product_count} products", elapsed, self.product_count)
+    
     async def scrape_all_products(self, max_pages=10, search_query=""):
         """Scrape products using Algolia search"""
         print(f"\n[Start] Scraping MobileMasr via Algolia API")
         if search_query:
             print(f"[Search] Query: '{search_query}'")
-        print(f"[Concurrency] Max {self.semaphore._value} concurrent requests\n")
+        print(f"[Concurrency] Adaptive, starting at {self.limiter.limit} concurrent requests (max {self.limiter.max_limit})\n")
         start_time = asyncio.get_event_loop().time()
+        if self.seen_index_path:
+            self.seen_index = SeenIndex(self.seen_index_path, self.source, scope=f"q:{search_query.lower()}" if search_query else "all")
         
         async with aiohttp.ClientSession() as session:
             print("[Step 1] Fetching products from Algolia...")
-            
-            # Fetch first page to get total
-            first_result = await self.search_algolia(session, query=search_query, page=0)
-            
-            if not first_result:
-                print("[Error] Failed to fetch from Algolia")
+            pages, complete = await self._search_pages(session, search_query, max_pages)
+            if not pages:
+                self._finish_delta(False)
                 return
             
-            total_hits = first_result.get("nbHits", 0)
-            total_pages = first_result.get("nbPages", 1)
-            hits = first_result.get("hits", [])
-            
-            print(f"[Info] Found {total_hits} products across {total_pages} pages")
-            print(f"[Page 1/{min(max_pages, total_pages)}] Got {len(hits)} products")
-            
-            # Process first page
-            for hit in hits:
-                product_data = self.parse_algolia_hit(hit)
-                if product_data:
-                    self.products.append(product_data)
-            
-            # Fetch remaining pages
-            pages_to_fetch = min(max_pages, total_pages)
-            if pages_to_fetch > 1:
-                tasks = [
-                    self.search_algolia(session, query=search_query, page=i)
-                    for i in range(1, pages_to_fetch)
-                ]
-                results = await asyncio.gather(*tasks)
-                
-                for i, result in enumerate(results, 2):
-                    if result:
-                        hits = result.get("hits", [])
-                        print(f"[Page {i}/{pages_to_fetch}] Got {len(hits)} products")
-                        for hit in hits:
-                            product_data = self.parse_algolia_hit(hit)
-                            if product_data:
-                                self.products.append(product_data)
+            for hits in pages:
+                for hit in hits:
+                    product_data = self.parse_algolia_hit(hit)
+                    if product_data:
+                        self._emit(product_data)
             
+            self._finish_delta(complete)
             elapsed = asyncio.get_event_loop().time() - start_time
             
-            print(f"\n[Done] Scraped {len(self.products)} products in {elapsed:.1f} seconds")
-            if elapsed > 0:
-                print(f"[Speed] {len(self.products)/elapsed:.1f} products/second")
+            self._print_summary(f"Scraped {self.product_count} products", elapsed, self.product_count)
+    
+    async def scrape_searches(self, queries, max_pages=10):
+        """Run several searches over one session, emitting each SKU once
+        
+        All queries share the connection pool and the adaptive limiter. Products
+        are deduplicated by SKU across queries and each one gets a "queries" list
+        with every query that returned it.
+        """
+        queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+        if not queries:
+            print("[Error] No search queries given")
+            return
+        print(f"\n[Start] Scraping MobileMasr via Algolia API")
+        print(f"[Search] {len(queries)} queries: {', '.join(repr(q) for q in queries)}")
+        print(f"[Concurrency] Adaptive, starting at {self.limiter.limit} concurrent requests (max {self.limiter.max_limit})\n")
+        start_time = asyncio.get_event_loop().time()
+        if self.seen_index_path:
+            scope = "queries:" + "|".join(sorted(q.lower() for q in queries))
+            self.seen_index = SeenIndex(self.seen_index_path, self.source, scope=scope)
+        
+        async with aiohttp.ClientSession() as session:
+            print("[Step 1] Fetching products from Algolia...")
+            searches = await self._search_pages_many(session, queries, max_pages,
+                                                     labels={query: f"{query}: " for query in queries})
+        
+        # SKU -> product, keeping the first query's order
+        products = {}
+        hit_count = 0
+        for query, (pages, _) in zip(queries, searches):
+            for hits in pages:
+                for hit in hits:
+                    hit_count += 1
+                    product_data = self.parse_algolia_hit(hit)
+                    if not product_data:
+                        continue
+                    product = products.setdefault(record_key(product_data), product_data)
+                    if product.queries is None:
+                        product.queries = []
+                    if query not in product.queries:
+                        product.queries.append(query)
+        print(f"[Dedup] {hit_count} hits -> {len(products)} unique products")
+        for product in products.values():
+            self._emit(product)
+        
+        self._finish_delta(all(complete for _, complete in searches))
+        elapsed = asyncio.get_event_loop().time() - start_time
+        
+        self._print_summary(f"Scraped {self.product_count} products", elapsed, self.product_count)
+    
+    def _finish_delta(self, complete):
+        """Emit removal records if every result page was fetched, then close the index"""
+        if not self.seen_index:
+            return
+        if complete:
+            for sku in self.seen_index.mark_disappeared():
+                self._write({"details": {"SKU": sku}, "change": "removed"})
+        else:
+            print("[Delta] Not every result page was fetched, removals not computed")
+        print(f"[Delta] {self.seen_index.summary()}")
+        self.seen_index.close()
+        self.seen_index = None
     
     def parse_algolia_hit(self, hit):
         """Parse Algolia search result hit"""
@@ -177,34 +559,23 @@ class MobileMasrAlgoliaScraper:
             # Get seller name (vendor store or private seller)
             seller_name = hit.get("vendor_storename") or hit.get("seller_user_name") or "N/A"
             
-            # Build product object in Dubizzle format
-            product = {
-                "product_name": product_name,
-                "price": price,
-                "seller_name": seller_name,
-                "location": "Egypt",
-                "listing_url": f"{self.base_url}/en/product/{hit.get('slug_en', hit.get('id', ''))}",
-                "details": details
-            }
-            return product
+            # Same record type as Dubizzle; the numeric price is taken from Algolia instead of re-parsed
+            return Product.from_scraped(
+                self.source, product_name, price, seller_name, "Egypt",
+                f"{self.base_url}/en/product/{hit.get('slug_en', hit.get('id', ''))}", details,
+                price=float(price_value) if price_value else None, currency="EGP" if price_value else None,
+            )
         except Exception as e:
+            self.metrics.failure("parse", e)
             print(f"[Error] Failed to parse Algolia hit: {e}")
             import traceback
             traceback.print_exc()
         return None
     
-    async def save_data(self, filename="mobilemasr_products.json"):
-        """Save products to JSON file in Dubizzle format"""
-        output = {
-            "scraped_at": datetime.now().isoformat(),
-            "total_products": len(self.products),
-            "products": self.products
-        }
-        
-        async with aiofiles.open(filename, "w", encoding="utf-8") as f:
-            await f.write(json.dumps(output, indent=2, ensure_ascii=False))
-        
-        print(f"\n[Saved] {len(self.products)} products to {filename}")
+    def close_cache(self):
+        if self.cache:
+            self.cache.close()
+            self.cache = None
 
 async def main():
     print("="*60)
@@ -212,8 +583,9 @@ async def main():
     print("="*60)
     print("\n1. Search for specific product")
     print("2. Scrape all mobile phones")
+    print("3. Export the full catalog (past Algolia's 1,000-hit cap)")
     
-    choice = input("\nChoice (1 or 2): ").strip()
+    choice = input("\nChoice (1-3): ").strip()
     
     scraper = MobileMasrAlgoliaScraper(max_concurrent=20)
     
@@ -234,6 +606,10 @@ async def main():
         await scraper.scrape_all_products(max_pages=pages)
         await scraper.save_data()
         
+    elif choice == "3":
+        await scraper.scrape_full_catalog()
+        await scraper.save_data()
+        
     else:
         print("[Error] Invalid choice")
 
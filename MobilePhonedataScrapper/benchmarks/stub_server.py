@@ -0,0 +1,186 @@
+# Local stand-in for Dubizzle and Algolia: recorded or rendered ad pages and canned search responses
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import math
+import os
+import socket
+import sys
+from urllib.parse import parse_qsl, urlparse
+
+from aiohttp import web
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'DubbizleSrapper'))
+from sample_pages import render_detail_page, render_listing_page
+from common.normalize import parse_price
+
+DEFAULT_DUBIZZLE = sorted(glob.glob(os.path.join(ROOT, "DubbizleSrapper", "*.json")))
+DEFAULT_MOBILEMASR = sorted(glob.glob(os.path.join(ROOT, "MobileMasrScrapper", "*.json")))
+ADS_PER_LISTING = 45
+
+# MobileMasr results "details" key -> Algolia attribute parse_algolia_hit reads it from
+HIT_ATTRIBUTES = {
+    "Brand": "brand_en", "Model": "item_en", "RAM": "ram_en", "Storage": "storage_en", "Color": "color_en",
+    "Condition": "variant_type_en", "Battery Health": "battery_health", "SIM": "sim_en", "SKU": "sku",
+}
+
+
+def _products(paths):
+    products = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for product in json.load(f).get("products", []):
+                products.setdefault(product.get("listing_url"), product)
+    return list(products.values())
+
+
+def product_to_hit(product):
+    """Rebuild the Algolia hit a saved MobileMasr product was parsed from"""
+    details = product.get("details") or {}
+    hit = {attribute: details[key] for key, attribute in HIT_ATTRIBUTES.items() if key in details}
+    price, _ = parse_price(product.get("price"))
+    hit["sale_price"] = int(price) if price else 0
+    hit["is_warranty"] = details.get("Warranty") == "Yes"
+    hit["is_insurance"] = details.get("Insurance") == "Yes"
+    hit["vendor_storename"] = None if product.get("seller_name") == "N/A" else product.get("seller_name")
+    hit["slug_en"] = (product.get("listing_url") or "").rstrip("/").rsplit("/", 1)[-1]
+    return hit
+
+
+class Fixtures:
+    """Everything the stub serves: ad pages by path, listing pages and the Algolia hit catalog
+
+    Ad pages come from a directory of recorded .html files and/or are rendered
+    (deterministically) from saved Dubizzle results; hits are rebuilt from saved
+    MobileMasr results or read from a recorded {"hits": [...]} response. `scale`
+    repeats the hit catalog with distinct SKUs so searches span more pages
+    (benchmarks cycle through the ad pages instead of copying them).
+    """
+
+    def __init__(self, dubizzle_json=None, mobilemasr_json=None, html_dir=None, hits_path=None, scale=1):
+        self.ad_pages = {}
+        ads = _products(DEFAULT_DUBIZZLE if dubizzle_json is None else dubizzle_json)
+        for i, product in enumerate(ads):
+            # Same seed -> same bytes on every run, so results compare across commits
+            page = render_detail_page(product, verified=(i % 5 == 0), seed=i)
+            self.ad_pages[urlparse(product["listing_url"]).path] = page.encode("utf-8")
+        if html_dir:
+            for path in sorted(glob.glob(os.path.join(html_dir, "*.html"))):
+                with open(path, "rb") as f:
+                    body = f.read()
+                if b'aria-label="Listing"' not in body:
+                    self.ad_pages[f"/en/ad/{os.path.basename(path)}"] = body
+        paths = list(self.ad_pages)
+        self.listing_pages = [
+            render_listing_page([f"https://www.dubizzle.com.eg{p}" for p in paths[i:i + ADS_PER_LISTING]],
+                                seed=i).encode("utf-8")
+            for i in range(0, len(paths), ADS_PER_LISTING)
+        ]
+
+        if hits_path:
+            with open(hits_path, encoding="utf-8") as f:
+                base_hits = json.load(f).get("hits", [])
+        else:
+            base_hits = [product_to_hit(p) for p in
+                         _products(DEFAULT_MOBILEMASR if mobilemasr_json is None else mobilemasr_json)]
+        self.hits = []
+        for copy in range(scale):
+            for hit in base_hits:
+                hit = dict(hit)
+                if copy:
+                    hit["sku"] = f"{hit.get('sku', '')}-{copy}"
+                    hit["slug_en"] = f"{hit.get('slug_en', '')}-{copy}"
+                self.hits.append(hit)
+
+    def ad_urls(self, base_url):
+        return [base_url + path for path in self.ad_pages]
+
+    def search_page(self, params):
+        """One Algolia result page for the given search params (query text is ignored)"""
+        hits_per_page = int(params.get("hitsPerPage", 20))
+        page = int(params.get("page", 0))
+        result = {"nbHits": len(self.hits), "page": page,
+                  "nbPages": math.ceil(len(self.hits) / hits_per_page) if hits_per_page else 0}
+        result["hits"] = self.hits[page * hits_per_page:(page + 1) * hits_per_page] if hits_per_page else []
+        return result
+
+
+def build_app(fixtures, latency=0.02):
+    """aiohttp app answering ad pages, listing pages and Algolia searches after `latency` seconds"""
+
+    async def ad_page(request):
+        await asyncio.sleep(latency)
+        body = fixtures.ad_pages.get(request.rel_url.raw_path)
+        if body is None:
+            raise web.HTTPNotFound()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        return web.Response(body=body, content_type="text/html", charset="utf-8", headers={"ETag": etag})
+
+    async def listing_page(request):
+        await asyncio.sleep(latency)
+        page = int(request.query.get("page", 1)) - 1
+        if not 0 <= page < len(fixtures.listing_pages):
+            return web.Response(text="<html><body><ul></ul></body></html>", content_type="text/html")
+        return web.Response(body=fixtures.listing_pages[page], content_type="text/html", charset="utf-8")
+
+    async def query(request):
+        await asyncio.sleep(latency)
+        return web.json_response(fixtures.search_page(await request.json()))
+
+    async def multi_query(request):
+        await asyncio.sleep(latency)
+        body = await request.json()
+        results = []
+        for search in body.get("requests", []):
+            results.append(fixtures.search_page(dict(parse_qsl(search.get("params", "")))))
+        return web.json_response({"results": results})
+
+    app = web.Application()
+    app.router.add_get("/en/ad/{slug}", ad_page)
+    app.router.add_get("/en/mobile-phones/", listing_page)
+    app.router.add_post("/1/indexes/*/queries", multi_query)
+    app.router.add_post("/1/indexes/{index}/query", query)
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(port, latency, fixture_options, ready=None):
+    """Run the stub until the process is terminated (target for a separate benchmark process)"""
+    async def run():
+        runner = web.AppRunner(build_app(Fixtures(**fixture_options), latency), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        if ready is not None:
+            ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Dubizzle pages and canned Algolia responses locally")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Delay added to every response")
+    parser.add_argument("--html-dir", help="Directory of recorded Dubizzle ad pages (.html)")
+    parser.add_argument("--hits", help="Recorded Algolia response ({\"hits\": [...]}) to serve as the catalog")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the Algolia catalog this many times")
+    args = parser.parse_args()
+
+    print(f"[Stub] http://127.0.0.1:{args.port} (ads under /en/ad/, Algolia under /1/indexes/)")
+    serve(args.port, args.latency_ms / 1000,
+          {"html_dir": args.html_dir, "hits_path": args.hits, "scale": args.scale})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+# Offline benchmark suite: fetch, parse and serialize stages against a local stub, comparable across commits
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'DubbizleSrapper'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_server import Fixtures, free_port, serve
+
+try:
+    import resource
+except ImportError:  # Windows: CPU falls back to process_time and RSS is not reported
+    resource = None
+
+STAGES = ("fetch", "parse", "serialize")
+HITS_PER_PAGE = 100
+SERIALIZE_BATCH = 100
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def cpu_seconds():
+    """CPU time of this process plus its reaped children (parse pool workers)"""
+    if resource is None:
+        return time.process_time()
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+async def run_workers(concurrency, items, work):
+    """`concurrency` coroutines each take the next item and await work(item); returns per-item seconds"""
+    latencies = []
+    queue = list(reversed(items))
+
+    async def worker():
+        while queue:
+            item = queue.pop()
+            started = time.perf_counter()
+            await work(item)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def fixed_limiter(concurrency):
+    """Limiter pinned at `concurrency`, so runs do not depend on how AIMD adapted"""
+    from common.adaptive_limiter import AdaptiveLimiter
+    return AdaptiveLimiter(initial=concurrency, min_limit=concurrency, max_limit=concurrency)
+
+
+# Each case prepares its inputs, then returns a run() -> (per-unit latencies, items processed, bytes handled);
+# only run() is timed
+
+def fetch_dubizzle(options, concurrency):
+    from http_fetcher import HttpDetailFetcher
+    urls = options["ad_urls"]
+    urls = [urls[i % len(urls)] for i in range(options["requests"])]
+
+    async def fetch_all():
+        fetcher = HttpDetailFetcher(max_connections=concurrency, max_per_host=concurrency, max_retries=1,
+                                    limiter=fixed_limiter(concurrency))
+        received = []
+
+        async def fetch(url):
+            page = await fetcher.fetch_raw(url)
+            if page:
+                received.append(len(page[0]))
+
+        try:
+            latencies = await run_workers(concurrency, urls, fetch)
+        finally:
+            await fetcher.close()
+        return latencies, len(received), sum(received)
+
+    return lambda: asyncio.run(fetch_all())
+
+
+def _algolia_scraper(options, concurrency):
+    os.environ.setdefault("ALGOLIA_APP_ID", "benchmark")
+    os.environ.setdefault("ALGOLIA_API_KEY", "benchmark")
+    from MobileMasrScrapper.main import MobileMasrAlgoliaScraper
+    scraper = MobileMasrAlgoliaScraper(max_concurrent=concurrency, queries_per_request=options["queries_per_request"])
+    scraper.algolia_host = options["base_url"]
+    scraper.limiter = fixed_limiter(concurrency)
+    return scraper
+
+
+def fetch_algolia(options, concurrency, batched=False):
+    import aiohttp
+    scraper = _algolia_scraper(options, concurrency)
+    pages = [i % options["algolia_pages"] for i in range(options["requests"])]
+    if batched:
+        size = scraper.queries_per_request
+        units = [pages[i:i + size] for i in range(0, len(pages), size)]
+    else:
+        units = pages
+
+    async def fetch_all():
+        hits = []
+
+        async def search(unit):
+            if batched:
+                results = await scraper.search_algolia_batch(session, [("", page) for page in unit], HITS_PER_PAGE)
+            else:
+                results = [await scraper.search_algolia(session, "", unit, HITS_PER_PAGE)]
+            hits.extend(len(result["hits"]) for result in results if result)
+
+        async with aiohttp.ClientSession() as session:
+            latencies = await run_workers(concurrency, units, search)
+        return latencies, sum(hits), scraper.response_bytes
+
+    return lambda: asyncio.run(fetch_all())
+
+
+def parse_dubizzle(options, workers):
+    """workers=0 parses inline like parse_workers=0; otherwise through a ParsePool of that many processes"""
+    import fast_parser
+    from parse_pool import ParsePool
+    pages = list(Fixtures(**options["fixtures"]).ad_pages.items())
+    pages = [pages[i % len(pages)] for i in range(options["pages"])]
+    size = sum(len(body) for _, body in pages)
+
+    def parse_inline():
+        latencies = []
+        for path, body in pages:
+            started = time.perf_counter()
+            fast_parser.parse_product_details(body, path, "utf-8")
+            latencies.append(time.perf_counter() - started)
+        return latencies, len(pages), size
+
+    async def parse_pooled():
+        pool = ParsePool(workers=workers)
+        try:
+            return await run_workers(pool.max_pending, pages,
+                                     lambda page: pool.parse_product(page[1], page[0], "utf-8"))
+        finally:
+            # Joins the workers, so their CPU time is counted; process start-up is part of the cost
+            pool.shutdown()
+
+    return parse_inline if not workers else lambda: (asyncio.run(parse_pooled()), len(pages), size)
+
+
+def parse_dubizzle_listing(options, _):
+    import fast_parser
+    pages = Fixtures(**options["fixtures"]).listing_pages
+    pages = [pages[i % len(pages)].decode("utf-8") for i in range(max(1, options["pages"] // 10))]
+
+    def parse():
+        latencies = []
+        for html in pages:
+            started = time.perf_counter()
+            fast_parser.parse_listing_page(html)
+            latencies.append(time.perf_counter() - started)
+        return latencies, len(pages), sum(len(html) for html in pages)
+
+    return parse
+
+
+def parse_algolia(options, _):
+    scraper = _algolia_scraper(options, 1)
+    hits = Fixtures(**options["fixtures"]).hits
+    hits = [hits[i % len(hits)] for i in range(options["products"])]
+
+    def parse():
+        latencies = []
+        for start in range(0, len(hits), HITS_PER_PAGE):
+            started = time.perf_counter()
+            for hit in hits[start:start + HITS_PER_PAGE]:
+                scraper.parse_algolia_hit(hit)
+            latencies.append(time.perf_counter() - started)
+        return latencies, len(hits), 0
+
+    return parse
+
+
+def _products(options):
+    """Products parsed from the fixtures (both sources), repeated to options["products"]"""
+    import fast_parser
+    fixtures = Fixtures(**options["fixtures"])
+    scraper = _algolia_scraper(options, 1)
+    products = [fast_parser.parse_product_details(body, path, "utf-8") for path, body in fixtures.ad_pages.items()]
+    products += [scraper.parse_algolia_hit(hit) for hit in fixtures.hits]
+    products = [p for p in products if p is not None]
+    return [products[i % len(products)] for i in range(options["products"])]
+
+
+def serialize(options, _, fmt="ndjson"):
+    """Writes through the same sinks the scrapers use; "json" is save_data's single wrapped document"""
+    from common.ndjson_writer import NDJSONWriter
+    from common.parquet_export import ParquetWriter
+    from common.product import json_default
+    products = _products(options)
+
+    def write(path):
+        if fmt == "json":
+            started = time.perf_counter()
+            with open(path + ".json", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"scraped_at": datetime.now().isoformat(), "total_products": len(products),
+                                    "products": products}, indent=2, ensure_ascii=False, default=json_default))
+            return [time.perf_counter() - started]
+        if fmt == "parquet":
+            writer = ParquetWriter(path + ".parquet", "benchmark", row_group_size=SERIALIZE_BATCH * 50)
+        else:
+            writer = NDJSONWriter(path + ".ndjson", compression="gzip" if fmt == "ndjson-gzip" else None,
+                                  batch_size=SERIALIZE_BATCH)
+        latencies = []
+        for start in range(0, len(products), SERIALIZE_BATCH):
+            started = time.perf_counter()
+            for product in products[start:start + SERIALIZE_BATCH]:
+                writer.write(product)
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        writer.close()
+        latencies[-1] += time.perf_counter() - started
+        return latencies
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            latencies = write(os.path.join(tmp, "products"))
+            size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        return latencies, len(products), size
+
+    return run
+
+
+CASES = {
+    ("fetch", "dubizzle-ads"): fetch_dubizzle,
+    ("fetch", "algolia"): fetch_algolia,
+    ("fetch", "algolia-batch"): lambda options, c: fetch_algolia(options, c, batched=True),
+    ("parse", "dubizzle-ads"): parse_dubizzle,
+    ("parse", "dubizzle-listings"): parse_dubizzle_listing,
+    ("parse", "algolia-hits"): parse_algolia,
+    ("serialize", "ndjson"): serialize,
+    ("serialize", "ndjson-gzip"): lambda options, c: serialize(options, c, "ndjson-gzip"),
+    ("serialize", "json"): lambda options, c: serialize(options, c, "json"),
+    ("serialize", "parquet"): lambda options, c: serialize(options, c, "parquet"),
+}
+
+
+def run_case(stage, target, concurrency, options):
+    """Runs in a fresh process, so CPU time and peak RSS belong to this case alone"""
+    run = CASES[(stage, target)](options, concurrency)
+    rss_before = peak_rss_mb()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    latencies, items, size = run()
+    seconds = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_before
+    rss = peak_rss_mb()
+    return {
+        "items": items,
+        "seconds": seconds,
+        "throughput": items / seconds if seconds else None,
+        "mb_per_second": size / 1e6 / seconds if seconds and size else None,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_item": cpu / items * 1000 if items else None,
+        "peak_rss_mb": rss,
+        "rss_growth_mb": rss - rss_before if rss is not None else None,
+    }
+
+
+def measure(stage, target, concurrency, options, repeat):
+    """Median of each metric over `repeat` fresh-process runs"""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            runs.append(executor.submit(run_case, stage, target, concurrency, options).result())
+    result = {"stage": stage, "target": target, "concurrency": concurrency, "runs": repeat}
+    for metric in runs[0]:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = round(statistics.median(values), 4) if values else None
+    return result
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def case_key(case):
+    return f"{case['stage']}/{case['target']}@{case['concurrency']}"
+
+
+def compare(current, baseline, tolerance):
+    """Print throughput and p95 changes per case; returns the keys that regressed beyond tolerance"""
+    previous = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    print(f"\n[Compare] vs {baseline['meta'].get('commit')} ({baseline['meta'].get('date')})")
+    for case in current["cases"]:
+        key = case_key(case)
+        old = previous.get(key)
+        if not old or not old.get("throughput") or not case.get("throughput"):
+            continue
+        speed = (case["throughput"] / old["throughput"] - 1) * 100
+        p95 = (case["p95_ms"] / old["p95_ms"] - 1) * 100 if old.get("p95_ms") else 0.0
+        flag = ""
+        if speed < -tolerance * 100:
+            flag = "  <-- slower"
+            regressions.append(key)
+        print(f"  {key:<36} throughput {speed:+6.1f}%   p95 {p95:+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fetch/parse/serialize benchmarks against a local stub server")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of fetch,parse,serialize")
+    parser.add_argument("--concurrency", default="1,8,32", help="Fetch concurrency levels")
+    parser.add_argument("--parse-workers", default=f"0,{os.cpu_count() or 1}",
+                        help="Ad page parse levels: 0 parses inline, N uses a pool of N processes")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per fetch case")
+    parser.add_argument("--pages", type=int, default=400, help="Ad pages per parse case")
+    parser.add_argument("--products", type=int, default=20000, help="Products per serialize / hit parse case")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Stub server delay per response")
+    parser.add_argument("--scale", type=int, default=10, help="Repeat the Algolia catalog this many times")
+    parser.add_argument("--html-dir", help="Recorded Dubizzle ad pages to serve and parse")
+    parser.add_argument("--hits", help="Recorded Algolia response to serve as the catalog")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-process runs per case; medians are reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Throughput drop that counts as a regression")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    fetch_levels = [int(level) for level in args.concurrency.split(",")]
+    parse_levels = [int(level) for level in args.parse_workers.split(",")]
+
+    fixture_options = {"html_dir": args.html_dir, "hits_path": args.hits, "scale": args.scale}
+    fixtures = Fixtures(**fixture_options)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    options = {
+        "fixtures": fixture_options,
+        "base_url": base_url,
+        "ad_urls": fixtures.ad_urls(base_url),
+        "algolia_pages": max(1, -(-len(fixtures.hits) // HITS_PER_PAGE)),
+        "queries_per_request": 10,
+        "requests": args.requests,
+        "pages": args.pages,
+        "products": args.products,
+    }
+    print(f"[Corpus] {len(fixtures.ad_pages)} ad pages, {len(fixtures.listing_pages)} listing pages, "
+          f"{len(fixtures.hits)} Algolia hits")
+
+    plan = []
+    for stage, target in CASES:
+        if stage not in stages:
+            continue
+        if stage == "fetch":
+            levels = fetch_levels
+        elif target == "dubizzle-ads":
+            levels = parse_levels
+        else:
+            levels = [1]
+        plan.extend((stage, target, level) for level in levels)
+
+    context = multiprocessing.get_context("spawn")
+    server = None
+    if "fetch" in stages:
+        ready = context.Event()
+        server = context.Process(target=serve, args=(port, args.latency_ms / 1000, fixture_options, ready), daemon=True)
+        server.start()
+        if not ready.wait(60):
+            print("[Error] Stub server did not start")
+            server.terminate()
+            return 2
+
+    cases = []
+    try:
+        for stage, target, level in plan:
+            if target == "parquet":
+                try:
+                    import pyarrow  # noqa: F401
+                except ImportError:
+                    print("[Skip] serialize/parquet needs pyarrow")
+                    continue
+            case = measure(stage, target, level, options, args.repeat)
+            cases.append(case)
+            rss = f"{case['peak_rss_mb']:.0f} MB peak RSS" if case["peak_rss_mb"] is not None else "RSS n/a"
+            print(f"[{stage.title()}] {target}@{level}: {case['throughput']:,.0f} items/s, "
+                  f"p50 {case['p50_ms']:.2f} ms, p95 {case['p95_ms']:.2f} ms, "
+                  f"{case['cpu_ms_per_item']:.3f} ms CPU/item, {rss}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    commit, dirty = git_revision()
+    results = {
+        "meta": {
+            "commit": commit, "dirty": dirty, "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "latency_ms": args.latency_ms, "scale": args.scale, "requests": args.requests, "pages": args.pages,
+            "products": args.products, "repeat": args.repeat,
+        },
+        "cases": cases,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[Saved] {len(cases)} cases to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"[Regression] {len(regressions)} cases slower than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Shared helpers used by both the Dubizzle and MobileMasr scrapers"""
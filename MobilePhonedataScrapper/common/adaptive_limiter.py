@@ -0,0 +1,172 @@
+# AIMD concurrency limiter with Retry-After support and per-host token buckets
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Responses that mean "slow down" rather than "this page is broken"
+THROTTLE_STATUSES = {429, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Retry-After is either delay-seconds or an HTTP date; returns seconds or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests
+
+    The limit grows by one after each window of `limit` healthy responses and is
+    cut by `backoff` on errors, throttling responses, or when recent latency
+    rises well above the long-run average. Retry-After pauses every new request
+    until the deadline passes.
+    """
+
+    def __init__(self, initial=10, min_limit=1, max_limit=50, backoff=0.5, latency_tolerance=2.0,
+                 cooldown=2.0, rate_per_host=None, burst_per_host=None):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.recent_latency = None   # fast-moving average
+        self.baseline_latency = None  # slow-moving average
+        self.stats = {"ok": 0, "errors": 0, "throttled": 0, "slow": 0}
+        self._healthy_streak = 0
+        self._last_decrease = 0.0
+        self._buckets = {}
+        self._cond = None
+        self._notifiers = set()  # The loop only keeps weak references to tasks
+
+    def _condition(self):
+        # Created lazily so the limiter can be built outside a running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self, host=None):
+        """Wait for a free slot (and a token for `host`); returns a start time for release()"""
+        cond = self._condition()
+        async with cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self.limit:
+                    break
+                await cond.wait()
+            self.in_flight += 1
+        if host and self.rate_per_host:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate_per_host, self.burst_per_host)
+            try:
+                await bucket.take()
+            except asyncio.CancelledError:
+                # The slot was taken above; give it back or it leaks for the rest of the run
+                self.in_flight -= 1
+                self._notify_soon()
+                raise
+        return time.monotonic()
+
+    def release(self, started, ok=True, throttled=False, retry_after=None):
+        """Report how the request went and adjust the limit"""
+        now = time.monotonic()
+        latency = now - started
+        self.in_flight -= 1
+
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+        if throttled or not ok:
+            self.stats["throttled" if throttled else "errors"] += 1
+            self._decrease(now)
+        elif self._track_latency(latency):
+            self.stats["slow"] += 1
+            self._decrease(now)
+        else:
+            self.stats["ok"] += 1
+            self._healthy_streak += 1
+            if self._healthy_streak >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._healthy_streak = 0
+
+        self._notify_soon()
+
+    def _track_latency(self, latency):
+        """Update the latency averages; True if recent latency has degraded"""
+        if self.recent_latency is None:
+            self.recent_latency = self.baseline_latency = latency
+            return False
+        self.recent_latency += 0.3 * (latency - self.recent_latency)
+        self.baseline_latency += 0.02 * (latency - self.baseline_latency)
+        return self.recent_latency > self.baseline_latency * self.latency_tolerance
+
+    def _decrease(self, now):
+        self._healthy_streak = 0
+        # Requests already in flight fail together, so only back off once per cooldown
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, int(self.limit * self.backoff))
+
+    def _notify_soon(self):
+        """Wake waiters in acquire(); release() is synchronous, so this runs as a task"""
+        if self._cond is None:
+            return
+        task = asyncio.ensure_future(self._notify())
+        self._notifiers.add(task)
+        task.add_done_callback(self._notifiers.discard)
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    def summary(self):
+        s = self.stats
+        return (f"limit {self.limit} (max {self.max_limit}), {s['ok']} ok, {s['errors']} errors, "
+                f"{s['throttled']} throttled, {s['slow']} slow")
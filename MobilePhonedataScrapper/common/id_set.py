@@ -0,0 +1,128 @@
+# Compact set of ad URLs / SKUs stored as sorted 64-bit hashes, optionally memory-mapped from disk
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"IDSET\x00\x01\x00"
+HEADER = struct.Struct("<8sQQ")  # magic, number of ids, caller-defined tag
+# Keys held as Python ints before they are sorted into a run
+BUFFER_SIZE = 4096
+
+
+def key_id(key):
+    """64-bit hash of a URL or SKU (collisions are ~1e-8 likely at a million keys)"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _contains(run, value):
+    i = bisect_left(run, value)
+    return i < len(run) and run[i] == value
+
+
+class IdSet:
+    """Membership set that keeps 8 bytes per key instead of the key string
+
+    New keys collect in a small buffer, which is sorted into a run once full; runs
+    of similar size are merged so a lookup binary-searches only a handful of them.
+    A saved set is loaded with mmap, so a history of millions of keys is usable at
+    startup without reading it into memory (pages are faulted in on lookup).
+    `tag` is stored alongside the ids for callers to check the file is current.
+    """
+
+    def __init__(self, keys=(), buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.buffer = set()
+        self.runs = []     # Sorted array('Q') runs, oldest (largest) first
+        self.base = None   # Memory-mapped ids from load(), never merged in memory
+        self.tag = 0
+        self._mmap = None
+        self.update(keys)
+
+    def __len__(self):
+        return len(self.buffer) + sum(len(run) for run in self.runs) + (len(self.base) if self.base is not None else 0)
+
+    def _has(self, value):
+        if value in self.buffer:
+            return True
+        if self.base is not None and _contains(self.base, value):
+            return True
+        return any(_contains(run, value) for run in self.runs)
+
+    def __contains__(self, key):
+        return self._has(key_id(key))
+
+    def add(self, key):
+        """Add a key; returns True if it was not in the set yet"""
+        value = key_id(key)
+        if self._has(value):
+            return False
+        self.buffer.add(value)
+        if len(self.buffer) >= self.buffer_size:
+            self._flush()
+        return True
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        self.runs.append(array("Q", sorted(self.buffer)))
+        self.buffer = set()
+        # Merge equal-sized runs (like a binary counter): O(log n) runs to search, O(log n) merges per id
+        while len(self.runs) >= 2 and len(self.runs[-2]) <= len(self.runs[-1]):
+            newer = self.runs.pop()
+            older = self.runs.pop()
+            # Timsort merges two presorted runs in linear time
+            self.runs.append(array("Q", sorted(older + newer)))
+
+    def nbytes(self):
+        """Memory held for membership (a memory-mapped base only counts once its pages are read)"""
+        return sum(run.itemsize * len(run) for run in self.runs) + len(self.buffer) * 8
+
+    def save(self, path, tag=None):
+        """Write every id, sorted, to `path` (atomically) in the format load() maps
+
+        A mapped base is copied into memory and unmapped first: Windows refuses to
+        replace a file that is still mapped, which is the usual case for a set
+        saved back to the file it was loaded from.
+        """
+        sources = [self.base] if self.base is not None else []
+        ids = array("Q", heapq.merge(*sources, *self.runs, sorted(self.buffer)))
+        if self.base is not None:
+            self.close()
+            self.runs, self.buffer = [ids], set()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(ids), self.tag if tag is None else tag))
+            ids.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, buffer_size=BUFFER_SIZE):
+        """Map a saved set read-only; keys added afterwards live in memory until the next save()"""
+        ids = cls(buffer_size=buffer_size)
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size or header[:8] != MAGIC:
+                raise ValueError(f"{path} is not a saved IdSet")
+            _, count, ids.tag = HEADER.unpack(header)
+            if os.fstat(f.fileno()).st_size < HEADER.size + count * 8:
+                raise ValueError(f"{path} is truncated")
+            ids._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        ids.base = memoryview(ids._mmap)[HEADER.size:HEADER.size + count * 8].cast("Q")
+        return ids
+
+    def close(self):
+        """Unmap a loaded file (the set must not be used afterwards)"""
+        if self.base is not None:
+            self.base.release()
+            self.base = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
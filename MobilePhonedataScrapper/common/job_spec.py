@@ -0,0 +1,124 @@
+# Batch job specs for the headless CLI (JSON or YAML, or built from command-line flags)
+import json
+import os
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+SOURCES = ("dubizzle", "mobilemasr")
+# Starting concurrency when a job does not set one: Dubizzle browsers, MobileMasr Algolia requests
+DEFAULT_CONCURRENCY = {"dubizzle": 10, "mobilemasr": 20}
+
+COMMON_KEYS = {"source", "query", "queries", "max_pages", "concurrency", "output", "ndjson", "parquet", "seen_index",
+               "cache", "cache_ttl", "replay", "quarantine", "store", "wrapped_json"}
+SOURCE_KEYS = {
+    "dubizzle": {"pipeline", "journal", "detail_backend", "parse_workers", "frontier", "worker_id", "crawl_id"},
+    "mobilemasr": {"full_catalog"},
+}
+PATH_KEYS = ("output", "ndjson", "parquet", "seen_index", "journal", "cache", "quarantine", "store")
+
+
+def default_output(source, query, queries=None):
+    """Same file names the interactive CLI writes (multi-query jobs get a *_search_results.json)"""
+    if queries:
+        return f"{source}_search_results.json"
+    slug = query.lower().replace(" ", "_")
+    if source == "dubizzle":
+        return f"{slug}_results.json" if query else "dubizzle_products.json"
+    return f"mobilemasr_{slug}_results.json" if query else "mobilemasr_products.json"
+
+
+def ndjson_compression(path):
+    """Compression implied by an NDJSON path's extension"""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def frontier_location(location, output_dir="."):
+    """A crawl frontier is a SQLite path (resolved like other paths) or the URL of a served one"""
+    if location.startswith(("http://", "https://")):
+        return location
+    return os.path.join(output_dir, os.path.expanduser(location))
+
+
+def normalize_job(raw, defaults=None, output_dir="."):
+    """Merge a job over the defaults, check it and resolve every path against output_dir"""
+    if not isinstance(raw, dict):
+        raise ValueError(f"Each job must be a mapping, got {raw!r}")
+    job = dict(defaults or {})
+    job.update(raw)
+    source = job.get("source")
+    if source not in SOURCES:
+        raise ValueError(f"Job source must be one of {', '.join(SOURCES)}, got {source!r}")
+    unknown = set(job) - COMMON_KEYS - SOURCE_KEYS[source]
+    if unknown:
+        raise ValueError(f"Unknown keys for a {source} job: {', '.join(sorted(unknown))}")
+
+    job["query"] = str(job.get("query") or "").strip()
+    queries = job.get("queries")
+    if queries is not None:
+        if not isinstance(queries, list) or not queries or job["query"]:
+            raise ValueError("queries must be a non-empty list and cannot be combined with query")
+        job["queries"] = list(dict.fromkeys(str(q).strip() for q in queries if str(q).strip()))
+    if job.get("replay") and not job.get("cache"):
+        raise ValueError("replay needs a cache path")
+    if job.get("full_catalog") and (job["query"] or queries):
+        raise ValueError("full_catalog exports the whole index and cannot be combined with query/queries")
+    if job.get("wrapped_json") and not job.get("ndjson"):
+        raise ValueError("wrapped_json rebuilds the JSON output from a streamed job and needs ndjson")
+    if job.get("frontier") and queries:
+        raise ValueError("frontier jobs crawl one search (or all listings) and cannot be combined with queries")
+    for key, default in (("max_pages", 10), ("concurrency", DEFAULT_CONCURRENCY[source])):
+        value = job.get(key, default)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"{key} must be a positive integer, got {value!r}")
+        job[key] = value
+    job.setdefault("output", default_output(source, job["query"], job.get("queries")))
+    for key in PATH_KEYS:
+        if job.get(key):
+            job[key] = os.path.join(output_dir, os.path.expanduser(job[key]))
+    if job.get("frontier"):
+        job["frontier"] = frontier_location(job["frontier"], output_dir)
+    return job
+
+
+def load_spec(path, output_dir=None):
+    """Read a job spec file and return its normalized jobs
+
+    The spec is {"output_dir": ..., "defaults": {...}, "jobs": [{...}, ...]}; every
+    job needs a source and may override any default. Relative paths are resolved
+    against output_dir (the output_dir argument wins over the one in the file).
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("YAML job specs require PyYAML: pip install pyyaml")
+            try:
+                spec = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path}: invalid YAML: {e}") from e
+        else:
+            spec = json.load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list) or not spec["jobs"]:
+        raise ValueError(f"{path}: a job spec needs a non-empty 'jobs' list")
+    output_dir = output_dir or spec.get("output_dir") or "."
+    defaults = spec.get("defaults") or {}
+    return [normalize_job(job, defaults, output_dir) for job in spec["jobs"]]
+
+
+def jobs_from_args(sources, queries, output_dir=".", fan_out=False, **defaults):
+    """One job per source and query (an empty query list scrapes all listings)
+
+    With fan_out each source gets a single job searching every query at once.
+    """
+    defaults = {key: value for key, value in defaults.items() if value is not None}
+    if fan_out and queries:
+        return [normalize_job({"source": source, "queries": queries}, defaults, output_dir)
+                for source in dict.fromkeys(sources)]
+    return [normalize_job({"source": source, "query": query}, defaults, output_dir)
+            for source in dict.fromkeys(sources) for query in (queries or [""])]
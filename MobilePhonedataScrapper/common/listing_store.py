@@ -0,0 +1,304 @@
+# Embedded SQLite store of every scraped listing, upserted in batches, with a daily price history
+import argparse
+import json
+import sqlite3
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from common.matching import signature, signature_from
+from common.ndjson_writer import iter_products
+from common.price_analytics import snapshot_day
+from common.product import Product
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    listing_url TEXT,
+    product_name TEXT,
+    brand TEXT,
+    model TEXT,
+    canonical_model TEXT,
+    storage_gb REAL,
+    ram_gb REAL,
+    condition TEXT,
+    price REAL,
+    currency TEXT,
+    seller_name TEXT,
+    location TEXT,
+    details TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    removed_on TEXT,
+    PRIMARY KEY (source, key)
+);
+CREATE TABLE IF NOT EXISTS price_history (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    price REAL NOT NULL,
+    currency TEXT,
+    canonical_model TEXT,
+    storage_gb REAL,
+    PRIMARY KEY (source, key, day)
+);
+CREATE INDEX IF NOT EXISTS listings_model ON listings (canonical_model, storage_gb);
+CREATE INDEX IF NOT EXISTS listings_spec ON listings (brand, model, storage_gb);
+CREATE INDEX IF NOT EXISTS price_history_day ON price_history (day);
+-- Covers trend queries: one range scan, no join back to listings
+CREATE INDEX IF NOT EXISTS price_history_model ON price_history (canonical_model, storage_gb, day, price, source);
+"""
+
+# Columns refreshed from the newest observation; first_seen/last_seen are widened instead
+LISTING_COLUMNS = ("listing_url", "product_name", "brand", "model", "canonical_model", "storage_gb", "ram_gb",
+                   "condition", "price", "currency", "seller_name", "location", "details")
+UPSERT_LISTING = (
+    f"INSERT INTO listings (source, key, {', '.join(LISTING_COLUMNS)}, first_seen, last_seen) "
+    f"VALUES ({', '.join('?' * (len(LISTING_COLUMNS) + 4))}) "
+    "ON CONFLICT (source, key) DO UPDATE SET "
+    # Backfilling an older snapshot must not overwrite what a newer one recorded
+    + ", ".join(f"{column} = CASE WHEN excluded.last_seen >= listings.last_seen "
+                f"THEN excluded.{column} ELSE listings.{column} END" for column in LISTING_COLUMNS)
+    + ", removed_on = CASE WHEN excluded.last_seen >= listings.last_seen THEN NULL ELSE listings.removed_on END"
+    ", first_seen = MIN(listings.first_seen, excluded.first_seen)"
+    ", last_seen = MAX(listings.last_seen, excluded.last_seen)"
+)
+# One price per listing and day: the last one written that day wins
+UPSERT_PRICE = ("INSERT INTO price_history (source, key, day, price, currency, canonical_model, storage_gb) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source, key, day) DO UPDATE SET price = excluded.price, "
+                "currency = excluded.currency, canonical_model = excluded.canonical_model, "
+                "storage_gb = excluded.storage_gb")
+MARK_REMOVED = "UPDATE listings SET removed_on = ? WHERE source = ? AND key = ? AND removed_on IS NULL"
+# A listing seen again without being re-fetched (delta runs skip recently checked ads): carry its last price forward
+TOUCH_LISTING = ("UPDATE listings SET last_seen = MAX(last_seen, ?1), removed_on = NULL "
+                 "WHERE source = ?2 AND key = ?3")
+TOUCH_PRICE = ("INSERT INTO price_history (source, key, day, price, currency, canonical_model, storage_gb) "
+               "SELECT source, key, ?1, price, currency, canonical_model, storage_gb FROM listings "
+               "WHERE source = ?2 AND key = ?3 AND price IS NOT NULL ON CONFLICT (source, key, day) DO NOTHING")
+
+
+def _as_day(value):
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+class ListingStore:
+    """Sink that upserts products into a SQLite database keyed by (source, URL or SKU)
+
+    Rows are buffered and written batch_size at a time in one transaction, so a
+    scrape pays tens of microseconds per product rather than a commit each. Each
+    listing keeps its latest fields plus first_seen/last_seen, and price_history
+    gets one price per listing and day; the canonical model from common.matching
+    is stored with it, so trend queries are an index range scan instead of a pass
+    over every JSON snapshot. Several scrapers (or processes) can share one file.
+
+    Delta runs only emit new and changed listings, so the scrapers also hand
+    unchanged ones to sinks with observes_unchanged set, and report ads they
+    skipped as recently checked through touch(); every listing seen on a day
+    then has a price that day.
+    """
+
+    observes_unchanged = True
+
+    def __init__(self, path, source=None, batch_size=500):
+        self.path = path
+        self.source = source
+        self.batch_size = batch_size
+        self.total_products = 0
+        self._listings = []
+        self._prices = []
+        self._removed = []
+        self._touched = []
+        self._conn = None
+        self.conn  # Create the schema up front
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def write(self, product, scraped_at=None):
+        """Buffer one product (or a delta run's removal marker); a batch is written every batch_size"""
+        day = _as_day(scraped_at)
+        if not isinstance(product, Product):
+            if product.get("change") == "removed":
+                key = (product.get("details") or {}).get("SKU") or product.get("listing_url")
+                self._removed.append((day, self.source, key))
+                self._maybe_flush()
+                return
+            product = Product.from_dict(product, self.source)
+        key = product.key
+        if not key:
+            return
+        sig = signature(product)
+        model = sig.model if sig else None
+        storage_gb = sig.storage_gb if sig else product.storage_gb
+        self._listings.append((
+            product.source, key, product.listing_url, product.product_name, product.brand, product.model,
+            model, storage_gb, product.ram_gb, product.condition, product.price, product.currency,
+            product.seller_name, product.location,
+            json.dumps(product.details, ensure_ascii=False), day, day,
+        ))
+        if product.price is not None:
+            self._prices.append((product.source, key, day, product.price, product.currency, model, storage_gb))
+        self._maybe_flush()
+
+    def touch(self, keys, scraped_at=None):
+        """Record listings seen again without a fetch: last_seen moves on and the last price is repeated for the day"""
+        day = _as_day(scraped_at)
+        self._touched.extend((day, self.source, key) for key in keys)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self._listings) + len(self._removed) + len(self._touched) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows in a single transaction"""
+        if not (self._listings or self._removed or self._touched):
+            return
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT_LISTING, self._listings)
+            conn.executemany(UPSERT_PRICE, self._prices)
+            conn.executemany(MARK_REMOVED, self._removed)
+            conn.executemany(TOUCH_LISTING, self._touched)
+            conn.executemany(TOUCH_PRICE, self._touched)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.total_products += len(self._listings)
+        self._listings, self._prices, self._removed, self._touched = [], [], [], []
+
+    def close(self):
+        """Flush remaining rows and close the connection (the next write reopens it)"""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def price_trend(self, query, storage_gb=None, days=30, source=None, until=None):
+        """Daily median price of one model over the last `days` days
+
+        `query` is a model as a shopper writes it ("iPhone 13 128GB", "galaxy s24
+        ultra"); it is normalized like the stored listings, and a capacity in it is
+        used when storage_gb is not given. Returns one dict per day with prices.
+        """
+        sig = signature_from(None, None, query, storage_gb)
+        if sig is None:
+            raise ValueError(f"Cannot recognise a phone model in {query!r}")
+        end = until or date.today()
+        start = (end - timedelta(days=days)).isoformat()
+        source_filter = " AND source = ?" if source else ""
+        extra = [source] if source else []
+        if not sig.storage_gb:
+            # Every capacity of the model: prices are not in index order per day, so sort them here
+            by_day = {}
+            rows = self.conn.execute(
+                f"SELECT day, price FROM price_history WHERE canonical_model = ? AND day > ? AND day <= ?"
+                f"{source_filter} ORDER BY day", [sig.model, start, end.isoformat()] + extra)
+            for day, price in rows:
+                by_day.setdefault(day, []).append(price)
+            return [{"day": day, "model": sig.model, "storage_gb": None, "listings": len(prices),
+                     "median": statistics.median(prices), "min": min(prices), "max": max(prices)}
+                    for day, prices in by_day.items()]
+
+        # price_history_model orders each day's prices, so the median is read at an offset without fetching the rest
+        group = [sig.model, sig.storage_gb]
+        days_found = self.conn.execute(
+            "SELECT day, COUNT(*), MIN(price), MAX(price) FROM price_history "
+            f"WHERE canonical_model = ? AND storage_gb = ? AND day > ? AND day <= ?{source_filter} "
+            "GROUP BY day ORDER BY day", group + [start, end.isoformat()] + extra).fetchall()
+        trend = []
+        for day, count, low, high in days_found:
+            middle = [price for (price,) in self.conn.execute(
+                f"SELECT price FROM price_history WHERE canonical_model = ? AND storage_gb = ? AND day = ?{source_filter} "
+                "ORDER BY price LIMIT ? OFFSET ?", group + [day] + extra + [2 - count % 2, (count - 1) // 2])]
+            trend.append({"day": day, "model": sig.model, "storage_gb": sig.storage_gb, "listings": count,
+                          "median": sum(middle) / len(middle), "min": low, "max": high})
+        return trend
+
+    def counts(self):
+        """{source: (listings, active listings, price points)}"""
+        counts = {}
+        for source, listings, active in self.conn.execute(
+                "SELECT source, COUNT(*), COUNT(*) - COUNT(removed_on) FROM listings GROUP BY source"):
+            counts[source] = [listings, active, 0]
+        for source, points in self.conn.execute("SELECT source, COUNT(*) FROM price_history GROUP BY source"):
+            counts.setdefault(source, [0, 0, 0])[2] = points
+        return {source: tuple(values) for source, values in counts.items()}
+
+
+def import_file(store, path, source):
+    """Upsert a saved JSON results file or NDJSON stream, dated by its snapshot day"""
+    if path.endswith((".ndjson", ".jsonl", ".gz", ".zst")):
+        day, records = snapshot_day(path), iter_products(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        day, records = snapshot_day(path, data), data.get("products", [])
+    store.source = source
+    before = store.total_products
+    for record in records:
+        store.write(record, scraped_at=day)
+    store.flush()
+    return store.total_products - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load scraper output into a listing store and query price trends")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Upsert saved JSON/NDJSON results into the store")
+    import_parser.add_argument("db", help="Listing store SQLite file")
+    import_parser.add_argument("--dubizzle", nargs="*", default=[], help="Dubizzle results (.json or .ndjson)")
+    import_parser.add_argument("--mobilemasr", nargs="*", default=[], help="MobileMasr results (.json or .ndjson)")
+    trend_parser = commands.add_parser("trend", help="Daily median price of a model")
+    trend_parser.add_argument("db")
+    trend_parser.add_argument("model", help='Model and optionally storage, e.g. "iPhone 13 128GB"')
+    trend_parser.add_argument("--days", type=int, default=30)
+    trend_parser.add_argument("--source", choices=["dubizzle", "mobilemasr"])
+    status_parser = commands.add_parser("status", help="Listing and price point counts per source")
+    status_parser.add_argument("db")
+    args = parser.parse_args()
+
+    store = ListingStore(args.db)
+    try:
+        if args.command == "import":
+            for source, paths in (("dubizzle", args.dubizzle), ("mobilemasr", args.mobilemasr)):
+                for path in paths:
+                    print(f"[Store] {import_file(store, path, source)} {source} products from {path}")
+        elif args.command == "trend":
+            start = time.perf_counter()
+            rows = store.price_trend(args.model, days=args.days, source=args.source)
+            elapsed = (time.perf_counter() - start) * 1000
+            for row in rows:
+                print(f"{row['day']}  {row['listings']:5d} listings  median {row['median']:>11,.0f}  "
+                      f"min {row['min']:>11,.0f}  max {row['max']:>11,.0f}")
+            print(f"[Store] {len(rows)} days of {args.model} prices in {elapsed:.1f} ms")
+        else:
+            for source, (listings, active, points) in store.counts().items():
+                print(f"[Store] {source}: {listings} listings ({active} active), {points} price points")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
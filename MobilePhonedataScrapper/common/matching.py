@@ -0,0 +1,329 @@
+# Cross-source matching: link Dubizzle listings to MobileMasr models and compare their prices
+import argparse
+import csv
+import json
+import re
+import statistics
+from collections import defaultdict
+
+from common.ndjson_writer import iter_products
+from common.normalize import is_missing
+from common.product import Product
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+# Arabic-Indic and Eastern Arabic-Indic digits -> ASCII, so "ايفون ١٣" reads as "iphone 13"
+DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+# Common Arabic spellings in Dubizzle titles
+ARABIC_WORDS = {
+    "ايفون": "iphone", "آيفون": "iphone", "أيفون": "iphone", "سامسونج": "samsung", "جالاكسي": "galaxy",
+    "جلاكسي": "galaxy", "شاومي": "xiaomi", "ريدمي": "redmi", "اوبو": "oppo", "هواوي": "huawei", "هونر": "honor",
+    "ريلمي": "realme", "انفينكس": "infinix", "انفنكس": "infinix", "فيفو": "vivo", "نوكيا": "nokia",
+    "برو": "pro", "ماكس": "max", "بلس": "plus", "الترا": "ultra", "ألترا": "ultra", "ميني": "mini", "لايت": "lite",
+    "جيجا": "gb", "ج": "gb", "تيرا": "tb",
+}
+# Words that identify the brand when the Brand spec is missing or "Others"
+BRAND_WORDS = {
+    "apple": "apple", "iphone": "apple", "samsung": "samsung", "galaxy": "samsung", "xiaomi": "xiaomi",
+    "redmi": "xiaomi", "poco": "xiaomi", "oppo": "oppo", "huawei": "huawei", "honor": "honor", "realme": "realme",
+    "infinix": "infinix", "vivo": "vivo", "nokia": "nokia", "oneplus": "oneplus", "google": "google",
+    "pixel": "google", "motorola": "motorola", "tecno": "tecno", "nothing": "nothing",
+}
+BRAND_ALIASES = {"one plus": "oneplus", "apple - iphone": "apple"}
+# Dropped from model descriptors: implied by the brand, network generation, or filler
+SERIES_WORDS = {"iphone", "galaxy"}
+NOISE_WORDS = {"5g", "4g", "lte", "dual", "sim", "mobile", "phone", "new", "used"}
+VARIANT_WORDS = {"pro", "max", "plus", "ultra", "mini", "fe", "lite", "prime", "xl", "fold", "flip", "edge", "note"}
+STORAGE_SIZES = {32, 64, 128, 256, 512, 1024}
+CAPACITY_RE = re.compile(r"^(\d+)(gb|g|tb|t)$")
+# A model number glued to its variant words: "13pro", "14promax", "s24ultra", "١٣برو"
+NUMBER_SUFFIX_RE = re.compile(r"^([a-z]*\d+)(\D+)$")
+GLUED_WORD_RE = re.compile(r"pro|max|plus|ultra|mini")
+
+
+def tokens(text):
+    """Lower-case word tokens with Arabic digits and common Arabic words translated, and variants split off numbers"""
+    if is_missing(text):
+        return []
+    words = TOKEN_RE.findall(str(text).translate(DIGITS).lower())
+    result = []
+    for word in words:
+        glued = NUMBER_SUFFIX_RE.match(word)
+        if glued:
+            # "13pro" reads as "13 pro", so both spellings share a signature ("256gb" is left alone)
+            suffix = ARABIC_WORDS.get(glued.group(2), glued.group(2))
+            variants = GLUED_WORD_RE.findall(suffix)
+            if "".join(variants) == suffix:
+                result.append(glued.group(1))
+                result.extend(variants)
+                continue
+        result.append(ARABIC_WORDS.get(word, word))
+    return result
+
+
+def canonical_brand(brand, title_tokens):
+    brand = brand.lower() if brand else ""
+    brand = BRAND_ALIASES.get(brand, brand.split(" ")[0] if brand else "")
+    if brand in BRAND_WORDS.values():
+        return brand
+    for word in title_tokens:
+        if word in BRAND_WORDS:
+            return BRAND_WORDS[word]
+    return brand or None
+
+
+def storage_from_title(words):
+    """Largest storage-sized capacity in a title: '256G', '128 gb', '64ج' or a bare '512'"""
+    found = []
+    for i, word in enumerate(words):
+        match = CAPACITY_RE.match(word)
+        if match:
+            size = int(match.group(1)) * (1024 if match.group(2) in ("tb", "t") else 1)
+        elif word.isdigit() and i + 1 < len(words) and words[i + 1] in ("gb", "tb"):
+            size = int(word) * (1024 if words[i + 1] == "tb" else 1)
+        elif word.isdigit() and int(word) in STORAGE_SIZES:
+            size = int(word)
+        else:
+            continue
+        if size in STORAGE_SIZES:
+            found.append(size)
+    return float(max(found)) if found else None
+
+
+def model_descriptor(words, brand):
+    """Model tokens without brand, series, storage or filler words, e.g. {'13', 'pro', 'max'}"""
+    descriptor = []
+    for word in words:
+        if word in NOISE_WORDS or word in SERIES_WORDS or BRAND_WORDS.get(word) == brand or word == brand:
+            continue
+        if word in ("gb", "tb", "ram") or CAPACITY_RE.match(word):
+            continue
+        if word.isdigit() and int(word) in STORAGE_SIZES:
+            continue
+        descriptor.append(word)
+    return descriptor
+
+
+def model_number(descriptor):
+    """First token with a digit ('13', 's24', 'a55'): the blocking part of the model"""
+    return next((word for word in descriptor if any(c.isdigit() for c in word)), None)
+
+
+class ModelSignature:
+    """Normalized (brand, model number, storage) block plus the descriptor tokens compared within it"""
+    __slots__ = ("brand", "number", "storage_gb", "descriptor", "tokens")
+
+    def __init__(self, brand, number, storage_gb, descriptor):
+        self.brand = brand
+        self.number = number
+        self.storage_gb = storage_gb
+        self.descriptor = tuple(dict.fromkeys(descriptor))
+        self.tokens = frozenset(self.descriptor)
+
+    @property
+    def block(self):
+        return self.brand, self.number, self.storage_gb
+
+    @property
+    def model(self):
+        """Canonical model name shared by both sources, e.g. 'apple 13 pro max'"""
+        return " ".join((self.brand,) + self.descriptor)
+
+
+def signature(product):
+    """Normalize brand/model/storage from a Product's specs, falling back to its title"""
+    return signature_from(product.brand, product.model, product.product_name, product.storage_gb)
+
+
+def signature_from(brand, model, product_name, storage_gb):
+    """signature() from the raw Brand/Model specs, title and storage in GB"""
+    title = tokens(product_name)
+    brand = canonical_brand(brand, title)
+    model = model if model and "other" not in model.lower() else None
+    if model:
+        descriptor = model_descriptor(tokens(model), brand)
+        if not VARIANT_WORDS.intersection(descriptor):
+            # Dubizzle's Model spec is often just "13"; the title says whether it is a Pro Max
+            descriptor += [word for word in title if word in VARIANT_WORDS]
+    else:
+        title_descriptor = model_descriptor(title, brand)
+        number = model_number(title_descriptor)
+        descriptor = ([number] if number else []) + [word for word in title_descriptor if word in VARIANT_WORDS]
+    number = model_number(descriptor)
+    storage = storage_gb or storage_from_title(title)
+    if not brand or not number:
+        return None
+    return ModelSignature(brand, number, storage, descriptor)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class ModelGroup:
+    """Reference listings (MobileMasr) sharing one normalized model + storage"""
+    __slots__ = ("label", "signature", "reference_prices", "matched_prices")
+
+    def __init__(self, label, signature):
+        self.label = label
+        self.signature = signature
+        self.reference_prices = []
+        self.matched_prices = []
+
+
+class MatchIndex:
+    """Blocking index on (brand, model number, storage) over reference products
+
+    Each listing is only compared with the few model groups in its block, so
+    matching is linear in the number of listings rather than O(n^2).
+    """
+
+    def __init__(self, threshold=0.6):
+        self.threshold = threshold
+        self.blocks = defaultdict(dict)  # block -> descriptor tokens -> ModelGroup
+        self.counts = {"reference": 0, "matched": 0, "unmatched": 0, "skipped": 0}
+
+    def add_reference(self, product):
+        sig = signature(product)
+        if sig is None or sig.storage_gb is None:
+            self.counts["skipped"] += 1
+            return None
+        groups = self.blocks[sig.block]
+        group = groups.get(sig.tokens)
+        if group is None:
+            label = " ".join(w for w in tokens(product.model or product.product_name) if w != sig.brand)
+            group = groups[sig.tokens] = ModelGroup(label, sig)
+        if product.price is not None:
+            group.reference_prices.append(product.price)
+        self.counts["reference"] += 1
+        return group
+
+    def match(self, product):
+        """Best model group for a listing and its token similarity, or (None, score)"""
+        sig = signature(product)
+        if sig is None or sig.storage_gb is None:
+            return None, 0.0
+        best, best_score = None, 0.0
+        for group in self.blocks.get(sig.block, {}).values():
+            score = jaccard(sig.tokens, group.signature.tokens)
+            if score > best_score:
+                best, best_score = group, score
+        if best_score < self.threshold:
+            return None, best_score
+        return best, best_score
+
+    def link(self, product):
+        """Match a listing and record its price on the matched group"""
+        if product.price is None or product.details.get("Ad Type") == "Wanted Item":
+            self.counts["skipped"] += 1
+            return None, 0.0
+        group, score = self.match(product)
+        if group is None:
+            self.counts["unmatched"] += 1
+            return None, score
+        group.matched_prices.append(product.price)
+        self.counts["matched"] += 1
+        return group, score
+
+    def groups(self):
+        for groups in self.blocks.values():
+            yield from groups.values()
+
+    def comparison_rows(self, reference_source="mobilemasr", matched_source="dubizzle"):
+        """One row per model group with listings on both sides"""
+        rows = []
+        for group in self.groups():
+            if not group.matched_prices or not group.reference_prices:
+                continue
+            reference = statistics.median(group.reference_prices)
+            matched = statistics.median(group.matched_prices)
+            rows.append({
+                "brand": group.signature.brand,
+                "model": group.label,
+                "storage_gb": group.signature.storage_gb,
+                f"{reference_source}_listings": len(group.reference_prices),
+                f"{reference_source}_min": min(group.reference_prices),
+                f"{reference_source}_median": reference,
+                f"{matched_source}_listings": len(group.matched_prices),
+                f"{matched_source}_min": min(group.matched_prices),
+                f"{matched_source}_median": matched,
+                "median_gap_pct": round((matched - reference) / reference * 100, 1) if reference else None,
+            })
+        rows.sort(key=lambda row: (row["brand"], row["model"], row["storage_gb"]))
+        return rows
+
+    def summary(self):
+        c = self.counts
+        return (f"{c['reference']} reference listings in {sum(1 for _ in self.groups())} model groups, "
+                f"{c['matched']} matched, {c['unmatched']} unmatched, {c['skipped']} skipped")
+
+
+def load_products(paths, source):
+    """Products from wrapped JSON results files or NDJSON streams, each listing once across files"""
+    seen = set()
+    for path in paths:
+        for product in _load_file(path, source):
+            if product.key not in seen:
+                seen.add(product.key)
+                yield product
+
+
+def _load_file(path, source):
+    if path.endswith((".ndjson", ".jsonl", ".gz", ".zst")):
+        records = iter_products(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f).get("products", [])
+    for record in records:
+        if record.get("change") != "removed":
+            yield Product.from_dict(record, source)
+
+
+def build_comparison(dubizzle_paths, mobilemasr_paths, threshold=0.6, links_path=None):
+    """Index MobileMasr models, link every Dubizzle listing to them and return (index, rows)"""
+    index = MatchIndex(threshold)
+    for product in load_products(mobilemasr_paths, "mobilemasr"):
+        index.add_reference(product)
+
+    links = open(links_path, "w", encoding="utf-8") if links_path else None
+    try:
+        for product in load_products(dubizzle_paths, "dubizzle"):
+            group, score = index.link(product)
+            if links and group:
+                links.write(json.dumps({"listing_url": product.listing_url, "brand": group.signature.brand,
+                                        "model": group.label, "storage_gb": group.signature.storage_gb,
+                                        "score": round(score, 3)}, ensure_ascii=False) + "\n")
+    finally:
+        if links:
+            links.close()
+    return index, index.comparison_rows()
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match Dubizzle listings to MobileMasr models and compare prices")
+    parser.add_argument("--dubizzle", nargs="+", required=True, help="Dubizzle results (.json or .ndjson)")
+    parser.add_argument("--mobilemasr", nargs="+", required=True, help="MobileMasr results (.json or .ndjson)")
+    parser.add_argument("--output", default="price_comparison.csv", help="Per-model comparison table (CSV)")
+    parser.add_argument("--links", help="Also write one NDJSON line per matched Dubizzle listing")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Minimum token similarity within a block")
+    args = parser.parse_args()
+
+    index, rows = build_comparison(args.dubizzle, args.mobilemasr, args.threshold, args.links)
+    write_csv(rows, args.output)
+    print(f"[Match] {index.summary()}")
+    print(f"[Saved] {len(rows)} models compared to {args.output}")
+    for row in rows[:20]:
+        print(f"  {row['brand']} {row['model']} {row['storage_gb']:g} GB: MobileMasr {row['mobilemasr_median']:,.0f}, "
+              f"Dubizzle {row['dubizzle_median']:,.0f} ({row['median_gap_pct']:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
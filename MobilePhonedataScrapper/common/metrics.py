@@ -0,0 +1,300 @@
+# Per-stage latency histograms, failure counters and gauges, exported as Prometheus text or a JSON run profile
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "scraper_"
+# name -> (type, help); every sample also carries the labels of the view that recorded it (e.g. source)
+FAMILIES = {
+    "stage_seconds": ("histogram", "Time spent per stage (driver start, navigation, readiness wait, fetch, parse, save)"),
+    "failures_total": ("counter", "Failures by stage and reason (exception type, HTTP status, invalid page)"),
+    "recoveries_total": ("counter", "Problems fixed in place by stage and reason (e.g. an error page cured by a refresh)"),
+    "in_flight": ("gauge", "Requests currently in flight"),
+    "bytes_fetched_total": ("counter", "Response bytes received"),
+    "queue_depth": ("gauge", "Items waiting in a queue"),
+    "products_total": ("counter", "Products handed to the output sinks"),
+}
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def failure_reason(error):
+    """Short label for why something failed: the exception type, or a given string"""
+    return error if isinstance(error, str) else type(error).__name__
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within a bucket, capped at the largest value seen)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+
+class Metrics:
+    """Thread-safe metric store shared by every scraper in a run
+
+    Scrapers record through labeled() views, so one registry (and one endpoint
+    or file) covers Dubizzle and MobileMasr jobs running side by side. Recording
+    is a dict lookup under a lock, cheap enough for per-request and per-product use.
+    """
+
+    def __init__(self, labels=None, _root=None):
+        self.labels = dict(labels or {})
+        root = _root or self
+        self._root = root
+        if _root is None:
+            self._lock = threading.Lock()
+            self._series = {}  # (name, sorted label items) -> float or Histogram
+            self._peaks = {}   # gauge series -> highest value seen
+            self.started_at = datetime.now()
+            self._started = time.monotonic()
+
+    def labeled(self, **labels):
+        """A view that adds `labels` to everything it records"""
+        return Metrics({**self.labels, **labels}, _root=self._root)
+
+    def _key(self, name, labels):
+        if name not in FAMILIES:
+            raise ValueError(f"Unknown metric '{name}'")
+        return name, tuple(sorted({**self.labels, **labels}.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        root = self._root
+        with root._lock:
+            root._series[key] = root._series.get(key, 0) + value
+
+    def add_gauge(self, name, delta, **labels):
+        key = self._key(name, labels)
+        root = self._root
+        with root._lock:
+            value = root._series.get(key, 0) + delta
+            root._series[key] = value
+            root._peaks[key] = max(root._peaks.get(key, value), value)
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        root = self._root
+        with root._lock:
+            root._series[key] = value
+            root._peaks[key] = max(root._peaks.get(key, value), value)
+
+    def observe(self, stage, seconds):
+        key = self._key("stage_seconds", {"stage": stage})
+        root = self._root
+        with root._lock:
+            histogram = root._series.get(key)
+            if histogram is None:
+                histogram = root._series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def failure(self, stage, reason):
+        self.inc("failures_total", stage=stage, reason=failure_reason(reason))
+
+    @contextmanager
+    def stage(self, stage):
+        """Time a block into stage_seconds{stage=...}"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @contextmanager
+    def in_flight(self, kind):
+        self.add_gauge("in_flight", 1, kind=kind)
+        try:
+            yield
+        finally:
+            self.add_gauge("in_flight", -1, kind=kind)
+
+    def _snapshot(self):
+        """Copies of the series this view covers (all of them for the root, its labels' subset for a view)"""
+        root = self._root
+        wanted = set(self.labels.items())
+        with root._lock:
+            series = {}
+            for key, value in root._series.items():
+                if not wanted <= set(key[1]):
+                    continue
+                if isinstance(value, Histogram):
+                    copy = Histogram()
+                    copy.counts, copy.sum, copy.count, copy.max = list(value.counts), value.sum, value.count, value.max
+                    value = copy
+                series[key] = value
+            return series, dict(root._peaks)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        series, _ = self._snapshot()
+        by_name = {}
+        for (name, labels), value in sorted(series.items(), key=lambda item: item[0]):
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, samples in by_name.items():
+            kind, help_text = FAMILIES[name]
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in samples:
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), value.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{full}_sum{_labels(labels)} {value.sum:.6f}")
+                    lines.append(f"{full}_count{_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{full}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the exposition atomically (e.g. for node_exporter's textfile collector)"""
+        _write_atomic(path, self.to_prometheus())
+
+    def profile(self):
+        """Per-run summary for diffing: stage timings, failures, byte/product counters and gauge peaks"""
+        series, peaks = self._snapshot()
+        result = {"started_at": self._root.started_at.isoformat(timespec="seconds"),
+                  "duration_s": round(time.monotonic() - self._root._started, 3),
+                  "stages": {}, "failures": {}, "counters": {}, "gauges": {}}
+        for (name, labels), value in sorted(series.items(), key=lambda item: item[0]):
+            label_map = dict(labels)
+            if name == "stage_seconds":
+                stage = label_map.pop("stage")
+                result["stages"][_profile_key(label_map, stage)] = {
+                    "count": value.count,
+                    "total_s": round(value.sum, 3),
+                    "mean_ms": round(value.sum / value.count * 1000, 3),
+                    "p50_ms": round(value.quantile(0.5) * 1000, 3),
+                    "p95_ms": round(value.quantile(0.95) * 1000, 3),
+                    "max_ms": round(value.max * 1000, 3),
+                }
+            elif name == "failures_total":
+                reason = label_map.pop("reason")
+                stage = label_map.pop("stage")
+                result["failures"][_profile_key(label_map, f"{stage}/{reason}")] = value
+            elif FAMILIES[name][0] == "counter":
+                result["counters"][_profile_key(label_map, name)] = value
+            else:
+                result["gauges"][_profile_key(label_map, name)] = {"last": value, "max": peaks.get((name, labels), value)}
+        return result
+
+    def write_profile(self, path):
+        _write_atomic(path, json.dumps(self.profile(), indent=2))
+
+    def summary(self):
+        """One line: the stages that took the most time and the failure count"""
+        profile = self.profile()
+        top = sorted(profile["stages"].items(), key=lambda item: -item[1]["total_s"])[:4]
+        stages = ", ".join(f"{name} {data['total_s']:.1f}s (p95 {data['p95_ms']:.0f} ms)" for name, data in top)
+        return f"{stages or 'no stages recorded'}; {sum(profile['failures'].values())} failures"
+
+
+def _labels(items):
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+
+def _profile_key(labels, name):
+    """'dubizzle/http/in_flight' style keys: the source, the other label values in key order, then the metric"""
+    ordered = sorted(labels.items(), key=lambda item: (item[0] != "source", item[0]))
+    return "/".join([str(value) for _, value in ordered] + [name])
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server (call shutdown() to stop it)
+
+    Only local scrapers can reach it unless `host` is set to another address.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def diff_profiles(old, new):
+    """Lines comparing two run profiles: stage time and p95 changes, then failure count changes"""
+    lines = [f"Duration: {old['duration_s']:.1f}s -> {new['duration_s']:.1f}s"]
+    for name in sorted(set(old["stages"]) | set(new["stages"])):
+        a, b = old["stages"].get(name), new["stages"].get(name)
+        if a and b:
+            change = (b["mean_ms"] / a["mean_ms"] - 1) * 100 if a["mean_ms"] else 0.0
+            lines.append(f"  {name:<40} mean {a['mean_ms']:9.2f} -> {b['mean_ms']:9.2f} ms ({change:+.1f}%), "
+                         f"p95 {a['p95_ms']:.1f} -> {b['p95_ms']:.1f} ms, count {a['count']} -> {b['count']}")
+        else:
+            lines.append(f"  {name:<40} {'only in new' if b else 'only in old'}")
+    for name in sorted(set(old["failures"]) | set(new["failures"])):
+        a, b = old["failures"].get(name, 0), new["failures"].get(name, 0)
+        if a != b:
+            lines.append(f"  failures {name:<31} {a:g} -> {b:g}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two scraper run profiles (--profile output)")
+    parser.add_argument("old", help="Earlier profile JSON")
+    parser.add_argument("new", help="Later profile JSON")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    print("\n".join(diff_profiles(old, new)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Streaming NDJSON output with batched flushes and a manifest file
+import argparse
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+
+from common.product import json_default
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def manifest_path_for(path):
+    """products.ndjson.gz -> products.manifest.json"""
+    base = path
+    for ext in (".gz", ".zst", ".ndjson", ".jsonl"):
+        if base.endswith(ext):
+            base = base[:-len(ext)]
+    return base + ".manifest.json"
+
+
+def open_text(path, mode, compression=None):
+    """Open an NDJSON file for text reading ("r"), writing ("w") or appending ("a")"""
+    if compression is None:
+        if path.endswith(".gz"):
+            compression = "gzip"
+        elif path.endswith(".zst"):
+            compression = "zstd"
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package: pip install zstandard")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            return io.TextIOWrapper(reader, encoding="utf-8")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class NDJSONWriter:
+    """Append one JSON product per line as products are parsed, flushing in batches"""
+
+    def __init__(self, path, compression=None, batch_size=100, append=False):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression '{compression}' (use gzip or zstd)")
+        self.compression = compression
+        self.path = path if path.endswith(EXTENSIONS[compression]) else path + EXTENSIONS[compression]
+        self.manifest_path = manifest_path_for(self.path)
+        self.batch_size = batch_size
+        self.scraped_at = datetime.now().isoformat()
+        self.total_products = 0
+        if append and os.path.exists(self.manifest_path):
+            # Continue an interrupted run: keep its start time and count
+            with open(self.manifest_path, encoding="utf-8") as f:
+                previous = json.load(f)
+            self.scraped_at = previous.get("scraped_at", self.scraped_at)
+            self.total_products = previous.get("total_products", 0)
+        self._buffer = []
+        self._file = open_text(self.path, "a" if append else "w", compression)
+        self._write_manifest(complete=False)
+
+    def write(self, product):
+        """Buffer a product; the batch is written once batch_size products are waiting"""
+        self._buffer.append(json.dumps(product, ensure_ascii=False, default=json_default))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered products and refresh the manifest, so a crash loses at most one batch"""
+        if not self._buffer:
+            return
+        self._file.write("\n".join(self._buffer) + "\n")
+        self._file.flush()
+        self.total_products += len(self._buffer)
+        self._buffer = []
+        self._write_manifest(complete=False)
+
+    def close(self):
+        """Flush remaining products and mark the manifest complete"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        self._write_manifest(complete=True)
+
+    def _write_manifest(self, complete):
+        manifest = {
+            "scraped_at": self.scraped_at,
+            "total_products": self.total_products,
+            "products_file": os.path.basename(self.path),
+            "format": "ndjson",
+            "compression": self.compression,
+            "complete": complete,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_products(path):
+    """Yield products from an NDJSON file, tolerating a truncated last line or batch"""
+    with open_text(path, "r") as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return  # Partial line from an interrupted run
+        except EOFError:
+            return  # Compressed stream cut off mid-batch
+
+
+def export_wrapped_json(ndjson_path, json_path):
+    """Rebuild the classic {"scraped_at", "total_products", "products"} document, streaming"""
+    manifest_path = manifest_path_for(ndjson_path)
+    scraped_at = datetime.now().isoformat()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            scraped_at = json.load(f).get("scraped_at", scraped_at)
+
+    # Count first so the keys keep save_data's order; the manifest's count includes any truncated tail
+    total = sum(1 for _ in iter_products(ndjson_path))
+    with open(json_path, "w", encoding="utf-8") as out:
+        out.write('{\n  "scraped_at": ' + json.dumps(scraped_at) + ',\n  "total_products": ' + str(total)
+                  + ',\n  "products": [')
+        for i, product in enumerate(iter_products(ndjson_path)):
+            out.write(",\n    " if i else "\n    ")
+            out.write(json.dumps(product, ensure_ascii=False))
+        out.write("\n  ]\n}\n")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the wrapped JSON document from an NDJSON output")
+    parser.add_argument("input", help="NDJSON output file (.ndjson, .ndjson.gz, .ndjson.zst)")
+    parser.add_argument("output", help="JSON file to write")
+    args = parser.parse_args()
+
+    total = export_wrapped_json(args.input, args.output)
+    print(f"[Saved] {total} products to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Parsing helpers for the free-text fields both scrapers emit
+import re
+
+PRICE_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+CURRENCY_RE = re.compile(r"\b([A-Z]{3})\b")
+CAPACITY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(tb|gb|mb)?\b", re.IGNORECASE)
+UNIT_TO_GB = {"tb": 1024.0, "gb": 1.0, "mb": 1 / 1024}
+
+MISSING = {"", "N/A", "n/a", "null", "None"}
+
+
+def is_missing(value):
+    """None, empty strings and the "N/A" sentinel all mean no value"""
+    return value is None or (isinstance(value, str) and value.strip() in MISSING)
+
+
+def parse_price(text):
+    """'EGP 133,000' -> (133000.0, 'EGP'); missing or unparseable prices -> (None, None)"""
+    if is_missing(text):
+        return None, None
+    if isinstance(text, (int, float)):
+        return float(text), None
+    match = PRICE_RE.search(text)
+    if not match:
+        return None, None
+    currency = CURRENCY_RE.search(text)
+    return float(match.group(0).replace(",", "")), currency.group(1) if currency else None
+
+
+def parse_capacity_gb(text):
+    """'1 tb' -> 1024.0, '128 GB' -> 128.0, '6' -> 6.0 (Dubizzle gives RAM in GB without a unit)"""
+    if is_missing(text):
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = CAPACITY_RE.search(text)
+    if not match:
+        return None
+    unit = (match.group(2) or "gb").lower()
+    return float(match.group(1)) * UNIT_TO_GB[unit]
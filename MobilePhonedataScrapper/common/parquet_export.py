@@ -0,0 +1,184 @@
+# Columnar Parquet export with a fixed, typed schema for the Bronze layer
+import argparse
+import json
+import os
+from datetime import datetime
+
+from common.ndjson_writer import iter_products, manifest_path_for
+from common.normalize import is_missing
+from common.product import Product
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# details key -> column name; anything not listed lands in details_extra as JSON
+DETAIL_COLUMNS = {
+    "Brand": "brand",
+    "Model": "model",
+    "RAM": "ram",
+    "Storage": "storage",
+    "Color": "color",
+    "Condition": "condition",
+    "Battery Health": "battery_health",
+    "Battery Capacity": "battery_capacity",
+    "Warranty": "warranty",
+    "Insurance": "insurance",
+    "SIM": "sim",
+    "SKU": "sku",
+    "Price Type": "price_type",
+    "Ad Type": "ad_type",
+    "Payment Option": "payment_option",
+}
+
+FLOAT_COLUMNS = {"price", "ram_gb", "storage_gb"}
+COLUMNS = [
+    "source", "scraped_at", "product_name", "price", "currency", "price_raw",
+    "ram_gb", "storage_gb", "seller_name", "location", "listing_url",
+] + list(DETAIL_COLUMNS.values()) + ["details_extra", "change"]
+
+
+def build_schema():
+    """Arrow schema shared by every export, so files from both scrapers concatenate cleanly"""
+    fields = []
+    for name in COLUMNS:
+        if name == "scraped_at":
+            fields.append(pa.field(name, pa.timestamp("us")))
+        elif name in FLOAT_COLUMNS:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def product_to_row(product, source, scraped_at):
+    """Flatten one Product (or scraped product dict) into typed column values
+
+    Delta runs' records keep their "change" ("new", "changed" or "removed"); a
+    removal marker becomes a row with only its key (listing_url or sku) filled in.
+    """
+    if not isinstance(product, Product):
+        product = Product.from_dict(product, source)
+    row = {
+        "scraped_at": scraped_at,
+        "source": source,
+        "product_name": product.product_name,
+        "price_raw": product.price_raw,
+        "price": product.price,
+        "currency": product.currency,
+        "ram_gb": product.ram_gb,
+        "storage_gb": product.storage_gb,
+        "seller_name": product.seller_name,
+        "location": product.location,
+        "listing_url": product.listing_url,
+    }
+    extra = {}
+    for key, value in product.details.items():
+        column = DETAIL_COLUMNS.get(key)
+        if column:
+            row[column] = None if is_missing(value) else str(value)
+        else:
+            extra[key] = value
+    for column in DETAIL_COLUMNS.values():
+        row.setdefault(column, None)
+    row["details_extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+    row["change"] = product.change
+    for column in ("product_name", "seller_name", "location"):
+        if is_missing(row[column]):
+            row[column] = None
+    return row
+
+
+class ParquetWriter:
+    """Sink that buffers products and writes a Parquet row group every row_group_size rows
+
+    Every row is stamped with `scraped_at` (the run's start unless given), like the
+    single scraped_at of a JSON results file or NDJSON manifest.
+    """
+
+    def __init__(self, path, source, row_group_size=5000, compression="zstd", scraped_at=None):
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+        self.path = path
+        self.source = source
+        self.scraped_at = scraped_at or datetime.now()
+        self.row_group_size = row_group_size
+        self.schema = build_schema()
+        self.total_products = 0
+        self._columns = {name: [] for name in COLUMNS}
+        self._pending = 0
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, product, scraped_at=None):
+        """Add one product; a row group is written once row_group_size products are buffered"""
+        row = product_to_row(product, self.source, scraped_at or self.scraped_at)
+        for name in COLUMNS:
+            self._columns[name].append(row[name])
+        self._pending += 1
+        if self._pending >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as one row group"""
+        if not self._pending:
+            return
+        table = pa.Table.from_pydict(self._columns, schema=self.schema)
+        self._writer.write_table(table)
+        self.total_products += self._pending
+        self._columns = {name: [] for name in COLUMNS}
+        self._pending = 0
+
+    def close(self):
+        """Flush remaining rows and write the Parquet footer"""
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_json_file(json_path, parquet_path, source, row_group_size=5000):
+    """Convert an existing wrapped JSON output file (or NDJSON stream) to Parquet, dated by its scraped_at"""
+    if json_path.endswith((".ndjson", ".jsonl", ".gz", ".zst")):
+        products, scraped_at = iter_products(json_path), None
+        manifest_path = manifest_path_for(json_path)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest_scraped_at = json.load(f).get("scraped_at")
+            scraped_at = datetime.fromisoformat(manifest_scraped_at) if manifest_scraped_at else None
+    else:
+        with open(json_path, encoding="utf-8") as f:
+            data = json.load(f)
+        products = data.get("products", [])
+        scraped_at = datetime.fromisoformat(data["scraped_at"]) if data.get("scraped_at") else None
+    if scraped_at is None:
+        # No recorded scraped_at: the file's last write is the closest thing to when it was scraped
+        scraped_at = datetime.fromtimestamp(os.path.getmtime(json_path))
+
+    with ParquetWriter(parquet_path, source, row_group_size=row_group_size, scraped_at=scraped_at) as writer:
+        for product in products:
+            writer.write(product)
+    return writer.total_products
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert scraper JSON/NDJSON output to Parquet")
+    parser.add_argument("input", help="Scraper output file (.json, .ndjson, .ndjson.gz)")
+    parser.add_argument("output", help="Parquet file to write")
+    parser.add_argument("--source", required=True, help="Source name, e.g. dubizzle or mobilemasr")
+    args = parser.parse_args()
+
+    total = export_json_file(args.input, args.output, args.source)
+    print(f"[Saved] {total} products to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
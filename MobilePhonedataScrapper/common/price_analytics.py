@@ -0,0 +1,346 @@
+# Vectorized price statistics, outlier flags and day-over-day deltas over scraped snapshots
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from common.matching import signature_from
+from common.ndjson_writer import iter_products, manifest_path_for
+from common.normalize import is_missing, parse_capacity_gb, parse_price
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pc = pq = None
+
+QUANTILES = {"p10": 0.10, "p25": 0.25, "median": 0.50, "p75": 0.75, "p90": 0.90}
+# Spec columns kept per row; listings are grouped on the canonical model derived from them
+TEXT_COLUMNS = ("source", "brand", "model", "product_name", "storage", "condition")
+OUTLIER_IQR = 1.5
+OUTLIER_MIN_LISTINGS = 5
+
+
+class Categorical:
+    """Dictionary-encoded column: int32 codes into a list of distinct values"""
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+
+class ColumnBuilder:
+    """Accumulates snapshot rows, factorizing text columns as they arrive"""
+
+    def __init__(self):
+        self.prices = []
+        self.days = []
+        self.urls = []
+        self.codes = {name: [] for name in TEXT_COLUMNS}
+        self.lookup = {name: {} for name in TEXT_COLUMNS}
+        self.parts = []
+        self.seen = set()
+
+    def add(self, source, record, day):
+        price, _ = parse_price(record.get("price"))
+        if price is None or record.get("change") == "removed":
+            return
+        # Overlapping outputs (a search and the full crawl) list the same ad twice on one day
+        seen_key = (source, day, record.get("listing_url"))
+        if seen_key in self.seen:
+            return
+        self.seen.add(seen_key)
+        details = record.get("details") or {}
+        values = {
+            "source": source,
+            "brand": details.get("Brand"),
+            "model": details.get("Model"),
+            "product_name": record.get("product_name"),
+            "storage": details.get("Storage"),
+            "condition": details.get("Condition"),
+        }
+        for name, value in values.items():
+            lookup = self.lookup[name]
+            value = None if is_missing(value) else value
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            self.codes[name].append(code)
+        self.prices.append(price)
+        self.days.append(day)
+        self.urls.append(record.get("listing_url"))
+
+    def add_parquet(self, path):
+        """Append a Parquet export (common.parquet_export schema) without going through Python rows"""
+        if pq is None:
+            raise ImportError("Parquet snapshots require pyarrow: pip install pyarrow")
+        table = pq.read_table(path, columns=["source", "scraped_at", "price", "brand", "model", "product_name",
+                                             "storage", "condition", "listing_url"])
+        table = table.filter(pc.is_valid(table["price"]))
+        self.parts.append(table)
+
+    def build(self):
+        """A PriceFrame over every row added so far"""
+        columns = {}
+        for name in TEXT_COLUMNS:
+            categories = list(self.lookup[name])
+            codes = np.asarray(self.codes[name], dtype=np.int32)
+            for table in self.parts:
+                encoded = pc.dictionary_encode(table[name].combine_chunks())
+                more = encoded.dictionary.to_pylist()
+                # Map the part's own dictionary onto the running category list (one lookup per distinct value)
+                lookup = self.lookup[name]
+                remap = np.empty(len(more) + 1, dtype=np.int32)
+                for i, value in enumerate(more):
+                    code = lookup.get(value)
+                    if code is None:
+                        code = lookup[value] = len(lookup)
+                        categories.append(value)
+                    remap[i] = code
+                if None not in lookup:
+                    lookup[None] = len(lookup)
+                    categories.append(None)
+                remap[-1] = lookup[None]
+                indices = encoded.indices.fill_null(len(more)).to_numpy(zero_copy_only=False)
+                codes = np.concatenate([codes, remap[indices]])
+            columns[name] = Categorical(codes, categories)
+
+        prices = [np.asarray(self.prices, dtype=np.float64)]
+        days = [np.asarray(self.days, dtype="datetime64[D]")]
+        urls = [np.asarray(self.urls, dtype=object)]
+        for table in self.parts:
+            prices.append(table["price"].to_numpy())
+            days.append(table["scraped_at"].to_numpy().astype("datetime64[D]"))
+            urls.append(np.asarray(table["listing_url"].to_pylist(), dtype=object))
+        return PriceFrame(np.concatenate(prices), np.concatenate(days), np.concatenate(urls), columns)
+
+
+class PriceFrame:
+    """Columnar snapshot rows: price, day, listing URL and dictionary-encoded specs
+
+    Listings are normalized to a canonical (model, storage) once per distinct
+    brand/model/title/storage combination, so repeated daily snapshots of the
+    same ads cost one normalization, and every statistic below is computed on
+    whole arrays.
+    """
+
+    def __init__(self, prices, days, urls, columns):
+        self.prices = prices
+        self.days = days
+        self.urls = urls
+        self.columns = columns
+        self.model, self.storage_gb = self._canonical_models()
+
+    def __len__(self):
+        return len(self.prices)
+
+    def _canonical_models(self):
+        c = self.columns
+        key = combine_codes([c["brand"].codes, c["model"].codes, c["product_name"].codes, c["storage"].codes])
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        labels, storage = {}, np.full(len(first), np.nan)
+        label_codes = np.empty(len(first), dtype=np.int32)
+        for i, row in enumerate(first):
+            brand, model, name, size = (c[column].codes[row] for column in ("brand", "model", "product_name", "storage"))
+            sig = signature_from(c["brand"].categories[brand], c["model"].categories[model],
+                                 c["product_name"].categories[name],
+                                 parse_capacity_gb(c["storage"].categories[size]))
+            label = sig.model if sig else None
+            label_codes[i] = labels.setdefault(label, len(labels))
+            if sig and sig.storage_gb:
+                storage[i] = sig.storage_gb
+        inverse = inverse.reshape(-1)
+        return Categorical(label_codes[inverse], list(labels)), storage[inverse]
+
+    def valid(self):
+        """Rows with a recognised model and storage"""
+        no_model = self.model.categories.index(None) if None in self.model.categories else -1
+        return (self.model.codes != no_model) & ~np.isnan(self.storage_gb)
+
+    def group_ids(self, keys, mask):
+        """Dense group ids over the given key arrays for the masked rows, plus one representative row per group"""
+        groups, first, inverse = np.unique(combine_codes([key[mask] for key in keys]), return_index=True,
+                                           return_inverse=True)
+        return inverse.reshape(-1), np.flatnonzero(mask)[first], len(groups)
+
+    def price_stats(self, by_condition=True):
+        """min/percentiles/max/mean per (source, model, storage[, condition])"""
+        mask = self.valid()
+        keys = [self.columns["source"].codes, self.model.codes, self.storage_gb]
+        if by_condition:
+            keys.append(self.columns["condition"].codes)
+        group, rows, n_groups = self.group_ids(keys, mask)
+        prices = self.prices[mask]
+        stats = grouped_stats(group, prices, n_groups)
+        out = []
+        for g, row in enumerate(rows):
+            record = self._labels(row, by_condition)
+            record.update({name: round(float(values[g]), 2) for name, values in stats.items()})
+            record["listings"] = int(stats["listings"][g])
+            out.append(record)
+        out.sort(key=lambda r: (r["model"], r["storage_gb"], r["source"], r.get("condition") or ""))
+        return out
+
+    def outliers(self, iqr=OUTLIER_IQR, min_listings=OUTLIER_MIN_LISTINGS):
+        """Rows priced outside [p25 - iqr*IQR, p75 + iqr*IQR] of their (source, model, storage, condition) group"""
+        mask = self.valid()
+        keys = [self.columns["source"].codes, self.model.codes, self.storage_gb, self.columns["condition"].codes]
+        group, _, n_groups = self.group_ids(keys, mask)
+        prices = self.prices[mask]
+        stats = grouped_stats(group, prices, n_groups)
+        spread = (stats["p75"] - stats["p25"]) * iqr
+        low, high = (stats["p25"] - spread)[group], (stats["p75"] + spread)[group]
+        flagged = ((prices < low) | (prices > high)) & (stats["listings"][group] >= min_listings)
+        rows = np.flatnonzero(mask)[flagged]
+        medians = stats["median"][group][flagged]
+        out = []
+        for row, median in zip(rows, medians):
+            record = self._labels(row, True)
+            record.update({"day": str(self.days[row]), "price": float(self.prices[row]),
+                           "group_median": round(float(median), 2), "listing_url": self.urls[row]})
+            out.append(record)
+        return out
+
+    def daily_deltas(self):
+        """Median price per (source, model, storage) and day, with the change from the previous snapshot day"""
+        mask = self.valid()
+        day_index = (self.days - self.days.min()).astype(np.int64)
+        keys = [self.columns["source"].codes, self.model.codes, self.storage_gb, day_index]
+        group, rows, n_groups = self.group_ids(keys, mask)
+        stats = grouped_stats(group, self.prices[mask], n_groups)
+        # np.unique sorts groups by key, so each series is contiguous and in day order
+        series = np.stack([self.columns["source"].codes[rows], self.model.codes[rows], self.storage_gb[rows]], axis=1)
+        same = np.r_[False, np.all(series[1:] == series[:-1], axis=1)]
+        median = stats["median"]
+        previous = np.r_[np.nan, median[:-1]]
+        delta = np.where(same, median - previous, np.nan)
+        out = []
+        for g, row in enumerate(rows):
+            record = self._labels(row, False)
+            record.update({"day": str(self.days[row]), "listings": int(stats["listings"][g]),
+                           "median": round(float(median[g]), 2)})
+            if same[g]:
+                record["previous_median"] = round(float(previous[g]), 2)
+                record["delta"] = round(float(delta[g]), 2)
+                record["delta_pct"] = round(float(delta[g] / previous[g] * 100), 2) if previous[g] else None
+            out.append(record)
+        return out
+
+    def _labels(self, row, with_condition):
+        labels = {
+            "source": self.columns["source"].categories[self.columns["source"].codes[row]],
+            "model": self.model.categories[self.model.codes[row]],
+            "storage_gb": float(self.storage_gb[row]),
+        }
+        if with_condition:
+            labels["condition"] = self.columns["condition"].categories[self.columns["condition"].codes[row]]
+        return labels
+
+
+def combine_codes(keys):
+    """One int64 per row that sorts like the tuple of keys (float keys such as storage are ranked first)"""
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        if key.dtype.kind == "f":
+            _, key = np.unique(key, return_inverse=True)
+            key = key.reshape(-1)
+        combined = combined * (int(key.max(initial=0)) + 1) + key
+    return combined
+
+
+def grouped_stats(group, values, n_groups):
+    """Count, min, max, mean and QUANTILES (linear interpolation) of values per dense group id"""
+    order = np.lexsort((values, group))
+    g, v = group[order], values[order]
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    stats = {
+        "listings": counts,
+        "min": v[starts],
+        "max": v[starts + counts - 1],
+        "mean": np.bincount(g, weights=v, minlength=n_groups) / counts,
+    }
+    for name, q in QUANTILES.items():
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        stats[name] = v[lower] + (v[upper] - v[lower]) * (position - lower)
+    return stats
+
+
+def snapshot_day(path, data=None):
+    """Snapshot date: the results file's scraped_at, the NDJSON manifest's, or the file's mtime"""
+    scraped_at = data.get("scraped_at") if data else None
+    if scraped_at is None and os.path.exists(manifest_path_for(path)):
+        with open(manifest_path_for(path), encoding="utf-8") as f:
+            scraped_at = json.load(f).get("scraped_at")
+    if scraped_at:
+        return datetime.fromisoformat(scraped_at).date()
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+
+def load_snapshots(dubizzle=(), mobilemasr=(), parquet=()):
+    """Load JSON/NDJSON results of each source and Parquet exports into one PriceFrame"""
+    if np is None:
+        raise ImportError("Price analytics requires numpy: pip install numpy")
+    builder = ColumnBuilder()
+    for source, paths in (("dubizzle", dubizzle), ("mobilemasr", mobilemasr)):
+        for path in paths:
+            if path.endswith((".ndjson", ".jsonl", ".gz", ".zst")):
+                day, records = snapshot_day(path), iter_products(path)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                day, records = snapshot_day(path, data), data.get("products", [])
+            for record in records:
+                builder.add(source, record, day)
+    for path in parquet:
+        builder.add_parquet(path)
+    return builder.build()
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price statistics, outliers and daily deltas over scraped snapshots")
+    parser.add_argument("--dubizzle", nargs="*", default=[], help="Dubizzle results (.json or .ndjson)")
+    parser.add_argument("--mobilemasr", nargs="*", default=[], help="MobileMasr results (.json or .ndjson)")
+    parser.add_argument("--parquet", nargs="*", default=[], help="Parquet exports (common.parquet_export)")
+    parser.add_argument("--output-dir", default=".", help="Where price_stats/price_outliers/price_deltas.csv go")
+    args = parser.parse_args()
+    if not (args.dubizzle or args.mobilemasr or args.parquet):
+        parser.error("give at least one snapshot with --dubizzle, --mobilemasr or --parquet")
+
+    start = time.perf_counter()
+    frame = load_snapshots(args.dubizzle, args.mobilemasr, args.parquet)
+    loaded = time.perf_counter()
+    stats, outliers, deltas = frame.price_stats(), frame.outliers(), frame.daily_deltas()
+    done = time.perf_counter()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, rows in (("price_stats", stats), ("price_outliers", outliers), ("price_deltas", deltas)):
+        write_csv(rows, os.path.join(args.output_dir, f"{name}.csv"))
+    print(f"[Analytics] {len(frame)} priced rows, {int(frame.valid().sum())} with a recognised model "
+          f"(load {loaded - start:.2f}s, stats {done - loaded:.2f}s)")
+    print(f"[Saved] {len(stats)} price groups, {len(outliers)} outliers, {len(deltas)} daily medians "
+          f"to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Typed product record shared by both scrapers, serialized to the original JSON shape on output
+import json
+import sys
+from dataclasses import dataclass
+
+from common.normalize import is_missing, parse_capacity_gb, parse_price
+
+NA = "N/A"
+# "Used", "128 GB", "Cash", ... repeat across thousands of listings; longer strings rarely do
+INTERN_MAX_LENGTH = 40
+
+
+def _text(value):
+    """The "N/A" sentinel (or None) becomes None; every other string is kept as scraped"""
+    return None if value is None or value == NA else value
+
+
+def _intern(value):
+    """Low-cardinality strings (cities, brands, detail keys and short values) are shared across records"""
+    return sys.intern(value) if isinstance(value, str) and len(value) <= INTERN_MAX_LENGTH else value
+
+
+def _clean(value):
+    return None if is_missing(value) else _intern(value)
+
+
+@dataclass(slots=True)
+class Product:
+    """One scraped listing with numeric price and normalized specs
+
+    `details` keeps every spec as scraped (short strings interned) and to_dict() rebuilds
+    the exact {"product_name", "price", ..., "details"} document the scrapers have
+    always written, so JSON/NDJSON output is unchanged.
+    """
+    source: str
+    product_name: str | None
+    price: float | None
+    currency: str | None
+    price_raw: str | None
+    seller_name: str | None
+    location: str | None
+    listing_url: str | None
+    brand: str | None
+    model: str | None
+    condition: str | None
+    ram_gb: float | None
+    storage_gb: float | None
+    details: dict
+    change: str | None = None
+    queries: list | None = None
+
+    @classmethod
+    def from_scraped(cls, source, product_name, price_raw, seller_name, location, listing_url, details,
+                     price=None, currency=None):
+        """Build a record from a parser's raw fields; price/currency are parsed from price_raw unless given"""
+        details = {_intern(key): _intern(value) for key, value in details.items()}
+        if price is None:
+            price, currency = parse_price(price_raw)
+        return cls(
+            source=_intern(source),
+            product_name=_text(product_name),
+            price=price,
+            currency=_intern(currency),
+            price_raw=_text(price_raw),
+            seller_name=_text(seller_name),
+            location=_intern(_text(location)),
+            listing_url=listing_url,
+            brand=_clean(details.get("Brand")),
+            model=_clean(details.get("Model")),
+            condition=_clean(details.get("Condition")),
+            ram_gb=parse_capacity_gb(details.get("RAM")),
+            storage_gb=parse_capacity_gb(details.get("Storage")),
+            details=details,
+        )
+
+    @classmethod
+    def from_dict(cls, data, source):
+        """Rebuild a record from the JSON document (journal rows, saved results)"""
+        product = cls.from_scraped(source, data.get("product_name"), data.get("price"), data.get("seller_name"),
+                                   data.get("location"), data.get("listing_url"), data.get("details") or {})
+        product.change = data.get("change")
+        product.queries = data.get("queries")
+        return product
+
+    @property
+    def key(self):
+        """MobileMasr products are keyed by SKU, Dubizzle ads by their listing URL"""
+        return self.details.get("SKU") or self.listing_url
+
+    def to_dict(self):
+        data = {
+            "product_name": NA if self.product_name is None else self.product_name,
+            "price": NA if self.price_raw is None else self.price_raw,
+            "seller_name": NA if self.seller_name is None else self.seller_name,
+            "location": NA if self.location is None else self.location,
+            "listing_url": self.listing_url,
+            "details": self.details,
+        }
+        if self.queries is not None:
+            data["queries"] = self.queries
+        if self.change is not None:
+            data["change"] = self.change
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+def json_default(value):
+    """json.dumps(..., default=json_default) writes Products (and plain dicts) in the output shape"""
+    if isinstance(value, Product):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def as_dict(product):
+    """Output-shaped dict for a Product or an already plain record (e.g. removal markers)"""
+    return product.to_dict() if isinstance(product, Product) else product
@@ -0,0 +1,138 @@
+# Content-addressed on-disk cache of fetched pages and Algolia responses, with a zero-network replay mode
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body BLOB NOT NULL,
+    charset TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+MODES = ("cache", "replay")
+
+
+def cache_key(url, payload=None):
+    """SHA-256 of the URL plus the (canonical JSON) request payload or variant tag"""
+    material = url if payload is None else url + "\n" + json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    __slots__ = ("body", "charset", "etag", "last_modified", "fresh")
+
+    def __init__(self, body, charset, etag, last_modified, fresh):
+        self.body = body
+        self.charset = charset
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def conditional_headers(self):
+        """Validators to send when revalidating a stale entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """zlib-compressed response bodies in SQLite, fresh for `ttl` seconds, LRU-evicted past `max_bytes`
+
+    In "cache" mode fresh entries are served, stale ones are revalidated by the
+    caller (ETag / Last-Modified) and misses go to the network. In "replay" mode
+    callers serve whatever is cached, stale or not, and never touch the network.
+    """
+
+    def __init__(self, path, ttl=86400, max_bytes=2 * 1024 ** 3, mode="cache"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode '{mode}' (use {' or '.join(MODES)})")
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.replay = mode == "replay"
+        self.counts = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        # Autocommit: several scrapers in one process may share the file, so no write transaction stays open.
+        # Only the event loop thread uses the connection, but cleanup may run in a worker thread.
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Cached response for `key` (fresh or stale), or None on a miss"""
+        row = self.conn.execute(
+            "SELECT body, charset, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.counts["misses"] += 1
+            return None
+        body, charset, etag, last_modified, stored_at = row
+        now = time.time()
+        fresh = stored_at + self.ttl > now
+        if fresh or self.replay:
+            self.counts["hits"] += 1
+        self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return CachedResponse(zlib.decompress(body), charset, etag, last_modified, fresh)
+
+    def put(self, key, url, body, charset=None, etag=None, last_modified=None):
+        """Store a response body, evicting least recently used entries past max_bytes"""
+        if isinstance(body, str):
+            body, charset = body.encode("utf-8"), "utf-8"
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, url, body, charset, etag, last_modified, size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, compressed, charset, etag, last_modified, len(compressed), now, now),
+        )
+        self.total_bytes += len(compressed) - (previous[0] if previous else 0)
+        self.counts["stored"] += 1
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def revalidated(self, key):
+        """A 304 confirmed the cached body: it is fresh for another ttl"""
+        now = time.time()
+        self.conn.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+        self.counts["revalidated"] += 1
+
+    def evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        dropped = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            dropped.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", dropped)
+        self.counts["evicted"] += len(dropped)
+
+    def summary(self):
+        c = self.counts
+        return (f"{c['hits']} hits, {c['misses']} misses, {c['revalidated']} revalidated, {c['stored']} stored, "
+                f"{c['evicted']} evicted, {self.total_bytes / 1e6:.1f} MB on disk ({self.mode} mode)")
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.conn.close()
+        self.conn = None
@@ -0,0 +1,179 @@
+# Persistent seen-listing index for delta (incremental) scraping
+import hashlib
+import json
+import sqlite3
+import time
+
+from common.id_set import IdSet
+from common.product import Product, as_dict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    source TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    content_hash TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_checked REAL,
+    removed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, scope, key)
+);
+"""
+
+
+def record_key(product):
+    """MobileMasr products are keyed by SKU, Dubizzle ads by their listing URL"""
+    if isinstance(product, Product):
+        return product.key
+    details = product.get("details") or {}
+    return details.get("SKU") or product.get("listing_url")
+
+
+def content_hash(product):
+    """Stable hash of everything we scraped for a listing (delta markers and query tags excluded)"""
+    payload = {k: v for k, v in as_dict(product).items() if k not in ("change", "queries")}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _scoped(source, scope, key):
+    return f"{source}\0{scope}\0{key}"
+
+
+class SeenIndex:
+    """Remembers every listing seen per source/scope with a content hash and timestamps"""
+
+    def __init__(self, path, source, scope="all", commit_every=500):
+        self.path = path
+        self.source = source
+        self.scope = scope
+        self.commit_every = commit_every
+        self.run_started = time.time()
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "skipped": 0, "removed": 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._uncommitted = 0
+        # 8-byte ids of every key in the index, so is_known() is answered without a query
+        self.keys_path = path + ".ids"
+        self.keys = self._load_keys()
+        self._keys_added = False
+
+    def _changed(self, count=1):
+        self._uncommitted += count
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def _load_keys(self):
+        """Map the saved key ids if they match the index, otherwise rebuild them from SQLite once"""
+        rows = self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+        try:
+            keys = IdSet.load(self.keys_path)
+            if keys.tag == len(keys) == rows:
+                return keys
+            keys.close()
+        except (OSError, ValueError):
+            pass
+        keys = IdSet(_scoped(source, scope, key) for source, scope, key in self.conn.execute("SELECT source, scope, key FROM seen"))
+        self._save_keys(keys)
+        return keys
+
+    def _save_keys(self, keys):
+        # Skipped when another process added listings meanwhile; the next open rebuilds instead
+        rows = self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+        if len(keys) == rows:
+            try:
+                keys.save(self.keys_path, tag=rows)
+            except PermissionError:
+                pass  # Another process still maps the file (Windows); the next open rebuilds it
+
+    def _row(self, key):
+        return self.conn.execute(
+            "SELECT content_hash, last_checked, removed FROM seen WHERE source = ? AND scope = ? AND key = ?",
+            (self.source, self.scope, key),
+        ).fetchone()
+
+    def is_known(self, key):
+        return _scoped(self.source, self.scope, key) in self.keys
+
+    def checked_within(self, key, seconds):
+        """True if the listing's content was fetched less than `seconds` ago"""
+        row = self._row(key)
+        return bool(row and row[1] and not row[2] and row[1] >= time.time() - seconds)
+
+    def observe(self, product, digest=None):
+        """Record a freshly scraped listing and classify it as new, changed or unchanged
+
+        `digest` is the content_hash() of the record as scraped, if it was taken
+        before validation normalized the product.
+        """
+        key = record_key(product)
+        digest = digest or content_hash(product)
+        now = time.time()
+        row = self._row(key)
+        if row is None:
+            self.keys.add(_scoped(self.source, self.scope, key))
+            self._keys_added = True
+        if row is None or row[2]:
+            change = "new"
+        elif row[0] != digest:
+            change = "changed"
+        else:
+            change = "unchanged"
+        self.conn.execute(
+            "INSERT INTO seen (source, scope, key, content_hash, first_seen, last_seen, last_checked) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(source, scope, key) DO UPDATE SET content_hash = excluded.content_hash, "
+            "last_seen = excluded.last_seen, last_checked = excluded.last_checked, removed = 0",
+            (self.source, self.scope, key, digest, now, now, now),
+        )
+        self.counts[change] += 1
+        self._changed()
+        return change
+
+    def touch(self, keys):
+        """Mark listings as still present without re-fetching them"""
+        keys = list(keys)
+        self.conn.executemany(
+            "UPDATE seen SET last_seen = ? WHERE source = ? AND scope = ? AND key = ?",
+            [(time.time(), self.source, self.scope, key) for key in keys],
+        )
+        self.counts["skipped"] += len(keys)
+        self._changed(len(keys))
+
+    def mark_disappeared(self):
+        """Listings not seen since this run started; only meaningful after a complete crawl"""
+        rows = self.conn.execute(
+            "SELECT key FROM seen WHERE source = ? AND scope = ? AND removed = 0 AND last_seen < ?",
+            (self.source, self.scope, self.run_started),
+        ).fetchall()
+        keys = [key for (key,) in rows]
+        self.conn.executemany(
+            "UPDATE seen SET removed = 1 WHERE source = ? AND scope = ? AND key = ?",
+            [(self.source, self.scope, key) for key in keys],
+        )
+        self.counts["removed"] += len(keys)
+        self.commit()
+        return keys
+
+    def summary(self):
+        c = self.counts
+        return (f"{c['new']} new, {c['changed']} changed, {c['unchanged']} unchanged, "
+                f"{c['skipped']} skipped, {c['removed']} removed")
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.commit()
+        if self._keys_added:
+            self._save_keys(self.keys)
+        self.keys.close()
+        self.conn.close()
+        self.conn = None
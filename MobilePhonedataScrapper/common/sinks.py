@@ -0,0 +1,129 @@
+# Product output shared by the scrapers: validation, delta filtering, sinks and the saved JSON file
+import asyncio
+import json
+from datetime import datetime
+
+import aiofiles
+
+from common.listing_store import ListingStore
+from common.ndjson_writer import NDJSONWriter, export_wrapped_json
+from common.parquet_export import ParquetWriter
+from common.product import json_default
+from common.seen_index import content_hash
+
+
+class SinkMixin:
+    """Emit products to the in-memory list and every registered sink
+
+    A scraper using it sets `source`, `products`, `metrics`, `validator` and
+    `seen_index` (None outside delta runs), calls _init_sinks() in __init__ and
+    hands every parsed product to _emit(). summary_lines() adds the scraper's own
+    lines to the end-of-run summary.
+    """
+
+    def _init_sinks(self):
+        # Each product is handed to these sinks (objects with write(product)/close()) as it is parsed
+        self.sinks = []
+        self.keep_products = True
+        self.stream_writer = None
+        # Valid products emitted over the scraper's life, unchanged ones included
+        self.product_count = 0
+
+    def _emit(self, product):
+        """Pass a valid product on, dropping unchanged listings in delta mode; returns False for rejects"""
+        # Hashed as scraped: a new or changed normalizer must not make every known listing look changed
+        digest = content_hash(product) if self.seen_index else None
+        if self.validator.validate(product) is None:
+            return False
+        self.product_count += 1
+        if self.seen_index:
+            change = self.seen_index.observe(product, digest)
+            if change == "unchanged":
+                self._observe_unchanged(product)
+                return True
+            product.change = change
+        self._write(product)
+        return True
+
+    def _observe_unchanged(self, product):
+        """Unchanged products stay out of the output, but history sinks (the listing store) still record them"""
+        for sink in self.sinks:
+            if getattr(sink, "observes_unchanged", False):
+                sink.write(product)
+
+    def _write(self, product):
+        """Hand a record to the in-memory list and every registered sink"""
+        if self.keep_products:
+            self.products.append(product)
+        with self.metrics.stage("save"):
+            for sink in self.sinks:
+                sink.write(product)
+        self.metrics.inc("products_total")
+
+    def summary_lines(self):
+        """Scraper-specific lines (concurrency, caches, traffic) for the end-of-run summary"""
+        return []
+
+    def _print_summary(self, done, elapsed, count, notes=()):
+        """End-of-run summary: `done` (what was scraped), warnings in `notes`, then stats and speed"""
+        print(f"\n[Done] {done} in {elapsed:.1f} seconds")
+        for line in [*notes, *self.summary_lines()]:
+            print(line)
+        print(f"[Metrics] {self.metrics.summary()}")
+        if elapsed > 0:
+            print(f"[Speed] {count/elapsed:.1f} products/second")
+
+    def stream_to(self, filename, compression=None, batch_size=100):
+        """Append products to an NDJSON file as they are parsed instead of keeping them in memory"""
+        self.stream_writer = NDJSONWriter(filename, compression=compression, batch_size=batch_size)
+        self.sinks.append(self.stream_writer)
+        self.keep_products = False
+        return self.stream_writer
+
+    def export_parquet(self, filename, row_group_size=5000):
+        """Also write products to a typed Parquet file, one row group per row_group_size products"""
+        writer = ParquetWriter(filename, self.source, row_group_size=row_group_size)
+        self.sinks.append(writer)
+        return writer
+
+    def store_to(self, path, batch_size=500):
+        """Also upsert products into a SQLite listing store with daily price history"""
+        store = ListingStore(path, self.source, batch_size=batch_size)
+        self.sinks.append(store)
+        return store
+
+    def close_sinks(self):
+        """Flush and close every sink and the quarantine file"""
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+        self.validator.close()
+
+    async def save_data(self, filename=None, wrap_stream=False):
+        """Save products to `filename` (default <source>_products.json) as JSON
+
+        Streamed runs finalize their NDJSON output instead, and with wrap_stream
+        also write it to `filename` as JSON.
+        """
+        filename = filename or f"{self.source}_products.json"
+        self.close_sinks()
+        print(f"[Validation] {self.validator.summary()}")
+        if self.stream_writer:
+            print(f"\n[Saved] {self.stream_writer.total_products} products to {self.stream_writer.path}")
+            if wrap_stream:
+                with self.metrics.stage("save_file"):
+                    total = await asyncio.to_thread(export_wrapped_json, self.stream_writer.path, filename)
+                print(f"[Saved] {total} products to {filename}")
+            return
+
+        output = {
+            "scraped_at": datetime.now().isoformat(),
+            "total_products": len(self.products),
+            "products": self.products
+        }
+
+        with self.metrics.stage("save_file"):
+            async with aiofiles.open(filename, "w", encoding="utf-8") as f:
+                await f.write(json.dumps(output, indent=2, ensure_ascii=False, default=json_default))
+
+        print(f"\n[Saved] {len(self.products)} products to {filename}")
@@ -0,0 +1,233 @@
+# Scrape-time validation and normalization of Product records; rejects go to a quarantine NDJSON file
+import re
+from collections import Counter
+from datetime import datetime
+
+from common.ndjson_writer import NDJSONWriter
+from common.normalize import is_missing
+
+WHITESPACE_RE = re.compile(r"\s+")
+PERCENT_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*%?\s*$")
+
+
+class Field:
+    """Rule for one Product attribute
+
+    kind/minimum/maximum/pattern/test are checked after `normalize(value, product)`
+    runs; a failing value rejects the record, or with on_invalid="drop" is set to None.
+    """
+
+    def __init__(self, name, kind=str, required=False, minimum=None, maximum=None, pattern=None, test=None,
+                 normalize=None, on_invalid="reject"):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.minimum = minimum
+        self.maximum = maximum
+        self.pattern = re.compile(pattern) if pattern else None
+        self.test = test
+        self.normalize = normalize
+        self.on_invalid = on_invalid
+
+
+class DetailField(Field):
+    """Rule for one key of Product.details (dropping removes the key)"""
+
+
+class Schema:
+    """A source's fields, compiled once into a flat list of per-field checks
+
+    Like msgspec's compiled decoders, every option is resolved at compile time: a
+    field only pays for the checks it declares, so validating a record is a few
+    attribute reads and comparisons per field.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+
+    def compile(self):
+        return [_compile(field) for field in self.fields]
+
+
+def _compile(field):
+    name = field.name
+    tests = []
+    if field.pattern is not None:
+        tests.append((field.pattern.search, f"{name}_malformed"))
+    if field.minimum is not None:
+        tests.append((lambda value, low=field.minimum: value >= low, f"{name}_out_of_range"))
+    if field.maximum is not None:
+        tests.append((lambda value, high=field.maximum: value <= high, f"{name}_out_of_range"))
+    if field.test is not None:
+        tests.append((field.test, f"{name}_invalid"))
+    kind = field.kind
+    normalize = field.normalize
+    missing_reason = f"missing_{name}" if field.required else None
+    type_reason = f"{name}_type"
+    drop = field.on_invalid == "drop"
+    in_details = isinstance(field, DetailField)
+
+    def check(product, fixes):
+        """Normalize the field in place; returns a reject reason or None"""
+        if in_details:
+            value = product.details.get(name)
+        else:
+            value = getattr(product, name)
+        if normalize is not None:
+            normalized = normalize(value, product)
+            if normalized != value:
+                value = normalized
+                _store(product, name, value, in_details)
+                fixes[name] += 1
+        if value is None:
+            return missing_reason
+        if not isinstance(value, kind):
+            reason = type_reason
+        else:
+            for test, reason in tests:
+                if not test(value):
+                    break
+            else:
+                return None
+        if drop:
+            _store(product, name, None, in_details)
+            fixes[name] += 1
+            return None
+        return reason
+
+    return check
+
+
+def _store(product, name, value, in_details):
+    if not in_details:
+        setattr(product, name, value)
+    elif value is None:
+        product.details.pop(name, None)
+    else:
+        product.details[name] = value
+
+
+def clean_text(value, product=None):
+    """Collapse runs of whitespace; blank and "N/A"-style values become None"""
+    if not isinstance(value, str):
+        return value
+    if is_missing(value):
+        return None
+    return WHITESPACE_RE.sub(" ", value).strip()
+
+
+def dedupe_brand_prefix(value, product):
+    """'Apple Apple Iphone 13' -> 'Apple Iphone 13' (MobileMasr models already start with the brand)"""
+    value = clean_text(value)
+    brand = product.brand
+    if not value or not brand:
+        return value
+    doubled = f"{brand} {brand} "
+    if value[:len(doubled)].lower() == doubled.lower():
+        return value[len(brand) + 1:]
+    return value
+
+
+def drop_missing_details(details, product=None):
+    """Remove null, blank and "N/A" details (e.g. "Battery Health": null) instead of storing the sentinel"""
+    if any(is_missing(value) for value in details.values()):
+        return {key: value for key, value in details.items() if not is_missing(value)}
+    return details
+
+
+def _percent(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = PERCENT_RE.match(value) if isinstance(value, str) else None
+    return float(match.group(1)) if match else None
+
+
+def battery_percent(value, product=None):
+    """95 / '95 %' -> '95%'; descriptive grades ("very good") are kept as scraped"""
+    number = _percent(value)
+    return value if number is None else f"{number:g}%"
+
+
+def battery_in_range(value):
+    number = _percent(value)
+    return number is None or 0 < number <= 100
+
+
+COMMON_FIELDS = (
+    Field("listing_url", required=True, pattern=r"^https?://\S+$"),
+    Field("details", kind=dict, required=True, normalize=drop_missing_details),
+    Field("product_name", required=True, normalize=dedupe_brand_prefix),
+    # Whole-EGP listings: 1 EGP placeholders and typo'd extra digits are rejected rather than loaded
+    Field("price", kind=float, minimum=10, maximum=5_000_000),
+    Field("currency", pattern=r"^[A-Z]{3}$", on_invalid="drop"),
+    Field("seller_name", normalize=clean_text),
+    Field("location", normalize=clean_text),
+    # Capacities parsed from free text; implausible values are parse noise, not a reason to lose the listing
+    Field("ram_gb", kind=float, minimum=0.25, maximum=64, on_invalid="drop"),
+    Field("storage_gb", kind=float, minimum=1, maximum=4096, on_invalid="drop"),
+)
+
+SCHEMAS = {
+    "dubizzle": Schema(*COMMON_FIELDS),
+    "mobilemasr": Schema(
+        *COMMON_FIELDS,
+        DetailField("SKU", required=True),
+        DetailField("Battery Health", normalize=battery_percent, test=battery_in_range,
+                    on_invalid="drop"),
+    ),
+}
+
+
+class Validator:
+    """Validate and normalize every record a scraper emits
+
+    validate() fixes what it can in place (blank details, doubled brand prefixes,
+    whitespace, percent strings) and returns the product, or returns None and
+    writes the record with its reasons to the quarantine file (opened on the
+    first reject, so clean runs leave no file behind).
+    """
+
+    def __init__(self, source, quarantine_path=None, metrics=None):
+        self.source = source
+        self.checks = SCHEMAS[source].compile()
+        self.quarantine_path = quarantine_path
+        self.quarantine = None
+        self.metrics = metrics
+        self.counts = {"valid": 0, "rejected": 0}
+        self.reasons = Counter()
+        self.fixes = Counter()
+        self._opened = False
+
+    def validate(self, product):
+        reasons = [reason for reason in (check(product, self.fixes) for check in self.checks) if reason]
+        if not reasons:
+            self.counts["valid"] += 1
+            return product
+        self.counts["rejected"] += 1
+        self.reasons.update(reasons)
+        if self.metrics:
+            for reason in reasons:
+                self.metrics.failure("validate", reason)
+        if self.quarantine_path:
+            if self.quarantine is None:
+                # Later opens (after close_sinks) append to the file this run started
+                self.quarantine = NDJSONWriter(self.quarantine_path, append=self._opened)
+                self._opened = True
+            self.quarantine.write({"source": self.source, "reasons": reasons,
+                                   "quarantined_at": datetime.now().isoformat(timespec="seconds"), "record": product})
+        return None
+
+    def summary(self):
+        text = f"{self.counts['valid']} valid, {self.counts['rejected']} rejected"
+        if self.reasons:
+            text += " (" + ", ".join(f"{reason} {count}" for reason, count in self.reasons.most_common()) + ")"
+        if self.fixes:
+            text += "; normalized " + ", ".join(f"{name} {count}" for name, count in self.fixes.most_common())
+        if self.quarantine_path and self.counts["rejected"]:
+            text += f"; rejects in {self.quarantine_path}"
+        return text
+
+    def close(self):
+        if self.quarantine is not None:
+            self.quarantine.close()
+            self.quarantine = None
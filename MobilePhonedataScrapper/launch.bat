@@ -98,8 +98,8 @@ echo.
 echo Starting the unified scraper interface...
 echo.
 
-REM Run the unified main scraper
-python main.py
+REM Run the unified main scraper (any arguments, e.g. --spec jobs.json, are passed through)
+python main.py %*
 
 REM Deactivate virtual environment
 call deactivate 2>nul
@@ -83,8 +83,8 @@ echo ""
 echo "Starting the unified scraper interface..."
 echo ""
 
-# Run the unified main scraper
-python main.py
+# Run the unified main scraper (any arguments, e.g. --spec jobs.json, are passed through)
+python main.py "$@"
 
 # Deactivate virtual environment on exit
 deactivate 2>/dev/null || true
@@ -2,11 +2,17 @@
 """
 Mobile Phone Data Scraper - Unified Interactive CLI
 Runs both Dubizzle and MobileMasr scrapers
+
+Without arguments this starts the interactive menu. With --spec or --source it
+runs headless: every job is read from a JSON/YAML spec or from the flags, Dubizzle
+and MobileMasr jobs run concurrently, and the exit status reports the outcome.
 """
 
+import argparse
 import asyncio
 import sys
 import os
+import time
 
 # Add subdirectories to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'DubbizleSrapper'))
@@ -15,6 +21,21 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'MobileMasrScrapper')
 # Import scrapers
 from DubbizleSrapper.main import DubizzleScraper
 from MobileMasrScrapper.main import MobileMasrAlgoliaScraper
+from common.job_spec import PATH_KEYS, frontier_location, jobs_from_args, load_spec, ndjson_compression
+from common.metrics import Metrics, serve_metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DUBIZZLE_DIR = os.path.join(SCRIPT_DIR, 'DubbizleSrapper')
+MOBILEMASR_DIR = os.path.join(SCRIPT_DIR, 'MobileMasrScrapper')
+
+# Headless exit statuses
+EXIT_OK = 0          # Every job succeeded
+EXIT_FAILED = 1      # Every job failed
+EXIT_USAGE = 2       # Bad arguments or job spec (argparse uses 2 as well)
+EXIT_PARTIAL = 3     # Some jobs failed
+EXIT_INTERRUPTED = 130
+
+METRICS_FILE_INTERVAL = 15  # Seconds between rewrites of --metrics-file during a batch
 
 
 def print_header():
@@ -62,28 +83,16 @@ async def run_dubizzle():
             pages = input("Max pages (default 10): ").strip()
             pages = int(pages) if pages.isdigit() else 10
             
-            # Change to DubbizleSrapper directory for output
-            original_dir = os.getcwd()
-            os.chdir(os.path.join(os.path.dirname(__file__), 'DubbizleSrapper'))
-            
             await scraper.scrape_search(query, max_pages=pages)
             filename = f"{query.lower().replace(' ', '_')}_results.json"
-            await scraper.save_data(filename)
-            
-            os.chdir(original_dir)
+            await scraper.save_data(os.path.join(DUBIZZLE_DIR, filename))
             
         elif choice == "2":
             pages = input("Max pages (default 10): ").strip()
             pages = int(pages) if pages.isdigit() else 10
             
-            # Change to DubbizleSrapper directory for output
-            original_dir = os.getcwd()
-            os.chdir(os.path.join(os.path.dirname(__file__), 'DubbizleSrapper'))
-            
             await scraper.scrape_all_pages(max_pages=pages)
-            await scraper.save_data()
-            
-            os.chdir(original_dir)
+            await scraper.save_data(os.path.join(DUBIZZLE_DIR, "dubizzle_products.json"))
             
         else:
             print("[Error] Invalid choice")
@@ -100,9 +109,10 @@ async def run_mobilemasr():
     print("Options:")
     print("  1. Search for specific product")
     print("  2. Scrape all mobile phones")
+    print("  3. Export the full catalog (past Algolia's 1,000-hit cap)")
     print()
     
-    choice = input("Choice (1 or 2): ").strip()
+    choice = input("Choice (1-3): ").strip()
     
     scraper = MobileMasrAlgoliaScraper(max_concurrent=20)
     
@@ -111,28 +121,20 @@ async def run_mobilemasr():
         pages = input("Max pages (default 10): ").strip()
         pages = int(pages) if pages.isdigit() else 10
         
-        # Change to MobileMasrScrapper directory for output
-        original_dir = os.getcwd()
-        os.chdir(os.path.join(os.path.dirname(__file__), 'MobileMasrScrapper'))
-        
         await scraper.scrape_all_products(max_pages=pages, search_query=query)
         filename = f"mobilemasr_{query.lower().replace(' ', '_')}_results.json"
-        await scraper.save_data(filename)
-        
-        os.chdir(original_dir)
+        await scraper.save_data(os.path.join(MOBILEMASR_DIR, filename))
         
     elif choice == "2":
         pages = input("Max pages (default 10): ").strip()
         pages = int(pages) if pages.isdigit() else 10
         
-        # Change to MobileMasrScrapper directory for output
-        original_dir = os.getcwd()
-        os.chdir(os.path.join(os.path.dirname(__file__), 'MobileMasrScrapper'))
-        
         await scraper.scrape_all_products(max_pages=pages)
-        await scraper.save_data()
+        await scraper.save_data(os.path.join(MOBILEMASR_DIR, "mobilemasr_products.json"))
         
-        os.chdir(original_dir)
+    elif choice == "3":
+        await scraper.scrape_full_catalog()
+        await scraper.save_data(os.path.join(MOBILEMASR_DIR, "mobilemasr_products.json"))
         
     else:
         print("[Error] Invalid choice")
@@ -166,18 +168,13 @@ async def run_both():
     dubizzle_scraper = DubizzleScraper(max_workers=10)
     
     try:
-        original_dir = os.getcwd()
-        os.chdir(os.path.join(os.path.dirname(__file__), 'DubbizleSrapper'))
-        
         if search_mode:
             await dubizzle_scraper.scrape_search(query, max_pages=pages)
             filename = f"{query.lower().replace(' ', '_')}_results.json"
-            await dubizzle_scraper.save_data(filename)
+            await dubizzle_scraper.save_data(os.path.join(DUBIZZLE_DIR, filename))
         else:
             await dubizzle_scraper.scrape_all_pages(max_pages=pages)
-            await dubizzle_scraper.save_data()
-        
-        os.chdir(original_dir)
+            await dubizzle_scraper.save_data(os.path.join(DUBIZZLE_DIR, "dubizzle_products.json"))
     finally:
         dubizzle_scraper.cleanup()
     
@@ -187,24 +184,267 @@ async def run_both():
     print("-" * 70)
     mobilemasr_scraper = MobileMasrAlgoliaScraper(max_concurrent=20)
     
-    original_dir = os.getcwd()
-    os.chdir(os.path.join(os.path.dirname(__file__), 'MobileMasrScrapper'))
-    
     if search_mode:
         await mobilemasr_scraper.scrape_all_products(max_pages=pages, search_query=query)
         filename = f"mobilemasr_{query.lower().replace(' ', '_')}_results.json"
-        await mobilemasr_scraper.save_data(filename)
+        await mobilemasr_scraper.save_data(os.path.join(MOBILEMASR_DIR, filename))
     else:
         await mobilemasr_scraper.scrape_all_products(max_pages=pages)
-        await mobilemasr_scraper.save_data()
-    
-    os.chdir(original_dir)
+        await mobilemasr_scraper.save_data(os.path.join(MOBILEMASR_DIR, "mobilemasr_products.json"))
     
     print("\n" + "=" * 70)
     print("BOTH SCRAPERS COMPLETED".center(70))
     print("=" * 70)
 
 
+def job_label(job):
+    if job.get("queries"):
+        return f"{job['source']}:{'+'.join(job['queries'])}"
+    return f"{job['source']}:{job['query'] or 'all'}"
+
+
+def ensure_parent_dirs(job):
+    for key in PATH_KEYS:
+        if job.get(key):
+            os.makedirs(os.path.dirname(os.path.abspath(job[key])), exist_ok=True)
+
+
+def attach_sinks(scraper, job):
+    """Stream to NDJSON / Parquet / the listing store when the job asks for it"""
+    if job.get("ndjson"):
+        scraper.stream_to(job["ndjson"], compression=ndjson_compression(job["ndjson"]))
+    if job.get("parquet"):
+        scraper.export_parquet(job["parquet"])
+    if job.get("store"):
+        scraper.store_to(job["store"])
+
+
+def cache_options(job):
+    """Scraper keyword arguments for the job's response cache, if it has one"""
+    if not job.get("cache"):
+        return {}
+    return {"cache_path": job["cache"], "cache_ttl": job.get("cache_ttl", 86400),
+            "cache_mode": "replay" if job.get("replay") else "cache"}
+
+
+def saved_count(scraper):
+    """Products written by a finished (saved) scraper"""
+    if scraper.stream_writer:
+        return scraper.stream_writer.total_products
+    return len(scraper.products)
+
+
+async def run_dubizzle_job(job, metrics=None):
+    scraper = DubizzleScraper(
+        max_workers=job["concurrency"],
+        detail_backend=job.get("detail_backend", "http"),
+        journal_path=job.get("journal"),
+        seen_index_path=job.get("seen_index"),
+        parse_workers=job.get("parse_workers"),
+        metrics=metrics,
+        frontier=job.get("frontier"),
+        worker_id=job.get("worker_id"),
+        crawl_id=job.get("crawl_id"),
+        quarantine_path=job.get("quarantine"),
+        **cache_options(job),
+    )
+    try:
+        attach_sinks(scraper, job)
+        pipeline = job.get("pipeline", False)
+        if job.get("queries"):
+            await scraper.scrape_searches(job["queries"], max_pages=job["max_pages"])
+        elif job["query"]:
+            await scraper.scrape_search(job["query"], max_pages=job["max_pages"], pipeline=pipeline)
+        else:
+            await scraper.scrape_all_pages(max_pages=job["max_pages"], pipeline=pipeline)
+        await scraper.save_data(job["output"], wrap_stream=job.get("wrapped_json", False))
+        return saved_count(scraper), scraper.fetch_counts
+    finally:
+        # Shutting down browsers and parse workers blocks, so keep it off the shared event loop
+        await asyncio.to_thread(scraper.cleanup)
+
+
+async def run_mobilemasr_job(job, metrics=None):
+    scraper = MobileMasrAlgoliaScraper(max_concurrent=job["concurrency"], seen_index_path=job.get("seen_index"),
+                                       metrics=metrics, quarantine_path=job.get("quarantine"), **cache_options(job))
+    try:
+        attach_sinks(scraper, job)
+        if job.get("full_catalog"):
+            await scraper.scrape_full_catalog()
+        elif job.get("queries"):
+            await scraper.scrape_searches(job["queries"], max_pages=job["max_pages"])
+        else:
+            await scraper.scrape_all_products(max_pages=job["max_pages"], search_query=job["query"])
+        await scraper.save_data(job["output"], wrap_stream=job.get("wrapped_json", False))
+        return saved_count(scraper), scraper.fetch_counts
+    finally:
+        scraper.close_sinks()
+        scraper.close_cache()
+
+
+JOB_RUNNERS = {"dubizzle": run_dubizzle_job, "mobilemasr": run_mobilemasr_job}
+
+
+async def run_job(job, metrics=None):
+    """Run one job; returns (succeeded, products, seconds) and never raises"""
+    started = time.time()
+    try:
+        ensure_parent_dirs(job)
+        products, fetches = await JOB_RUNNERS[job["source"]](job, metrics)
+    except Exception as e:
+        print(f"[Job {job_label(job)}] Failed: {e}")
+        return False, 0, time.time() - started
+    # A delta run legitimately emits nothing when no listing changed, but only if the site actually answered
+    succeeded = products > 0 or (fetches["ok"] > 0 and not fetches["failed"])
+    if not succeeded:
+        detail = f" ({fetches['failed']} fetches failed, {fetches['ok']} succeeded)" if fetches["failed"] else ""
+        print(f"[Job {job_label(job)}] No products scraped{detail}")
+    return succeeded, products, time.time() - started
+
+
+async def run_source_jobs(jobs, metrics=None):
+    """Jobs of one source run one after the other so they do not fight over its rate limits"""
+    return [(job, *await run_job(job, metrics)) for job in jobs]
+
+
+async def write_metrics_periodically(metrics, path):
+    """Keep a Prometheus textfile current while the batch runs"""
+    while True:
+        await asyncio.sleep(METRICS_FILE_INTERVAL)
+        await asyncio.to_thread(metrics.write_prometheus, path)
+
+
+async def run_batch(jobs, metrics=None, metrics_file=None, profile_path=None):
+    """Run every job, each source's queue concurrently with the others; returns an exit status
+
+    Every job records into `metrics` (one registry for the whole batch), which is
+    rewritten to `metrics_file` as the batch runs and saved as a JSON run profile
+    to `profile_path` at the end.
+    """
+    by_source = {}
+    for job in jobs:
+        by_source.setdefault(job["source"], []).append(job)
+    print(f"[Batch] {len(jobs)} jobs across {', '.join(by_source)}")
+    
+    metrics = metrics or Metrics()
+    writer = asyncio.create_task(write_metrics_periodically(metrics, metrics_file)) if metrics_file else None
+    try:
+        grouped = await asyncio.gather(*(run_source_jobs(source_jobs, metrics) for source_jobs in by_source.values()))
+    finally:
+        if writer:
+            writer.cancel()
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
+        if profile_path:
+            metrics.write_profile(profile_path)
+    results = [result for group in grouped for result in group]
+    
+    print("\n" + "=" * 70)
+    print("BATCH SUMMARY".center(70))
+    print("=" * 70)
+    for job, succeeded, products, elapsed in results:
+        status = "ok" if succeeded else "FAILED"
+        print(f"  [{status}] {job_label(job)}: {products} products in {elapsed:.1f}s -> {job.get('ndjson') or job['output']}")
+    print(f"[Metrics] {metrics.summary()}")
+    if profile_path:
+        print(f"[Metrics] Run profile saved to {profile_path} (compare runs with: python -m common.metrics old.json new.json)")
+    failed = sum(1 for _, succeeded, _, _ in results if not succeeded)
+    if failed == 0:
+        return EXIT_OK
+    return EXIT_FAILED if failed == len(results) else EXIT_PARTIAL
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scrape Dubizzle and MobileMasr. Without --spec or --source the interactive menu starts.")
+    parser.add_argument("--spec", help="JSON or YAML job spec to run headless")
+    parser.add_argument("--source", action="append", choices=["dubizzle", "mobilemasr"],
+                        help="Run a job for this source (repeatable)")
+    parser.add_argument("--query", action="append",
+                        help="Search query, one job per query and source (repeatable; omit to scrape all listings)")
+    parser.add_argument("--fan-out", action="store_true",
+                        help="Search every --query in one job per source, fetching each shared ad once")
+    parser.add_argument("--max-pages", type=int, help="Listing/result pages per job (default 10)")
+    parser.add_argument("--concurrency", type=int,
+                        help="Starting concurrency: Dubizzle browsers (default 10) or Algolia requests (default 20)")
+    parser.add_argument("--output-dir", help="Directory for outputs and relative spec paths (default: current directory)")
+    parser.add_argument("--cache", help="SQLite response cache shared by every job (relative to --output-dir)")
+    parser.add_argument("--replay", action="store_true", help="Serve every request from --cache, with no network access")
+    parser.add_argument("--store",
+                        help="SQLite listing store every job upserts into, with price history (relative to --output-dir)")
+    parser.add_argument("--ndjson", action="store_true", help="Stream each job to <output>.ndjson instead of JSON")
+    parser.add_argument("--quarantine", action="store_true",
+                        help="Write records that fail validation to <output>.quarantine.ndjson (they are dropped either way)")
+    parser.add_argument("--frontier",
+                        help="Shared Dubizzle crawl frontier: a SQLite file or the http:// URL of a served one")
+    parser.add_argument("--worker-id", help="Name of this worker in the frontier (default: host:pid)")
+    parser.add_argument("--crawl-id",
+                        help="Run label every worker of one frontier crawl shares (default: today's UTC date)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port at /metrics while running")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="Address the metrics endpoint binds to (default: loopback only; 0.0.0.0 for every interface)")
+    parser.add_argument("--metrics-file", help="Keep Prometheus metrics in this file (textfile collector format)")
+    parser.add_argument("--profile", help="Save a JSON run profile (stage timings, failures) to this file")
+    args = parser.parse_args(argv)
+    if args.spec and (args.source or args.query):
+        parser.error("--spec cannot be combined with --source/--query")
+    if args.query and not args.source:
+        parser.error("--query needs at least one --source")
+    if args.replay and not args.cache and not args.spec:
+        parser.error("--replay needs --cache")
+    if args.frontier and (args.spec or args.fan_out):
+        parser.error("--frontier cannot be combined with --spec (set frontier per job) or --fan-out")
+    return args
+
+
+def build_jobs(args):
+    if args.spec:
+        return load_spec(args.spec, output_dir=args.output_dir)
+    jobs = jobs_from_args(args.source, args.query, args.output_dir or ".", fan_out=args.fan_out,
+                          max_pages=args.max_pages, concurrency=args.concurrency,
+                          cache=args.cache, replay=args.replay or None, store=args.store)
+    if args.frontier:
+        # Frontier jobs only exist for Dubizzle; MobileMasr is a handful of API calls
+        for job in jobs:
+            if job["source"] == "dubizzle":
+                job["frontier"] = frontier_location(args.frontier, args.output_dir or ".")
+                job["worker_id"] = args.worker_id
+                job["crawl_id"] = args.crawl_id
+    if args.ndjson:
+        for job in jobs:
+            job["ndjson"] = os.path.splitext(job["output"])[0] + ".ndjson"
+    if args.quarantine:
+        for job in jobs:
+            job["quarantine"] = os.path.splitext(job["output"])[0] + ".quarantine.ndjson"
+    return jobs
+
+
+def run_headless(args):
+    """Non-interactive entry point; returns the process exit status"""
+    try:
+        jobs = build_jobs(args)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"[Error] {e}", file=sys.stderr)
+        return EXIT_USAGE
+    metrics = Metrics()
+    server = None
+    if args.metrics_port:
+        try:
+            server = serve_metrics(metrics, args.metrics_port, args.metrics_host)
+        except OSError as e:
+            print(f"[Error] Cannot serve metrics on {args.metrics_host}:{args.metrics_port}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+        print(f"[Metrics] Serving http://{args.metrics_host}:{args.metrics_port}/metrics")
+    try:
+        return asyncio.run(run_batch(jobs, metrics, args.metrics_file, args.profile))
+    except KeyboardInterrupt:
+        print("\n[Batch] Interrupted", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    finally:
+        if server:
+            server.shutdown()
+
+
 async def main():
     """Main application loop"""
     while True:
@@ -235,6 +475,9 @@ async def main():
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.spec or args.source:
+        sys.exit(run_headless(args))
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
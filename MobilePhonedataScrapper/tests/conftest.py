@@ -0,0 +1,8 @@
+# Run from MobilePhonedataScrapper with: python -m pytest -q
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+# The scrapers import common.* from the project root and their own modules (crawl_frontier, ...) directly
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'DubbizleSrapper'))
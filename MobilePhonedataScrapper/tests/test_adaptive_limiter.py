@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from common.adaptive_limiter import AdaptiveLimiter, parse_retry_after
+
+
+def healthy(limiter, count):
+    for _ in range(count):
+        limiter.release(time.monotonic())
+
+
+def test_error_halves_the_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial=16, cooldown=60)
+    limiter.release(time.monotonic(), ok=False)
+    assert limiter.limit == 8
+    # The rest of a burst of failures lands inside the cooldown
+    limiter.release(time.monotonic(), throttled=True)
+    assert limiter.limit == 8
+    assert limiter.stats["errors"] == 1 and limiter.stats["throttled"] == 1
+
+
+def test_limit_never_drops_below_min_limit():
+    limiter = AdaptiveLimiter(initial=2, min_limit=2, cooldown=0)
+    for _ in range(5):
+        limiter.release(time.monotonic(), ok=False)
+    assert limiter.limit == 2
+
+
+def test_limit_recovers_by_one_per_window_of_healthy_responses():
+    limiter = AdaptiveLimiter(initial=16, max_limit=20, cooldown=0)
+    limiter.release(time.monotonic(), ok=False)
+    assert limiter.limit == 8
+    healthy(limiter, 7)
+    assert limiter.limit == 8
+    healthy(limiter, 1)
+    assert limiter.limit == 9
+    healthy(limiter, 9 + 10 + 11 + 12 + 13)
+    assert limiter.limit == 14
+
+
+def test_limit_stops_at_max_limit():
+    limiter = AdaptiveLimiter(initial=3, max_limit=4)
+    healthy(limiter, 100)
+    assert limiter.limit == 4
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AdaptiveLimiter(initial=4, cooldown=0)
+    limiter.release(time.monotonic(), throttled=True, retry_after=30)
+    assert limiter.paused_until > time.monotonic() + 29
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("soon") is None
+
+
+def test_acquire_cancelled_waiting_for_a_host_token_gives_its_slot_back():
+    async def run():
+        limiter = AdaptiveLimiter(initial=4, rate_per_host=0.5, burst_per_host=1)
+        started = await limiter.acquire("example.com")  # Spends the only token
+        waiting = asyncio.create_task(limiter.acquire("example.com"))
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight == 2
+        waiting.cancel()
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            pass
+        assert limiter.in_flight == 1
+        limiter.release(started)
+        await asyncio.sleep(0)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert not limiter._notifiers
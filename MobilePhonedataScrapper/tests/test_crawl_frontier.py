@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from crawl_frontier import Frontier, SQLiteFrontier
+
+CRAWL = "https://www.dubizzle.com.eg/en/mobile-phones/@2026-01-01"
+URLS = [f"https://www.dubizzle.com.eg/en/ad/phone-{i}" for i in range(300)]
+
+
+def test_concurrent_workers_never_lease_the_same_url(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    SQLiteFrontier(path).seed_sync(CRAWL, "ad", URLS)
+    leased = {}
+    errors = []
+
+    def worker(name):
+        # A connection per worker, like separate processes sharing the file
+        frontier = SQLiteFrontier(path)
+        try:
+            while True:
+                urls = frontier.lease_sync(CRAWL, "ad", name, 7)
+                if not urls:
+                    return
+                leased[name] = leased.get(name, []) + urls
+                for url in urls:
+                    assert frontier.complete_sync(CRAWL, "ad", url, name, {"listing_url": url})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            frontier.close_sync()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    claimed = [url for urls in leased.values() for url in urls]
+    assert sorted(claimed) == sorted(URLS)
+    frontier = SQLiteFrontier(path)
+    assert frontier.counts_sync(CRAWL)["ad"] == {"done": len(URLS)}
+    assert len(list(frontier.iter_products(CRAWL))) == len(URLS)
+
+
+def test_concurrent_leases_on_one_frontier_from_the_event_loop(tmp_path):
+    async def run():
+        frontier = SQLiteFrontier(str(tmp_path / "frontier.db"))
+        frontier.start(CRAWL)
+        assert await frontier.seed("ad", URLS) == len(URLS)
+        assert await frontier.seed("ad", URLS[:10]) == 0
+        batches = await asyncio.gather(*(frontier.lease("ad", f"w{i}", 20) for i in range(20)))
+        counts = await frontier.counts()
+        await frontier.close()
+        return [url for batch in batches for url in batch], counts
+
+    claimed, counts = asyncio.run(run())
+    assert len(claimed) == len(set(claimed)) == len(URLS)
+    assert counts["ad"] == {"leased": len(URLS)}
+
+
+def test_expired_leases_go_back_to_pending_until_out_of_attempts(tmp_path):
+    frontier = SQLiteFrontier(str(tmp_path / "frontier.db"), lease_seconds=0.01, max_attempts=2)
+    frontier.seed_sync(CRAWL, "listing", URLS[:1])
+    assert frontier.lease_sync(CRAWL, "listing", "dead", 5) == URLS[:1]
+    time.sleep(0.02)
+    assert frontier.lease_sync(CRAWL, "listing", "alive", 5) == URLS[:1]
+    assert frontier.fail_sync(CRAWL, "listing", URLS[0], "alive", "fetch failed")
+    assert frontier.lease_sync(CRAWL, "listing", "alive", 5) == []
+    assert frontier.counts_sync(CRAWL)["listing"] == {"failed": 1}
+    frontier.close_sync()
+
+
+def test_reports_from_workers_without_a_live_lease_are_rejected(tmp_path):
+    frontier = SQLiteFrontier(str(tmp_path / "frontier.db"), lease_seconds=0.05)
+    frontier.seed_sync(CRAWL, "ad", URLS[:1])
+    assert frontier.lease_sync(CRAWL, "ad", "slow", 1) == URLS[:1]
+    assert not frontier.complete_sync(CRAWL, "ad", URLS[0], "other", {"listing_url": URLS[0]})
+    time.sleep(0.06)
+    # The lease ran out: the slow worker's late result is dropped and the URL is leased again
+    assert not frontier.complete_sync(CRAWL, "ad", URLS[0], "slow", {"listing_url": URLS[0]})
+    assert not frontier.fail_sync(CRAWL, "ad", URLS[0], "slow", "timeout")
+    assert frontier.lease_sync(CRAWL, "ad", "fast", 1) == URLS[:1]
+    assert frontier.complete_sync(CRAWL, "ad", URLS[0], "fast", {"listing_url": URLS[0]})
+    assert frontier.counts_sync(CRAWL)["ad"] == {"done": 1}
+    frontier.close_sync()
+
+
+def test_crawls_are_scoped_so_a_finished_one_does_not_hide_the_next(tmp_path):
+    frontier = SQLiteFrontier(str(tmp_path / "frontier.db"))
+    tomorrow = CRAWL.replace("01-01", "01-02")
+    frontier.seed_sync(CRAWL, "ad", URLS[:3])
+    for url in frontier.lease_sync(CRAWL, "ad", "w", 3):
+        frontier.complete_sync(CRAWL, "ad", url, "w", {"listing_url": url})
+    assert frontier.seed_sync(tomorrow, "ad", URLS[:3]) == 3
+    assert frontier.counts_sync(tomorrow)["ad"] == {"pending": 3}
+    assert frontier.counts_sync(CRAWL)["ad"] == {"done": 3}
+    assert list(frontier.iter_products(tomorrow)) == []
+    assert frontier.crawls() == [tomorrow, CRAWL]
+    frontier.close_sync()
+
+
+def test_incomplete_backends_fail_when_constructed():
+    class NoCounts(Frontier):
+        async def seed(self, kind, urls):
+            return 0
+
+        async def lease(self, kind, worker, limit):
+            return []
+
+        async def complete(self, kind, url, worker, result=None):
+            return True
+
+        async def fail(self, kind, url, worker, error):
+            return True
+
+    try:
+        NoCounts()
+    except TypeError:
+        return
+    raise AssertionError("a frontier without counts() was constructed")
@@ -0,0 +1,120 @@
+import os
+
+from common.id_set import HEADER, MAGIC, IdSet
+from common.seen_index import SeenIndex
+
+URLS = [f"https://www.dubizzle.com.eg/en/ad/phone-{i}" for i in range(10_000)]
+
+
+def test_membership_across_buffer_and_merged_runs():
+    ids = IdSet(buffer_size=64)
+    assert all(ids.add(url) for url in URLS)
+    assert len(ids) == len(URLS)
+    assert len(ids.runs) < 10
+    assert all(url in ids for url in URLS[::97])
+    assert "https://www.dubizzle.com.eg/en/ad/other" not in ids
+    assert not ids.add(URLS[0])
+    assert len(ids) == len(URLS)
+
+
+def test_saved_set_is_mapped_and_keeps_growing_in_memory(tmp_path):
+    path = str(tmp_path / "urls.ids")
+    IdSet(URLS[:5000]).save(path, tag=5000)
+    ids = IdSet.load(path)
+    try:
+        assert ids.tag == 5000
+        assert len(ids) == 5000
+        assert URLS[4999] in ids and URLS[5000] not in ids
+        assert ids.add(URLS[5000])
+        assert not ids.add(URLS[10])
+        assert URLS[5000] in ids and len(ids) == 5001
+    finally:
+        ids.close()
+
+
+def test_load_rejects_foreign_and_truncated_files(tmp_path):
+    foreign = tmp_path / "foreign.ids"
+    foreign.write_bytes(b"not an id set at all")
+    truncated = tmp_path / "truncated.ids"
+    truncated.write_bytes(HEADER.pack(MAGIC, 100, 0) + b"\0" * 8)
+    for path in (foreign, truncated):
+        try:
+            IdSet.load(str(path))
+        except ValueError:
+            continue
+        raise AssertionError(f"{path.name} loaded")
+
+
+def product(i, price="10,000 EGP"):
+    return {"product_name": f"Phone {i}", "price": price, "listing_url": URLS[i], "details": {}}
+
+
+def test_seen_index_sidecar_matches_the_rows(tmp_path):
+    path = str(tmp_path / "seen.db")
+    index = SeenIndex(path, "dubizzle")
+    assert [index.observe(product(i)) for i in range(3)] == ["new"] * 3
+    assert index.observe(product(0)) == "unchanged"
+    assert index.observe(product(1, price="9,000 EGP")) == "changed"
+    index.close()
+
+    saved = IdSet.load(path + ".ids")
+    assert saved.tag == len(saved) == 3
+    saved.close()
+    index = SeenIndex(path, "dubizzle")
+    assert index.is_known(URLS[2]) and not index.is_known(URLS[3])
+    index.close()
+
+
+def test_seen_index_rebuilds_a_stale_sidecar(tmp_path):
+    path = str(tmp_path / "seen.db")
+    index = SeenIndex(path, "dubizzle")
+    index.observe(product(0))
+    index.close()
+    # Another process added a listing without rewriting the sidecar
+    other = SeenIndex(path, "dubizzle")
+    other.observe(product(1))
+    other.commit()
+    IdSet([f"dubizzle\0all\0{URLS[0]}"]).save(path + ".ids", tag=1)
+
+    index = SeenIndex(path, "dubizzle")
+    assert index.is_known(URLS[1])
+    index.close()
+    other.close()
+    saved = IdSet.load(path + ".ids")
+    assert saved.tag == len(saved) == 2
+    saved.close()
+
+
+def test_closing_a_loaded_index_unmaps_the_sidecar_before_replacing_it(tmp_path, monkeypatch):
+    path = str(tmp_path / "seen.db")
+    index = SeenIndex(path, "dubizzle")
+    index.observe(product(0))
+    index.close()
+
+    index = SeenIndex(path, "dubizzle")
+    assert index.keys.base is not None  # Mapped from the sidecar
+    index.observe(product(1))
+    replace = os.replace
+
+    def windows_replace(src, dst):
+        # Windows raises PermissionError when the target is still mapped
+        if dst == index.keys_path and index.keys._mmap is not None:
+            raise PermissionError(f"{dst} is mapped")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", windows_replace)
+    index.close()
+    saved = IdSet.load(path + ".ids")
+    assert saved.tag == len(saved) == 2
+    assert f"dubizzle\0all\0{URLS[1]}" in saved
+    saved.close()
+
+
+def test_saving_a_loaded_set_keeps_it_usable(tmp_path):
+    path = str(tmp_path / "urls.ids")
+    IdSet(URLS[:100]).save(path)
+    ids = IdSet.load(path)
+    ids.add(URLS[100])
+    ids.save(path)
+    assert ids.base is None
+    assert URLS[0] in ids and URLS[100] in ids and len(ids) == 101
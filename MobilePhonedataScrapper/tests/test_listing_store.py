@@ -0,0 +1,70 @@
+from datetime import date
+
+from common.listing_store import ListingStore
+from common.product import Product
+
+URL = "https://www.dubizzle.com.eg/en/ad/iphone-13-{}"
+
+
+def iphone(i, price, storage="128GB"):
+    return Product.from_dict({"product_name": f"Apple iPhone 13 {storage}", "price": f"{price:,} EGP",
+                              "listing_url": URL.format(i),
+                              "details": {"Brand": "Apple", "Model": "iPhone 13", "Storage": storage}}, "dubizzle")
+
+
+def listing(store, i):
+    return store.conn.execute("SELECT price, first_seen, last_seen, removed_on FROM listings WHERE key = ?",
+                              (URL.format(i),)).fetchone()
+
+
+def test_upsert_keeps_one_row_per_listing_and_one_price_per_day(tmp_path):
+    with ListingStore(str(tmp_path / "store.db"), source="dubizzle", batch_size=2) as store:
+        store.write(iphone(1, 20000), scraped_at="2026-03-01")
+        store.write(iphone(1, 19000), scraped_at="2026-03-01")
+        store.write(iphone(1, 18000), scraped_at="2026-03-02")
+        store.flush()
+        assert listing(store, 1) == (18000.0, "2026-03-01", "2026-03-02", None)
+        assert store.counts() == {"dubizzle": (1, 1, 2)}
+        prices = store.conn.execute("SELECT day, price FROM price_history ORDER BY day").fetchall()
+        assert prices == [("2026-03-01", 19000.0), ("2026-03-02", 18000.0)]
+
+
+def test_backfilling_an_older_snapshot_keeps_the_newer_fields(tmp_path):
+    with ListingStore(str(tmp_path / "store.db"), source="dubizzle") as store:
+        store.write(iphone(1, 18000), scraped_at="2026-03-05")
+        store.write(iphone(1, 25000), scraped_at="2026-03-01")
+        store.flush()
+        assert listing(store, 1) == (18000.0, "2026-03-01", "2026-03-05", None)
+
+
+def test_removal_markers_and_touches(tmp_path):
+    with ListingStore(str(tmp_path / "store.db"), source="dubizzle") as store:
+        store.write(iphone(1, 20000), scraped_at="2026-03-01")
+        store.write({"listing_url": URL.format(1), "change": "removed"}, scraped_at="2026-03-02")
+        store.flush()
+        assert listing(store, 1)[3] == "2026-03-02"
+        # Seen again without a fetch: back to active, last price carried forward
+        store.touch([URL.format(1)], scraped_at="2026-03-03")
+        store.flush()
+        assert listing(store, 1) == (20000.0, "2026-03-01", "2026-03-03", None)
+        assert store.counts() == {"dubizzle": (1, 1, 2)}
+
+
+def test_price_trend_median_for_odd_and_even_counts(tmp_path):
+    with ListingStore(str(tmp_path / "store.db"), source="dubizzle") as store:
+        for i, price in enumerate((30000, 10000, 20000)):
+            store.write(iphone(i, price), scraped_at="2026-03-01")
+        for i, price in enumerate((40000, 10000, 30000, 20000)):
+            store.write(iphone(i, price), scraped_at="2026-03-02")
+        store.write(iphone(9, 99000, storage="256GB"), scraped_at="2026-03-02")
+        store.flush()
+
+        trend = store.price_trend("iPhone 13 128GB", days=30, until=date(2026, 3, 2))
+        assert [(row["day"], row["listings"], row["median"], row["min"], row["max"]) for row in trend] == [
+            ("2026-03-01", 3, 20000.0, 10000.0, 30000.0),
+            ("2026-03-02", 4, 25000.0, 10000.0, 40000.0),
+        ]
+        # Without a capacity every storage variant counts
+        every = store.price_trend("iPhone 13", days=30, until=date(2026, 3, 2))
+        assert [(row["listings"], row["median"]) for row in every] == [(3, 20000.0), (5, 30000.0)]
+        assert store.price_trend("iPhone 13 128GB", days=30, until=date(2026, 2, 28)) == []
@@ -0,0 +1,33 @@
+from common.matching import MatchIndex, signature_from, tokens
+from common.product import Product
+
+
+def test_glued_variants_are_split_from_the_model_number():
+    assert tokens("iPhone 13Pro") == ["iphone", "13", "pro"]
+    assert tokens("iphone 14promax 256gb") == ["iphone", "14", "pro", "max", "256gb"]
+    assert tokens("Galaxy S24Ultra") == ["galaxy", "s24", "ultra"]
+    assert tokens("Galaxy A55 5G 128GB") == ["galaxy", "a55", "5g", "128gb"]
+    assert tokens("ايفون ١٣برو") == ["iphone", "13", "pro"]
+
+
+def test_glued_and_spaced_models_share_a_signature():
+    glued = signature_from("Apple", "13promax", "Apple 13promax 256GB", None)
+    spaced = signature_from("Apple", "iPhone 13 Pro Max", "Apple iPhone 13 Pro Max", 256.0)
+    assert glued.model == spaced.model == "apple 13 pro max"
+    assert glued.block == spaced.block == ("apple", "13", 256.0)
+    # Without a Model spec the title is used
+    assert signature_from("Apple", None, "ايفون ١٣برو ١٢٨ جيجا", None).model == "apple 13 pro"
+    assert signature_from("Samsung", "Other", "Samsung S24Ultra 512GB", None).model == "samsung s24 ultra"
+
+
+def test_a_glued_listing_matches_its_reference_model():
+    index = MatchIndex()
+    for model, price in (("iPhone 13 Pro", "40,000 EGP"), ("iPhone 13", "30,000 EGP")):
+        index.add_reference(Product.from_dict({
+            "product_name": f"Apple {model}", "price": price, "listing_url": f"https://mobilemasr.com/p/{model}",
+            "details": {"Brand": "Apple", "Model": model, "Storage": "128 GB", "SKU": model}}, "mobilemasr"))
+    listing = Product.from_dict({
+        "product_name": "iphone 13pro 128gb", "price": "38,000 EGP", "listing_url": "https://www.dubizzle.com.eg/en/ad/1",
+        "details": {"Brand": "Apple", "Model": "13pro"}}, "dubizzle")
+    group, score = index.match(listing)
+    assert group.label == "iphone 13 pro" and score == 1.0
@@ -0,0 +1,84 @@
+import json
+
+from common.ndjson_writer import NDJSONWriter, iter_products
+from common.product import Product, as_dict, json_default
+
+from fast_parser import parse_product_details
+from sample_pages import render_detail_page
+
+AD_URL = "https://www.dubizzle.com.eg/en/ad/iphone-13-pro-ID1.html"
+AD = {"product_name": "Apple iPhone 13 Pro", "price": "EGP 33,500", "seller_name": "N/A",
+      "location": "Nasr City, Cairo", "listing_url": AD_URL,
+      "details": {"Brand": "Apple", "Model": "iPhone 13 Pro", "RAM": "6", "Storage": "256 GB", "Condition": "Used"}}
+HIT = {"brand_en": "Samsung", "item_en": "Samsung Galaxy S24", "storage_en": "256 GB", "ram_en": "8 GB",
+       "color_en": "Black", "variant_type_en": "Used", "battery_health": "N/A", "sale_price": 45000,
+       "sku": "S24-256-BLK", "slug_en": "samsung-galaxy-s24", "vendor_storename": "Phone Hub"}
+
+
+def dubizzle_product():
+    return parse_product_details(render_detail_page(AD, filler=0), AD_URL)
+
+
+def mobilemasr_product(monkeypatch):
+    monkeypatch.setenv("ALGOLIA_APP_ID", "app")
+    monkeypatch.setenv("ALGOLIA_API_KEY", "key")
+    from MobileMasrScrapper.main import MobileMasrAlgoliaScraper
+    return MobileMasrAlgoliaScraper().parse_algolia_hit(HIT)
+
+
+def test_dubizzle_page_parses_to_numeric_fields():
+    product = dubizzle_product()
+    assert product.source == "dubizzle"
+    assert (product.price, product.currency, product.price_raw) == (33500.0, "EGP", "EGP 33,500")
+    assert (product.ram_gb, product.storage_gb) == (6.0, 256.0)
+    assert (product.brand, product.model, product.condition) == ("Apple", "iPhone 13 Pro", "Used")
+    assert product.seller_name is None  # "N/A" is not kept as a value
+    assert product.key == AD_URL
+
+
+def test_mobilemasr_hit_parses_to_numeric_fields(monkeypatch):
+    product = mobilemasr_product(monkeypatch)
+    assert product.source == "mobilemasr"
+    assert (product.price, product.currency) == (45000.0, "EGP")
+    assert (product.ram_gb, product.storage_gb) == (8.0, 256.0)
+    assert product.seller_name == "Phone Hub"
+    assert "Battery Health" not in product.details
+    assert product.key == "S24-256-BLK"  # MobileMasr products are keyed by SKU
+
+
+def test_missing_values_are_none_and_written_back_as_placeholders():
+    product = Product.from_scraped("dubizzle", "N/A", "N/A", None, "N/A", AD_URL, {})
+    assert (product.product_name, product.price, product.currency, product.location) == (None, None, None, None)
+    data = product.to_dict()
+    assert data["price"] == data["seller_name"] == data["location"] == "N/A"
+    assert list(data) == ["product_name", "price", "seller_name", "location", "listing_url", "details"]
+
+
+def test_round_trip_through_dicts_and_ndjson(tmp_path, monkeypatch):
+    products = [dubizzle_product(), mobilemasr_product(monkeypatch)]
+    products[0].change = "changed"
+    products[1].queries = ["galaxy"]
+    for product in products:
+        again = Product.from_dict(product.to_dict(), product.source)
+        assert again == product
+
+    path = str(tmp_path / "products.ndjson")
+    with NDJSONWriter(path) as writer:
+        for product in products:
+            writer.write(product)
+        writer.write({"details": {"SKU": "GONE"}, "change": "removed"})
+    rows = list(iter_products(path))
+    assert rows[:2] == [product.to_dict() for product in products]
+    assert rows[2] == {"details": {"SKU": "GONE"}, "change": "removed"}
+    assert [Product.from_dict(row, product.source) for row, product in zip(rows, products)] == products
+
+
+def test_json_default_serializes_products_only():
+    product = dubizzle_product()
+    assert json.loads(json.dumps({"products": [product]}, default=json_default)) == {"products": [product.to_dict()]}
+    assert as_dict({"change": "removed"}) == {"change": "removed"}
+    try:
+        json.dumps(object(), default=json_default)
+    except TypeError:
+        return
+    raise AssertionError("json_default accepted an arbitrary object")
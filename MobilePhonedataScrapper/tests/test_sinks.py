@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from common.metrics import Metrics
+from common.ndjson_writer import iter_products
+from common.product import Product
+from common.seen_index import SeenIndex
+from common.sinks import SinkMixin
+from common.validation import Validator
+
+
+class Scraper(SinkMixin):
+    def __init__(self, seen_index=None):
+        self.source = "dubizzle"
+        self.products = []
+        self.metrics = Metrics()
+        self.validator = Validator(self.source)
+        self.seen_index = seen_index
+        self._init_sinks()
+
+
+class HistorySink:
+    observes_unchanged = True
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, product):
+        self.written.append(product)
+
+    def close(self):
+        pass
+
+
+def product(i, price="20,000 EGP"):
+    return Product.from_dict({"product_name": f"Apple iPhone {i}", "price": price,
+                              "listing_url": f"https://www.dubizzle.com.eg/en/ad/iphone-{i}", "details": {}}, "dubizzle")
+
+
+def test_rejects_are_dropped_and_valid_products_reach_every_sink(tmp_path):
+    scraper = Scraper()
+    history = HistorySink()
+    scraper.sinks.append(history)
+    assert scraper._emit(product(1))
+    assert not scraper._emit(product(2, price="1 EGP"))
+    assert [p.listing_url for p in scraper.products] == [p.listing_url for p in history.written] == [product(1).listing_url]
+    assert scraper.product_count == 1
+
+    path = str(tmp_path / "out.json")
+    asyncio.run(scraper.save_data(path))
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["total_products"] == 1
+
+
+def test_unchanged_products_only_reach_history_sinks_in_delta_runs(tmp_path):
+    path = str(tmp_path / "seen.db")
+    first = SeenIndex(path, "dubizzle")
+    Scraper(first)._emit(product(1))
+    first.close()
+
+    index = SeenIndex(path, "dubizzle")
+    scraper = Scraper(index)
+    history = HistorySink()
+    scraper.sinks.append(history)
+    scraper.stream_to(str(tmp_path / "out.ndjson"))
+    scraper._emit(product(1))
+    scraper._emit(product(2))
+    asyncio.run(scraper.save_data(str(tmp_path / "out.json"), wrap_stream=True))
+    index.close()
+
+    assert scraper.products == []  # Streamed runs keep nothing in memory
+    assert [p.change for p in history.written] == [None, "new"]
+    rows = list(iter_products(str(tmp_path / "out.ndjson")))
+    assert [(row["listing_url"], row["change"]) for row in rows] == [(product(2).listing_url, "new")]
+    with open(tmp_path / "out.json", encoding="utf-8") as f:
+        assert json.load(f)["total_products"] == 1
+
+
+def test_normalizing_a_name_does_not_mark_a_known_listing_changed(tmp_path):
+    # The index was filled before "Apple Apple ..." names were normalized, i.e. hashed as scraped
+    raw = Product.from_dict({"product_name": "Apple Apple Iphone 13", "price": "30,000 EGP",
+                             "listing_url": "https://mobilemasr.com/p/iphone-13",
+                             "details": {"Brand": "Apple", "SKU": "IP13-128"}}, "mobilemasr")
+    index = SeenIndex(str(tmp_path / "seen.db"), "mobilemasr")
+    index.observe(raw)
+
+    scraper = Scraper(index)
+    scraper.source = "mobilemasr"
+    scraper.validator = Validator("mobilemasr")
+    again = Product.from_dict(raw.to_dict(), "mobilemasr")
+    assert scraper._emit(again)
+    assert again.product_name == "Apple Iphone 13"
+    assert scraper.products == [] and index.counts["unchanged"] == 1
+    index.close()
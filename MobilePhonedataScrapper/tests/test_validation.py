@@ -0,0 +1,66 @@
+import json
+
+from common.product import Product
+from common.validation import Validator
+
+
+def dubizzle(**fields):
+    data = {"product_name": "Apple iPhone 13", "price": "20,000 EGP", "seller_name": "  Ahmed   Ali ",
+            "location": "Nasr City, Cairo", "listing_url": "https://www.dubizzle.com.eg/en/ad/iphone-13-1",
+            "details": {"Brand": "Apple", "Model": "iPhone 13", "Storage": "128GB", "Color": "N/A"}}
+    data.update(fields)
+    return Product.from_dict(data, "dubizzle")
+
+
+def mobilemasr(**details):
+    data = {"product_name": "Samsung Galaxy S24", "price": "45,000 EGP", "listing_url": "https://mobilemasr.com/p/s24",
+            "details": {"Brand": "Samsung", "SKU": "S24-256", "Battery Health": "95 %", **details}}
+    return Product.from_dict(data, "mobilemasr")
+
+
+def test_accepts_and_normalizes_a_clean_record():
+    validator = Validator("dubizzle")
+    product = validator.validate(dubizzle())
+    assert product is not None
+    assert product.seller_name == "Ahmed Ali"
+    assert "Color" not in product.details
+    assert validator.counts == {"valid": 1, "rejected": 0}
+
+
+def test_rejects_missing_url_and_implausible_price():
+    validator = Validator("dubizzle")
+    assert validator.validate(dubizzle(listing_url=None)) is None
+    assert validator.validate(dubizzle(price="1 EGP")) is None
+    assert validator.validate(dubizzle(price="20,000,000,000 EGP")) is None
+    assert validator.counts == {"valid": 0, "rejected": 3}
+    assert validator.reasons == {"missing_listing_url": 1, "price_out_of_range": 2}
+
+
+def test_out_of_range_optional_fields_are_dropped_not_rejected():
+    validator = Validator("mobilemasr")
+    product = validator.validate(mobilemasr(**{"Battery Health": "140%"}))
+    assert product is not None
+    assert "Battery Health" not in product.details
+    assert validator.validate(mobilemasr()).details["Battery Health"] == "95%"
+
+
+def test_mobilemasr_records_need_a_sku():
+    validator = Validator("mobilemasr")
+    assert validator.validate(mobilemasr(SKU=None)) is None
+    assert validator.reasons == {"missing_SKU": 1}
+
+
+def test_rejects_go_to_the_quarantine_file_with_their_reasons(tmp_path):
+    path = tmp_path / "rejects.ndjson"
+    validator = Validator("dubizzle", quarantine_path=str(path))
+    validator.validate(dubizzle())
+    assert not path.exists()  # Opened on the first reject only
+    validator.validate(dubizzle(listing_url="not a url", price="5 EGP"))
+    validator.close()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["source"] == "dubizzle"
+    assert lines[0]["reasons"] == ["listing_url_malformed", "price_out_of_range"]
+    assert lines[0]["record"]["listing_url"] == "not a url"
+    assert "rejects.ndjson" in validator.summary()